@@ -0,0 +1,175 @@
+"""Run many content briefs through the pipeline without Streamlit.
+
+Usage::
+
+    python batch_runner.py briefs.jsonl --output results.jsonl --workers 8
+
+Each input line is a JSON object with the same fields as the content request
+form (``topic`` is required, everything else falls back to the form defaults)
+plus an optional ``id``, ``model`` and ``plan_mode``. One JSON record per
+brief is written as soon as that brief finishes, so output order follows
+completion order. Pass ``--stub`` to run offline against ``stub_llm``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from content_pipeline import MODEL_MAP, PipelineReporter, run_content_pipeline
+from stub_llm import StubBackend
+
+logger = logging.getLogger(__name__)
+
+BRIEF_DEFAULTS = {
+    "content_type": "Blog Post",
+    "topic": "",
+    "audience": "",
+    "length": "Medium (600-800 words)",
+    "key_messages": "",
+    "brand_voice": "",
+    "keywords": "",
+    "compliance": "",
+    "references": "",
+}
+
+
+def load_briefs(path: str) -> list[dict]:
+    """Read briefs from a JSONL file, skipping blank lines."""
+    briefs = []
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            brief = json.loads(line)
+            if not brief.get("topic"):
+                raise ValueError(f"{path}:{line_no}: brief has no topic")
+            brief.setdefault("id", line_no)
+            briefs.append(brief)
+    return briefs
+
+
+def brief_inputs(brief: dict) -> dict:
+    """Return the pipeline inputs for a brief, filling in form defaults."""
+    return {key: brief.get(key) or default for key, default in BRIEF_DEFAULTS.items()}
+
+
+class BatchReporter(PipelineReporter):
+    """Log stage timings for one brief and collect its errors."""
+
+    def __init__(self, brief_id):
+        self.brief_id = brief_id
+        self.errors: list[str] = []
+
+    def stage_completed(self, agent, key, output, metrics):
+        logger.info(
+            "brief %s: %s done in %.1fs%s",
+            self.brief_id, agent, metrics["duration"], " (cached)" if metrics.get("cached") else "",
+        )
+
+    def error(self, message):
+        logger.error("brief %s: %s", self.brief_id, message)
+        self.errors.append(message)
+
+
+def run_brief(brief: dict, model: str, api_key: str, plan_mode: bool = False, use_cache: bool = True,
+              backend=None, routing: bool = True) -> dict:
+    """Run one brief and return its output record."""
+    reporter = BatchReporter(brief.get("id"))
+    start = time.perf_counter()
+    try:
+        results = run_content_pipeline(
+            brief_inputs(brief),
+            brief.get("model", model),
+            api_key,
+            brief.get("plan_mode", plan_mode),
+            reporter=reporter,
+            use_cache=use_cache,
+            backend=backend,
+            routing=routing,
+        )
+    except Exception as e:
+        logger.exception("brief %s failed", brief.get("id"))
+        reporter.errors.append(str(e))
+        results = None
+    return {
+        "id": brief.get("id"),
+        "topic": brief["topic"],
+        "status": "ok" if results else "failed",
+        "elapsed": round(time.perf_counter() - start, 3),
+        "errors": reporter.errors,
+        "results": results,
+    }
+
+
+def run_batch(briefs: list[dict], model: str, api_key: str, workers: int = 4, plan_mode: bool = False,
+              use_cache: bool = True, backend=None, on_result=None, routing: bool = True) -> list[dict]:
+    """Run ``briefs`` on a thread pool and return records in completion order.
+
+    Agent calls spend nearly all their time waiting on the network, so threads
+    give close to ``workers``-fold throughput. ``on_result`` is called with
+    each record as soon as its brief finishes."""
+    records = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(run_brief, brief, model, api_key, plan_mode, use_cache, backend, routing)
+            for brief in briefs
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if on_result is not None:
+                on_result(record)
+    return records
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run content briefs through the AI content team.")
+    parser.add_argument("briefs", help="JSONL file with one brief per line")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file for results (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="briefs to run concurrently")
+    parser.add_argument("--model", choices=sorted(MODEL_MAP), default="4o")
+    parser.add_argument("--plan-mode", action="store_true", help="run the planning pipeline only")
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse cached agent replies")
+    parser.add_argument("--no-routing", action="store_true", help="use --model for every agent")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub LLM instead of OpenAI")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds of fake latency per stub call")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    api_key = os.environ.get("OPENAI_API_KEY", "")
+    backend = StubBackend(latency=args.stub_latency) if args.stub else None
+    if backend is None and not api_key:
+        parser.error("set OPENAI_API_KEY or pass --stub")
+
+    briefs = load_briefs(args.briefs)
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    start = time.perf_counter()
+
+    def write(record):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    try:
+        records = run_batch(
+            briefs, args.model, api_key, workers=args.workers, plan_mode=args.plan_mode,
+            use_cache=not args.no_cache, backend=backend, on_result=write, routing=not args.no_routing,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    failed = sum(record["status"] != "ok" for record in records)
+    logger.info(
+        "%d briefs finished in %.1fs, %d failed", len(records), time.perf_counter() - start, failed
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Classify 100k fan-out queries, old classify_query against classify_queries.
+
+Usage: python benchmarks/bench_classify.py [queries]
+
+Both sides classify every node once: the baseline calls the previous
+``classify_query`` per node, so the timing compares the rule table alone,
+not the second call per node the query panel used to make. Results must
+match.
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_fanout import classify_queries, iter_fanout
+
+
+def legacy_classify_query(query):
+    q = query.lower()
+    if any(t in q for t in [" vs ", "versus", "compare", "difference", "better than"]):
+        return "comparative"
+    if re.search(r"\b(near me|in [a-z]+|at [a-z]+|location|city|country)\b", q):
+        return "location"
+    if re.search(r"\b(20\d{2}|today|latest|this year|this month)\b", q) or re.search(r"\b\d+[- ]?(day|week|month|year)s?\b", q):
+        return "temporal"
+    if re.search(r"\b(my|for me|i |personalized|best for me|should i)\b", q):
+        return "personalized"
+    if any(t in q for t in ["error", "install", "setup", "troubleshoot", "code", "configuration", "how to", "fix"]):
+        return "technical"
+    if any(t in q for t in ["alternative", "similar", "related", "competitor"]):
+        return "entity_expansion"
+    if any(t in q for t in ["what is", "define", "definition", "meaning"]):
+        return "reformulation"
+    first = q.split()[0] if q.split() else ""
+    if first in ["how", "why", "what", "where", "when", "who"]:
+        return "user_intent"
+    return "implicit"
+
+
+def main(n=100_000):
+    base = ["tracing tools for my team", "what is opentelemetry", "jaeger vs zipkin",
+            "tracing in kubernetes 2024", "sampling strategies", "fix missing spans"]
+    queries = [text for _, _, text in iter_fanout("Distributed tracing", base, max_queries=n - 1, levels=12)]
+
+    start = time.perf_counter()
+    legacy = [legacy_classify_query(q) for q in queries]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = classify_queries(queries)
+    batched_seconds = time.perf_counter() - start
+
+    assert batched == legacy
+    print(f"{len(queries)} queries")
+    print(f"legacy, once per node: {legacy_seconds:7.3f}s")
+    print(f"classify_queries:      {batched_seconds:7.3f}s")
+    print(f"speedup: {legacy_seconds / batched_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,40 @@
+"""Time topic clustering of fan-out queries.
+
+Usage: python benchmarks/bench_clusters.py [queries] [clusters]
+
+Clustering runs on every render of the query table, so 10k queries should
+take well under a second. Reports the time, the group sizes and the query
+that labels each group.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_embeddings import make_queries
+from embeddings import embed_texts
+from query_clusters import cluster_queries
+
+
+def main(n=10_000, k=None):
+    queries = make_queries(n)
+    vectors = embed_texts(queries)
+
+    start = time.perf_counter()
+    labels, representatives = cluster_queries(vectors, k)
+    seconds = time.perf_counter() - start
+
+    sizes = np.bincount(labels)
+    print(f"{n} queries, {len(representatives)} clusters")
+    print(f"clustering: {seconds:8.3f}s")
+    for size, row in zip(sizes, representatives):
+        print(f"{size:6d}  {queries[row]}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,62 @@
+"""Compare batched embedding similarity with the old per-pair Python loop.
+
+Usage: python benchmarks/bench_embeddings.py [queries]
+
+The baseline is the previous implementation: an MD5-seeded 8-float
+``pseudo_embedding`` per text and a pure-Python cosine for every pair.
+"""
+
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import cosine_matrix, embed_texts
+
+
+def pseudo_embedding(text, dim=8):
+    seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % (2**32)
+    rng = random.Random(seed)
+    return [rng.random() for _ in range(dim)]
+
+
+def cosine_sim(v1, v2):
+    dot = sum(a * b for a, b in zip(v1, v2))
+    norm1 = math.sqrt(sum(a * a for a in v1))
+    norm2 = math.sqrt(sum(b * b for b in v2))
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return dot / (norm1 * norm2)
+
+
+def make_queries(n):
+    rng = random.Random(0)
+    words = "tracing logs metrics kubernetes alerting cost setup best tools open source latency sampling".split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(3, 7))) + f" {i}" for i in range(n)]
+
+
+def main(n=1000):
+    queries = make_queries(n)
+
+    start = time.perf_counter()
+    vectors = [pseudo_embedding(q) for q in queries]
+    loop = [[cosine_sim(a, b) for b in vectors] for a in vectors]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = cosine_matrix(embed_texts(queries))
+    batch_seconds = time.perf_counter() - start
+
+    assert len(loop) == matrix.shape[0] == n
+    print(f"{n} queries, {n * n} pairs")
+    print(f"per-pair loop (8 dims):   {loop_seconds:8.3f}s")
+    print(f"batched matrix (512 dims): {batch_seconds:8.3f}s")
+    print(f"speedup: {loop_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
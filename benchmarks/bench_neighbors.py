@@ -0,0 +1,43 @@
+"""Time blocked top-k neighbor search over large query sets.
+
+Usage: python benchmarks/bench_neighbors.py [queries] [k]
+
+For example ``python benchmarks/bench_neighbors.py 50000`` for a full-size
+strategy fan-out.
+
+Reports embedding and neighbor search time and the size of one similarity
+block, which bounds memory whatever the number of queries.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_embeddings import make_queries
+from embeddings import _block_rows, embed_texts, top_k_neighbors
+
+
+def main(n=20_000, k=5):
+    queries = make_queries(n)
+
+    start = time.perf_counter()
+    vectors = embed_texts(queries)
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices, scores = top_k_neighbors(vectors, k)
+    search_seconds = time.perf_counter() - start
+
+    rows = _block_rows(n, None)
+    print(f"{n} queries, top {k} neighbors")
+    print(f"embedding:       {embed_seconds:8.3f}s")
+    print(f"neighbor search: {search_seconds:8.3f}s")
+    print(f"block: {rows} rows, {rows * n * 4 / 2**20:.0f} MB")
+    print(f"first query: {queries[0]!r} -> {queries[indices[0, 0]]!r} ({scores[0, 0]:.2f})")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
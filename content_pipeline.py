@@ -0,0 +1,1334 @@
+"""Agent calls and the multi-agent content pipeline.
+
+Nothing in here imports Streamlit: the web app and the headless batch runner
+both drive the pipeline and observe it through a ``PipelineReporter``.
+
+Both modes are declared as stage graphs. In Planning Mode the query parsing
+and the Head of Content's plan run at the same time; the full run is one
+chain, each stage needing the one before, so its stages run one after
+another. There the graph is what lets a run resume at the first incomplete
+stage and rerun from a chosen one; the speed-up comes from the concurrent
+calls inside the writer and Head of Content stages.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from functools import partial
+
+from content_sections import (
+    MIN_SECTIONS,
+    ContentSection,
+    extract_outline,
+    join_sections,
+    paragraphs,
+    split_sections,
+    strip_heading,
+)
+from context_budget import ContextSection, assemble_context, count_tokens, fit_texts
+from knowledge_index import get_knowledge_index, render_chunk
+from knowledge_store import KNOWLEDGE_DIR
+from llm_client import ResilientBackend, is_timeout
+from model_routes import DEFAULT_MAX_OUTPUT, GenerationProfile, resolve_profile
+from near_duplicates import collapse_near_duplicates
+from query_coverage import score_coverage
+from query_fanout import NEAR_DUPLICATE_THRESHOLD, parse_queries
+from response_cache import ResponseCache, make_cache_key
+from stage_graph import Stage, StageFailed, critical_path, downstream_stages, run_stage_graph
+
+logger = logging.getLogger(__name__)
+
+AGENTS = ["Strategist", "SEO Specialist", "Specialist Writer", "Head of Content", "Editor-in-Chief"]
+
+# Agent response cache settings
+CACHE_PATH = os.environ.get("CONTENT_CACHE_PATH", os.path.join(".cache", "agent_responses.sqlite3"))
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+# Stage checkpoints live next to the response cache, with the same limits
+CHECKPOINT_PATH = os.environ.get("CONTENT_CHECKPOINT_PATH", os.path.join(".cache", "stage_checkpoints.sqlite3"))
+
+# Model mapping
+MODEL_MAP = {
+    "4.1": "gpt-4.1-2025-04-14",
+    "4o": "gpt-4o-2024-08-06",
+    "4o-mini": "gpt-4o-mini-2024-07-18",
+    "o3": "o3-2025-04-16"
+}
+
+# Lengths drafted section by section, one concurrent call per section of
+# the Strategist's outline, and the words to aim for in total
+SECTIONED_LENGTHS = {"Long (1200+ words)": 1500}
+# Most agent calls one stage makes at the same time
+PARALLEL_AGENT_CALLS = 6
+# How much of each section the Editor-in-Chief sees when routing feedback
+ROUTING_EXCERPT_CHARS = 160
+
+# Prompt tokens each agent call may use, per model. The system prompt, the
+# stage prompt (with any upstream stage output), the brief, the knowledge
+# base and the reference materials all count against it.
+CONTEXT_BUDGETS = {
+    "4.1": 32000,
+    "4o": 16000,
+    "4o-mini": 16000,
+    "o3": 24000
+}
+# Share of the budget left after the system prompt and the brief that the
+# upstream stage output in a stage prompt may take; longer output is cut
+UPSTREAM_SHARE = 0.6
+
+# No agent can be given more reference text than the largest budget, so
+# extraction of uploaded files stops there.
+REFERENCE_TOKEN_BUDGET = max(CONTEXT_BUDGETS.values())
+
+# What each agent looks for in the knowledge base, on top of the topic. The
+# best KNOWLEDGE_TOP_K chunks go into its context, best first, so the budget
+# drops the least relevant ones.
+KNOWLEDGE_TOP_K = 8
+AGENT_KNOWLEDGE_QUERIES = {
+    "Strategist": "content strategy mission pillars target audiences value props differentiation brief",
+    "SEO Specialist": "SEO search keywords headings structure content types success metrics",
+    "Specialist Writer": "voice tone grammar write this not that dictionary inclusive language examples",
+    "Head of Content": "brand messaging core messages value props voice tone do's don'ts claims",
+    "Editor-in-Chief": "editorial review process feedback format checklist fact-checking citations sources",
+}
+
+# Enhanced Agent System Prompts
+
+AGENT_PROMPTS = {
+    "Strategist": """You are the Lead Content Strategist at Momentic, with deep expertise in B2B SaaS content strategy and technical audience engagement. You've studied how developers and technical decision-makers consume content, and you understand what makes them trust and engage with a brand.
+
+    Your strategic foundation:
+    - People trust expertise demonstrated through understanding, not claims
+    - Clarity beats cleverness, but depth builds authority
+    - Every piece must solve a real problem for a real person
+    - Great content feels like advice from a helpful, knowledgeable colleague
+    
+    Strategic approach:
+    - Analyze the target audience's specific pain points, technical sophistication, and decision-making criteria
+    - Identify the unique angle that will differentiate this content from generic tech content
+    - Map content to the buyer's journey stage and specific use cases
+    - Balance immediate practical value with long-term thought leadership
+    
+    Deliverables:
+    1) **Refined Title**: Create 3 title variations - one SEO-optimized, one curiosity-driven, one value-focused. Recommend the best.
+    2) **Strategic Positioning**: Define the content's unique angle, key differentiators, and competitive advantage
+    3) **Detailed Content Architecture**:
+       - Hook strategy (first 150 words that earn attention)
+       - Section flow with smooth transition logic
+       - Information density distribution (where to go deep vs. high-level)
+       - Engagement tactics (examples, visuals, interactive elements)
+    4) **Voice & Tone Blueprint**:
+       - Technical sophistication level (1-5 scale with specific markers)
+       - Professional yet human tone balance
+       - Trust-building credibility markers
+       - Common pitfalls to avoid (buzzwords, jargon, condescension)
+    
+    Remember: You're setting up the team for success. Be specific, practical, and always keep the reader's needs at the center.
+
+When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
+    
+    "Specialist Writer": """You are Momentic's Senior Technical Content Writer, specializing in making complex technical concepts accessible without dumbing them down. You have a background in software development and understand that great technical writing respects the reader's intelligence while ensuring clarity.
+
+    Your writing principles:
+    - Start with a hook that shows you understand the reader's world
+    - Use the "show, then tell" approach - concrete examples before abstract concepts
+    - Write like a helpful colleague, not a textbook
+    - Build narrative momentum even in technical content
+    - Every paragraph should make the reader want the next one
+    
+    Writing approach:
+    1) **Opening**: Craft a first paragraph that immediately demonstrates value and understanding
+    2) **Structure**: Follow the strategic outline while maintaining natural, conversational flow
+    3) **Technical Depth**: Include enough detail to be genuinely useful, not just informative
+    4) **Engagement**: Vary paragraph lengths, ask strategic questions, reveal insights progressively
+    5) **Evidence**: Support all claims with specific examples, real data, or concrete scenarios
+    6) **Conclusion**: End with actionable next steps, not just summary
+    
+    Style guidelines:
+    - Active voice unless passive serves clarity
+    - Short sentences for key points, longer for context
+    - Explain technical terms inline without condescension
+    - Professional but conversational - like explaining to a smart colleague
+    - Use "you" to speak directly to the reader
+    - Avoid buzzwords and corporate jargon entirely
+    
+    Your goal: Create content that a senior developer would actually bookmark and share with their team.
+
+When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
+        
+    "SEO Specialist": """You are Aurora-SEO at Momentic, a future-proof search strategist and relevance engineer specializing in driving organic impact across classic SERPs and AI surfaces (AI Overviews, AI Mode, ChatGPT, Perplexity).
+    
+    Core Identity:
+    - Mission: Drive measurable organic impact across traditional and AI-powered search surfaces
+    - Mindset: Treat search as a probabilistic system governed by LLM reasoning chains, not just keyword matching
+    - Ethic: Prioritize user trust, factual accuracy, and long-term brand equity
+    
+    Your RAISE-R Workflow:
+    1) **Request-clarify**: Understand the content's goal and target metrics
+    2) **Audit current surface**: Analyze SERP/AI Mode snapshots and competing passages
+    3) **Infer fan-out landscape**: Generate 20+ synthetic queries spanning all query fan out types. Things that actual humans would think/say/type in a chatbot.
+    4) **Score semantic gaps**: Identify where content fails to align with search intent and report this out.
+    5) **Engineer relevance**: Optimize for both traditional SEO and AI snippet capture. Do this by mapping cosine similarity and chunking.
+    6) **Review & report**: Report everything out in its proper place.
+    
+    Optimization Approach:
+    - **Snippet Sculpting**: Position key value props in first 160 characters for AI snippet capture
+    - **Semantic Structure**: Create modular chunks that answer in <320 chars with clear entity anchors
+    - **Multi-modal Optimization**: Ensure images, videos, and code blocks reinforce main claims
+    - **Citation Engineering**: Structure content to maximize AI system citations
+    - **Zero-Click Strategy**: Optimize for influence even without direct clicks
+    
+    Technical Implementation:
+    - Natural keyword integration that serves user intent
+    - Structured data only when genuinely helpful
+    - Passage indexing optimization for AI retrieval
+    - Clear entity linking and semantic triples
+    - Accessibility compliance (alt text, ARIA landmarks)
+    
+    Output Requirements:
+    - Concise, actionable recommendations
+    - Bullet points over prose
+    - Flag uncertainty rather than fabricate metrics
+    - Include measurement hooks for citation frequency and answer prominence
+    - Under a **Search Queries** heading, list each suggestion as `<Type>: <query>` and double-check that the type label matches the query intent.
+    
+    Never sacrifice readability for traditional SEO metrics. The best content serves users first and search engines second.
+
+When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
+    
+    "Head of Content": """You are Momentic's Head of Content with 15+ years in B2B tech content leadership. You've built content programs that establish market authority while driving real business results. You review content through both strategic and practical lenses.
+
+    Your review framework:
+    
+    **Strategic Alignment**:
+    - Does this reinforce Momentic's position as a trusted technical authority?
+    - Are we demonstrating genuine expertise without arrogance?
+    - Is our unique perspective coming through clearly?
+    - Will this content build long-term brand equity?
+    
+    **Reader Value**:
+    - Does every section deliver on the title's promise?
+    - Are we solving a real problem or just adding noise?
+    - Is the advice practical and actionable?
+    - Would our target reader thank us for this content?
+    
+    **Message Clarity**:
+    - Are key points impossible to miss?
+    - Do we address likely objections naturally?
+    - Is our value proposition clear but not heavy-handed?
+    - Are transitions smooth and logical?
+    
+    **Quality Standards**:
+    - All claims substantiated with evidence
+    - Technical accuracy verified
+    - Consistent voice that builds trust
+    - Polish that reflects our standards
+    
+    Enhancement priorities:
+    1) Strengthen weak arguments with better evidence or remove them
+    2) Amplify unique insights only Momentic could provide
+    3) Ensure voice consistency - helpful colleague, not salesperson
+    4) Add CTAs that feel genuinely helpful, never pushy
+    5) Polish for memorability - what's the one thing readers will remember?
+    
+    Your goal: Elevate good content to exceptional. Make it something you'd be proud to put your name on.
+
+When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
+    
+    "Editor-in-Chief": """You are Momentic's Editor-in-Chief, the final guardian of content quality and brand reputation. You've edited thousands of technical articles and have developed an instinct for what truly serves technical audiences.
+
+    Your review criteria:
+    
+    **Technical Excellence** (0-10):
+    - Accuracy of all technical claims
+    - Appropriate depth without overwhelming
+    - Quality of code examples and demonstrations
+    - Logical flow of technical arguments
+    
+    **Reader Value** (0-10):
+    - Does the hook immediately demonstrate understanding?
+    - Consistent value delivery throughout
+    - Practical, actionable insights
+    - Memorable takeaways they'll actually use
+    
+    **Brand Building** (0-10):
+    - Strengthens Momentic's authority authentically
+    - Clear differentiation from generic content
+    - Builds trust through demonstrated expertise
+    - Advances our thought leadership naturally
+    
+    **Professional Polish** (0-10):
+    - Grammar and style consistency
+    - Clarity of expression throughout
+    - Appropriate professional tone
+    - Ready for publication without embarrassment
+    
+    Non-negotiable standards:
+    - No unsubstantiated claims
+    - No buzzword bingo or corporate jargon
+    - No condescension or oversimplification
+    - No SEO tactics that hurt readability
+    - No generic insights anyone could write
+    
+    Provide your verdict:
+    APPROVAL: [Approved/Needs Minor Revision/Needs Major Revision]
+    OVERALL_SCORE: [X/40]
+    BREAKDOWN: Technical: [X/10] | Value: [X/10] | Brand: [X/10] | Polish: [X/10]
+    
+    STANDOUT STRENGTHS:
+    - [What makes this exceptional]
+    
+    REVISION REQUIREMENTS:
+    - [Specific issues that must be fixed]
+    
+    STRATEGIC IMPACT:
+    - [How this advances our content goals]
+    
+    FINAL_TITLE: [The polished, publication-ready title]
+    FINAL_SLUG: [SEO-optimized URL slug]
+    FINAL_DESCRIPTION: [A description of the content that convinces the reader that it's worth reading]
+    
+    Editor's instinct: Would YOU save this article? Would you share it with a colleague?
+
+When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions."""
+}
+
+
+def retrieve_knowledge(query: str, directory: str = KNOWLEDGE_DIR) -> list[dict]:
+    """Return the ``KNOWLEDGE_TOP_K`` knowledge chunks that best match ``query``."""
+    return [chunk for _, chunk in get_knowledge_index(directory).search(query, KNOWLEDGE_TOP_K)]
+
+
+# Shared by every call that does not bring its own backend
+DEFAULT_BACKEND = ResilientBackend()
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the agent response cache shared by the whole process."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+        return _response_cache
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> ResponseCache:
+    """Return the stage checkpoint store shared by the whole process.
+
+    Checkpoints are JSON entries in a ``ResponseCache`` of their own, keyed
+    by the stage and a hash of everything it reads."""
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = ResponseCache(CHECKPOINT_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+        return _checkpoint_store
+
+
+def output_limit_param(model):
+    """Name of the request parameter that caps the reply for ``model``."""
+    return "max_completion_tokens" if MODEL_MAP[model].startswith("o3") else "max_tokens"
+
+
+def build_agent_params(agent_name, prompt, model, context="", max_output=DEFAULT_MAX_OUTPUT, timeout=None):
+    """Assemble the chat completion parameters for an agent call.
+
+    ``max_output`` caps the reply (including o3's reasoning tokens) and
+    ``timeout`` bounds the request in seconds."""
+    system_content = AGENT_PROMPTS[agent_name] + "\n\nRespond in plain text only. Do not use Markdown formatting."
+    messages = [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": f"{context}\n\n{prompt}"}
+    ]
+
+    params = {
+        "model": MODEL_MAP[model],
+        "messages": messages,
+       # "temperature": 0.7,
+    }
+
+    params[output_limit_param(model)] = max_output
+    if timeout:
+        params["request_timeout"] = timeout
+    return params
+
+
+def call_agent(agent_name, prompt, model, api_key, context="", on_token=None, metrics=None, use_cache=True,
+               on_error=None, backend=None, max_output=DEFAULT_MAX_OUTPUT, timeout=None, fallback=None):
+    """Make API call to OpenAI for an agent
+
+    When ``on_token`` is given the reply is streamed and the callback is called
+    with the text received so far after every chunk, plus once more with
+    ``final=True`` when the stream ends. ``metrics`` (a dict) receives the
+    time to first token and the total duration in seconds.
+
+    Replies are looked up in the shared response cache first, keyed by the
+    agent, the resolved model, the output budget and the full prompt. Pass
+    ``use_cache=False`` to always call the API.
+
+    Requests go through ``DEFAULT_BACKEND``, which applies the shared rate
+    limits and retries transient failures. Errors that survive the retries are
+    passed to ``on_error`` as a message (or logged) and ``None`` is returned.
+    ``backend`` replaces the default, see ``llm_client``.
+
+    ``max_output`` and ``timeout`` are passed to ``build_agent_params``. If
+    the request times out and a ``fallback`` model is given, the prompt is
+    sent to that model instead. ``metrics["model"]`` is the model that
+    answered."""
+    start = time.perf_counter()
+    first_token = None
+    cache = get_response_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(
+            agent_name, MODEL_MAP[model], output_limit_param(model), max_output, AGENT_PROMPTS[agent_name], context,
+            prompt,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached, final=True)
+            if metrics is not None:
+                metrics.update({"ttft": 0.0, "duration": 0.0, "cached": True, "model": model})
+            return cached
+    timed_out = False
+    try:
+        params = build_agent_params(agent_name, prompt, model, context, max_output, timeout)
+        output = ""
+        for chunk in (backend or DEFAULT_BACKEND)(params, api_key, stream=on_token is not None):
+            if first_token is None:
+                first_token = time.perf_counter()
+            output += chunk
+            if on_token is not None:
+                on_token(output)
+        if on_token is not None:
+            on_token(output, final=True)
+    except Exception as e:
+        if fallback and is_timeout(e):
+            timed_out = True
+        else:
+            message = f"Error calling {agent_name}: {str(e)}"
+            if on_error is not None:
+                on_error(message)
+            else:
+                logger.warning(message)
+            return None
+    finally:
+        end = time.perf_counter()
+        if metrics is not None:
+            metrics["ttft"] = round((first_token or end) - start, 3)
+            metrics["duration"] = round(end - start, 3)
+            metrics["cached"] = False
+            metrics["model"] = model
+    if timed_out:
+        logger.warning("%s timed out on %s after %.1fs, asking %s instead", agent_name, model, end - start, fallback)
+        if on_token is not None:
+            # The fallback reply starts from scratch
+            on_token("")
+        output = call_agent(
+            agent_name, prompt, fallback, api_key, context, on_token, metrics, use_cache, on_error, backend,
+            max_output,
+        )
+        if metrics is not None:
+            metrics["fallback_from"] = model
+        return output
+    if cache is not None and output:
+        cache.set(cache_key, output, duration=end - start)
+    return output
+
+
+class PipelineReporter:
+    """Receives progress events from ``run_content_pipeline``.
+
+    The base class ignores every event, which is what headless runs want.
+    Set ``streaming`` to receive ``stage_token`` events while agents write."""
+
+    streaming = False
+
+    def start(self, skipped):
+        """Called once before the first stage with the agents that will not run."""
+
+    def stage_started(self, agent):
+        """Called when ``agent`` starts working."""
+
+    def stage_token(self, agent, text, final=False):
+        """Called with the text ``agent`` has produced so far.
+
+        When the agent falls back to another model the text starts over,
+        with an empty text first."""
+
+    def stage_completed(self, agent, key, output, metrics):
+        """Called when ``agent`` finished; ``output`` is stored under ``results[key]``."""
+
+    def progress(self, fraction):
+        """Called with the share of the pipeline completed so far."""
+
+    def error(self, message):
+        """Called when an agent call fails."""
+
+    def bind_thread(self):
+        """Called in every worker thread before it runs pipeline stages."""
+
+    def finished(self):
+        """Called after the last stage of a successful run."""
+
+
+def parse_next_steps(output):
+    """Split agent output into main content and bullet list of next steps"""
+    if "Recommended Next Steps:" in output:
+        content, steps_part = output.split("Recommended Next Steps:", 1)
+        steps = [
+            line.strip("- ").strip()
+            for line in steps_part.strip().splitlines()
+            if line.strip().startswith("-")
+        ]
+        return content.strip(), steps
+    return output.strip(), []
+
+
+class PipelineRun:
+    """Shared state for the stages of one pipeline run."""
+
+    def __init__(self, inputs, model, api_key, sections, reporter, agent_count, use_cache=True, backend=None,
+                 fresh=(), routing=True):
+        self.inputs = inputs
+        self.model = model
+        self.api_key = api_key
+        self.sections = sections
+        self.budget = CONTEXT_BUDGETS[model]
+        topic_chunks = retrieve_knowledge(inputs["topic"])
+        self.context_info, _ = assemble_context(self.with_knowledge(topic_chunks), self.budget)
+        self.context_reports = {}
+        self.upstream_reports = {}
+        self.reporter = reporter
+        self.agent_count = agent_count
+        self.use_cache = use_cache
+        self.backend = backend
+        # Agents that skip the response cache, because their stage is rerun
+        self.fresh = set(fresh)
+        self.profiles = {
+            agent: resolve_profile(agent, inputs["content_type"], inputs["length"], model)
+            if routing else GenerationProfile(model)
+            for agent in AGENTS
+        }
+        self.next_steps = {}
+        self.timings = {}
+        self.tokens = {}
+        self.restored = []
+        self._lock = threading.Lock()
+
+    def budget_for(self, agent_name):
+        """Context budget of the agent's model, or of its fallback if that
+        is smaller, so the same context fits either."""
+        profile = self.profiles[agent_name]
+        return min(CONTEXT_BUDGETS[model] for model in (profile.model, profile.fallback) if model)
+
+    def caching(self, agent_name):
+        """Whether ``agent_name`` may reuse cached replies in this run."""
+        return self.use_cache and agent_name not in self.fresh
+
+    @property
+    def brand_voice(self):
+        return self.inputs["brand_voice"] or "Professional, data-driven, friendly"
+
+    def with_knowledge(self, chunks):
+        """Return the sections with the knowledge ``chunks`` after the brief."""
+        brief, *rest = self.sections
+        return [brief, ContextSection("Knowledge Base", chunks=[render_chunk(chunk) for chunk in chunks]), *rest]
+
+    def upstream(self, agent_name, **outputs):
+        """Cut upstream stage outputs to fit the agent's prompt.
+
+        Together they get ``UPSTREAM_SHARE`` of what the agent's budget
+        leaves after its system prompt and the brief, shared equally. Returns
+        the outputs by name; what was cut is added to the agent's context
+        report under ``upstream``."""
+        brief = self.sections[0]
+        room = self.budget_for(agent_name) - count_tokens(AGENT_PROMPTS[agent_name])
+        room -= count_tokens(brief.render(brief.text))
+        fitted, report = fit_texts(outputs, int(max(0, room) * UPSTREAM_SHARE))
+        with self._lock:
+            self.upstream_reports.setdefault(agent_name, report)
+        return fitted
+
+    def context_for(self, agent_name, prompt):
+        """Fit the shared context into what the budget leaves after the prompts.
+
+        The brief is kept even when the prompts leave no room for it.
+        Returns the context and a report of what was included and dropped,
+        including which knowledge chunks the agent was given."""
+        system_tokens = count_tokens(AGENT_PROMPTS[agent_name])
+        prompt_tokens = count_tokens(prompt)
+        chunks = retrieve_knowledge(f"{AGENT_KNOWLEDGE_QUERIES.get(agent_name, '')} {self.inputs['topic']}")
+        budget = self.budget_for(agent_name)
+        brief = self.sections[0]
+        room = max(budget - system_tokens - prompt_tokens, count_tokens(brief.render(brief.text)))
+        context, sections = assemble_context(self.with_knowledge(chunks), room)
+        with self._lock:
+            upstream = self.upstream_reports.get(agent_name, [])
+        report = {
+            "budget": budget,
+            "system_tokens": system_tokens,
+            "prompt_tokens": prompt_tokens,
+            "upstream": upstream,
+            "sections": sections,
+            "knowledge_chunks": [
+                f"{chunks[index]['source']} > {chunks[index]['heading']}"
+                for index in sections[1].get("chunks", [])
+            ],
+        }
+        return context, report
+
+    def agent(self, agent_name, prompt, key):
+        """Run ``agent_name`` and return its reply without the next steps.
+
+        Raises ``StageFailed`` when the agent call fails."""
+        self.reporter.stage_started(agent_name)
+        metrics = {}
+        on_token = partial(self.reporter.stage_token, agent_name) if self.reporter.streaming else None
+        output, steps = parse_next_steps(self._call(agent_name, prompt, on_token, metrics))
+        self._completed(agent_name, key, output, steps, metrics)
+        return output
+
+    def agent_parallel(self, agent_name, prompts, key, combine=None):
+        """Run ``agent_name`` on every prompt at once, as one stage.
+
+        The replies, without their next steps, are passed in prompt order to
+        ``combine``, whose result is the stage output (by default they are
+        joined with blank lines). While the agent writes, the reporter sees
+        the replies so far joined together. ``metrics`` hold the earliest
+        first token and the wall-clock duration, so the stage takes as long
+        as its slowest prompt. Raises ``StageFailed`` if any call fails."""
+        self.reporter.stage_started(agent_name)
+        start = time.perf_counter()
+        texts = [""] * len(prompts)
+        stream_lock = threading.Lock()
+
+        def on_token(index, text, final=False):
+            with stream_lock:
+                texts[index] = text
+                self.reporter.stage_token(agent_name, "\n\n".join(t for t in texts if t))
+
+        part_metrics = [{} for _ in prompts]
+        replies = []
+        if prompts:
+            with ThreadPoolExecutor(max_workers=min(len(prompts), PARALLEL_AGENT_CALLS),
+                                    initializer=self.reporter.bind_thread) as pool:
+                futures = [
+                    pool.submit(
+                        self._call, agent_name, prompt,
+                        partial(on_token, index) if self.reporter.streaming else None, part_metrics[index],
+                    )
+                    for index, prompt in enumerate(prompts)
+                ]
+                replies = [future.result() for future in futures]
+        outputs, steps = [], []
+        for reply in replies:
+            output, reply_steps = parse_next_steps(reply)
+            outputs.append(output)
+            steps += [step for step in reply_steps if step not in steps]
+        output = combine(outputs) if combine else "\n\n".join(outputs)
+        if self.reporter.streaming:
+            self.reporter.stage_token(agent_name, output, final=True)
+        metrics = {
+            "ttft": min((m["ttft"] for m in part_metrics), default=0.0),
+            "duration": round(time.perf_counter() - start, 3),
+            "cached": all(m["cached"] for m in part_metrics),
+            "calls": len(prompts),
+        }
+        self._completed(agent_name, key, output, steps, metrics)
+        return output
+
+    def complete(self, agent_name, prompt):
+        """One quick call outside any stage's reporting, without the shared
+        context. Returns the reply without next steps, or ``None``."""
+        profile = self.profiles[agent_name]
+        reply = call_agent(
+            agent_name, prompt, profile.model, self.api_key, use_cache=self.caching(agent_name), backend=self.backend,
+            max_output=profile.max_output, timeout=profile.timeout, fallback=profile.fallback,
+        )
+        if not reply:
+            return None
+        self._count(agent_name, AGENT_PROMPTS[agent_name], prompt, reply)
+        return parse_next_steps(reply)[0]
+
+    def _call(self, agent_name, prompt, on_token, metrics):
+        context, report = self.context_for(agent_name, prompt)
+        with self._lock:
+            self.context_reports.setdefault(agent_name, report)
+        profile = self.profiles[agent_name]
+        raw = call_agent(
+            agent_name, prompt, profile.model, self.api_key, context,
+            on_token=on_token, metrics=metrics, use_cache=self.caching(agent_name),
+            on_error=self.reporter.error, backend=self.backend,
+            max_output=profile.max_output, timeout=profile.timeout, fallback=profile.fallback,
+        )
+        if not raw:
+            raise StageFailed(f"{agent_name} returned no output")
+        self._count(agent_name, AGENT_PROMPTS[agent_name], context, prompt, raw)
+        return raw
+
+    def _count(self, agent_name, *texts):
+        tokens = sum(count_tokens(text) for text in texts)
+        with self._lock:
+            self.tokens[agent_name] = self.tokens.get(agent_name, 0) + tokens
+
+    def _completed(self, agent_name, key, output, steps, metrics):
+        with self._lock:
+            self.next_steps[agent_name] = steps
+            self.timings[agent_name] = metrics
+            done = len(self.timings)
+        self.reporter.stage_completed(agent_name, key, output, metrics)
+        self.reporter.progress(done / self.agent_count)
+
+    def checkpoint_key(self, stage, inputs):
+        """Hash of everything ``stage`` reads: the brief, the model, the
+        shared context and the stage inputs."""
+        profile = asdict(self.profiles[stage.agent]) if stage.agent else None
+        return make_cache_key(
+            "checkpoint", stage.name, stage.run.__name__, MODEL_MAP[self.model], profile, self.inputs,
+            self.context_info, inputs,
+        )
+
+    def checkpoint(self, stage, outputs, seconds):
+        """What ``restore`` needs to replay ``stage`` without running it."""
+        agent = stage.agent
+        with self._lock:
+            return {
+                "outputs": {key: outputs[key] for key in stage.outputs},
+                "seconds": round(seconds, 3),
+                "tokens": self.tokens.get(agent, 0),
+                "next_steps": self.next_steps.get(agent, []),
+                "context_report": self.context_reports.get(agent),
+            }
+
+    def restore(self, stage, checkpoint):
+        """Replay a checkpointed stage: report its agent as done and return
+        the saved outputs."""
+        with self._lock:
+            self.restored.append(
+                {"stage": stage.name, "seconds": checkpoint["seconds"], "tokens": checkpoint["tokens"]}
+            )
+            if stage.agent and checkpoint["context_report"]:
+                self.context_reports.setdefault(stage.agent, checkpoint["context_report"])
+        if stage.agent:
+            key = stage.outputs[0]
+            metrics = {"ttft": 0.0, "duration": 0.0, "cached": True, "restored": True}
+            self._completed(stage.agent, key, checkpoint["outputs"][key], checkpoint["next_steps"], metrics)
+        return checkpoint["outputs"]
+
+
+def checkpointed(stage, restore=True):
+    """Wrap ``stage`` so its outputs are saved to the checkpoint store.
+
+    With ``restore``, a stage whose inputs hash to a saved checkpoint is
+    replayed from it instead of running, so a rerun of a failed brief picks
+    up at the first stage that did not finish."""
+
+    def run_stage(run, inputs):
+        store = get_checkpoint_store()
+        key = run.checkpoint_key(stage, inputs)
+        saved = store.get(key) if restore else None
+        if saved is not None:
+            return run.restore(stage, json.loads(saved))
+        start = time.perf_counter()
+        outputs = stage.run(run, inputs)
+        seconds = time.perf_counter() - start
+        if all(key in outputs for key in stage.outputs):
+            store.set(key, json.dumps(run.checkpoint(stage, outputs, seconds)), duration=seconds)
+        return outputs
+
+    return replace(stage, run=run_stage)
+
+
+def _strategist_stage(run, inputs):
+    brief = run.inputs
+    strategist_prompt = f"""
+    Content Type: {brief['content_type']}
+    Topic: {brief['topic']}
+    Target Audience: {brief['audience']}
+    Length: {brief['length']}
+    Key Messages: {brief['key_messages']}
+    Brand Voice: {run.brand_voice}
+    
+    Create a comprehensive content strategy with outline.
+    """
+    return {"strategy": run.agent("Strategist", strategist_prompt, "strategy")}
+
+
+def _plan_seo_stage(run, inputs):
+    upstream = run.upstream("SEO Specialist", strategy=inputs["strategy"])
+    seo_prompt = f"""
+        Analyze search opportunities for the topic "{run.inputs['topic']}" based on this strategy:
+        {upstream['strategy']}
+
+        Provide at least 15 high-potential search query fanouts across these types:
+        reformulation, implicit, comparative, entity_expansion, personalized, temporal, location, user_intent, technical.
+        Return them as bullet points under the heading "Search Queries:" using the format "<Type>: <Search query> - <brief note>".
+        """
+    return {"seo_content": run.agent("SEO Specialist", seo_prompt, "seo_content")}
+
+
+def _seo_stage(run, inputs):
+    upstream = run.upstream("SEO Specialist", strategy=inputs["strategy"])
+    seo_prompt = f"""
+        Analyze search opportunities for the topic "{run.inputs['topic']}" using these keywords: {run.inputs['keywords']}
+        {upstream['strategy']}
+
+        Provide at least 15 high-potential search query fanouts across these types:
+        reformulation, implicit, comparative, entity_expansion, personalized, temporal, location, user_intent, technical.
+        Return them as bullet points under the heading "Search Queries:" using the format "<Type>: <Search query> - <brief note>".
+        """
+    return {"seo_content": run.agent("SEO Specialist", seo_prompt, "seo_content")}
+
+
+def _parse_queries_stage(run, inputs):
+    parsed_queries = []
+    for query, duplicates in collapse_near_duplicates(
+        parse_queries(inputs["seo_content"]), key=lambda q: q["query"], threshold=NEAR_DUPLICATE_THRESHOLD
+    ):
+        parsed_queries.append({**query, "duplicates": duplicates})
+    return {"queries_typed": parsed_queries, "queries": [q["query"] for q in parsed_queries]}
+
+
+def _writer_stage(run, inputs):
+    brief = run.inputs
+    outline = extract_outline(inputs["strategy"]) if brief["length"] in SECTIONED_LENGTHS else []
+    if outline:
+        return {"draft": _draft_sections(run, inputs, outline)}
+    upstream = run.upstream("Specialist Writer", strategy=inputs["strategy"], queries=", ".join(inputs["queries"]))
+    writer_prompt = f"""
+        Based on this strategy:
+        {upstream['strategy']}
+
+        Incorporate relevant search intent from these queries:
+        {upstream['queries']}
+
+        Write the full content for a {brief['content_type']} about {brief['topic']}.
+        Target audience: {brief['audience']}
+        Length: {brief['length']}
+        Key messages to include: {brief['key_messages']}
+        Voice: {run.brand_voice}
+        """
+    return {"draft": run.agent("Specialist Writer", writer_prompt, "draft")}
+
+
+def _draft_sections(run, inputs, outline):
+    """Draft each outline section in its own concurrent call, then smooth
+    the transitions between them."""
+    brief = run.inputs
+    words = SECTIONED_LENGTHS[brief["length"]] // len(outline)
+    numbered = "\n".join(f"{number}. {heading}" for number, heading in enumerate(outline, 1))
+    upstream = run.upstream("Specialist Writer", strategy=inputs["strategy"], queries=", ".join(inputs["queries"]))
+    prompts = []
+    for index, heading in enumerate(outline):
+        previous = f'The previous section is "{outline[index - 1]}".' if index else "This section opens the piece."
+        following = (
+            f'The next section is "{outline[index + 1]}".' if index + 1 < len(outline) else "This section closes the piece."
+        )
+        prompts.append(f"""
+        Based on this strategy:
+        {upstream['strategy']}
+
+        Incorporate relevant search intent from these queries:
+        {upstream['queries']}
+
+        You are writing one section of a {brief['content_type']} about {brief['topic']}. The other sections are
+        being written at the same time from this outline:
+        {numbered}
+
+        Write only section {index + 1}: "{heading}". {previous} {following}
+        Do not cover what belongs to other sections. Start with the line "{heading}" and aim for about {words} words.
+        Target audience: {brief['audience']}
+        Key messages to include where they fit: {brief['key_messages']}
+        Voice: {run.brand_voice}
+        """)
+
+    def combine(outputs):
+        sections = [ContentSection(heading, strip_heading(text, heading)) for heading, text in zip(outline, outputs)]
+        return join_sections(smooth_transitions(run, sections))
+
+    return run.agent_parallel("Specialist Writer", prompts, "draft", combine)
+
+
+def smooth_transitions(run, sections):
+    """Rewrite the opening paragraph of every section after the first so it
+    follows on from the end of the one before.
+
+    All seams are sent at once and each call only carries two paragraphs. A
+    seam whose reply is missing or does not look like one paragraph keeps
+    the original text."""
+    seams = [
+        (index, paragraphs(sections[index - 1].body), paragraphs(sections[index].body))
+        for index in range(1, len(sections))
+    ]
+    seams = [(index, before[-1], after[0]) for index, before, after in seams if before and after]
+
+    def smooth(seam):
+        index, before, after = seam
+        return run.complete("Specialist Writer", f"""
+        Two consecutive sections of a {run.inputs['content_type']} about {run.inputs['topic']} were written
+        separately. Rewrite the opening paragraph of the second section so it follows on naturally from the
+        end of the first. Keep its facts, meaning and length. Voice: {run.brand_voice}
+        Return only the rewritten paragraph, with no next steps.
+
+        End of "{sections[index - 1].heading}":
+        {before}
+
+        Opening of "{sections[index].heading}":
+        {after}
+        """)
+
+    if not seams:
+        return sections
+    with ThreadPoolExecutor(max_workers=min(len(seams), PARALLEL_AGENT_CALLS)) as pool:
+        replies = list(pool.map(smooth, seams))
+    smoothed = [ContentSection(section.heading, section.body) for section in sections]
+    for (index, _, after), reply in zip(seams, replies):
+        reply = (reply or "").strip()
+        if reply and "\n\n" not in reply and len(reply) <= 2 * len(after) + 200:
+            smoothed[index].body = smoothed[index].body.replace(after, reply, 1)
+    return smoothed
+
+
+def _plan_head_stage(run, inputs):
+    upstream = run.upstream("Head of Content", strategy=inputs["strategy"], seo_content=inputs["seo_content"])
+    head_prompt = f"""
+        Using the strategy and SEO analysis below, create a comprehensive content plan and brief for "{run.inputs['topic']}". Highlight key messages, structure recommendations and how the fanout queries can be used.
+
+        Strategy:
+        {upstream['strategy']}
+
+        SEO Analysis:
+        {upstream['seo_content']}
+        """
+    return {"polished": run.agent("Head of Content", head_prompt, "polished")}
+
+
+def _head_stage(run, inputs):
+    sections = split_sections(inputs["draft"])
+    if len(sections) >= MIN_SECTIONS:
+        return _refine_sections(run, sections)
+    upstream = run.upstream("Head of Content", draft=inputs["draft"])
+    head_prompt = f"""
+        Refine this content for brand alignment and compliance.
+        Brand voice: {run.brand_voice}
+        Compliance requirements: {run.inputs['compliance']}
+
+        Content to refine:
+        {upstream['draft']}
+
+        Return the full refined content.
+        """
+    polished = run.agent("Head of Content", head_prompt, "polished")
+    return {"polished": polished, "refinement": {"sections": 1, "regenerated": 1, "reused": 0}}
+
+
+SECTION_REFINEMENT_PROMPT = """
+        Refine {where} of a {content_type} about {topic} for brand alignment and
+        compliance. The piece has these sections:
+        {outline}
+
+        Brand voice: {brand_voice}
+        Compliance requirements: {compliance}
+
+        Section to refine:
+        {section}
+
+        Return only the refined section. {start}Return it unchanged if it needs no changes.
+        """
+
+
+def _refinement_key(run, text):
+    # The outline is left out so that editing one section keeps the others cached
+    profile = run.profiles["Head of Content"]
+    return make_cache_key(
+        "refined_section", MODEL_MAP[profile.model], output_limit_param(profile.model), profile.max_output,
+        AGENT_PROMPTS["Head of Content"], SECTION_REFINEMENT_PROMPT, run.inputs["topic"],
+        run.inputs["content_type"], run.brand_voice, run.inputs["compliance"], text,
+    )
+
+
+def _refine_sections(run, sections):
+    """Refine every section in its own concurrent call.
+
+    A section whose text was refined before for the same topic and content
+    type, with the same model, output budget, instructions, voice and
+    compliance rules, or which is itself such a refined version, is reused
+    from the response cache instead of being sent again."""
+    cache = get_response_cache() if run.caching("Head of Content") else None
+    refined = [cache.get(_refinement_key(run, section.text)) if cache else None for section in sections]
+    outline = "\n".join(f"- {section.heading or '(opening)'}" for section in sections)
+    stale = [index for index, text in enumerate(refined) if text is None]
+    prompts = []
+    for index in stale:
+        section = sections[index]
+        where = f'the section "{section.heading}"' if section.heading else "the opening, which has no heading"
+        start = f'Start with the line "{section.heading}". ' if section.heading else ""
+        prompts.append(SECTION_REFINEMENT_PROMPT.format(
+            where=where, content_type=run.inputs["content_type"], topic=run.inputs["topic"], outline=outline,
+            brand_voice=run.brand_voice, compliance=run.inputs["compliance"], section=section.text, start=start,
+        ))
+
+    def combine(outputs):
+        for index, output in zip(stale, outputs):
+            heading = sections[index].heading
+            refined[index] = ContentSection(heading, strip_heading(output, heading) if heading else output).text
+            if cache is not None:
+                for text in (sections[index].text, refined[index]):
+                    cache.set(_refinement_key(run, text), refined[index])
+        return join_sections([ContentSection("", text) for text in refined])
+
+    polished = run.agent_parallel("Head of Content", prompts, "polished", combine)
+    return {
+        "polished": polished,
+        "refinement": {"sections": len(sections), "regenerated": len(stale), "reused": len(sections) - len(stale)},
+    }
+
+
+def _editor_stage(run, inputs):
+    upstream = run.upstream("Editor-in-Chief", polished=inputs["polished"])
+    editor_prompt = f"""
+        Review this final content for approval.
+        Original topic: {run.inputs['topic']}
+        Content type: {run.inputs['content_type']}
+
+        Content to review:
+        {upstream['polished']}
+        """
+    return {"editor_review": run.agent("Editor-in-Chief", editor_prompt, "editor_review")}
+
+
+def _plan_verdict_stage(run, inputs):
+    return {
+        "final_title": run.inputs["topic"],
+        "final_content": inputs["polished"],
+        "approval": "Plan Complete",
+        "score": "N/A",
+        "comments": "",
+    }
+
+
+def _verdict_stage(run, inputs):
+    # Parse editor review
+    approval = "Approved"
+    score = "8/10"
+    comments = ""
+    final_title = run.inputs["topic"]
+    try:
+        for line in inputs["editor_review"].split('\n'):
+            if "APPROVAL:" in line:
+                approval = line.split("APPROVAL:")[1].strip()
+            elif "SCORE:" in line:
+                score = line.split("SCORE:")[1].strip()
+            elif "COMMENTS:" in line:
+                comments = line.split("COMMENTS:")[1].strip()
+            elif "FINAL_TITLE:" in line:
+                final_title = line.split("FINAL_TITLE:")[1].strip()
+    except Exception:
+        approval = "Approved"
+        score = "8/10"
+        comments = "Content meets quality standards."
+        final_title = run.inputs["topic"]
+    return {
+        "final_title": final_title,
+        "final_content": inputs["polished"],
+        "approval": approval,
+        "score": score,
+        "comments": comments,
+    }
+
+
+def _coverage_stage(run, inputs):
+    return {"coverage": score_coverage(inputs["final_content"], inputs["queries_typed"])}
+
+
+VERDICT_KEYS = ("final_title", "final_content", "approval", "score", "comments")
+
+# Planning Mode: strategy, search queries and a content plan, no drafting
+PLAN_STAGES = [
+    Stage("strategist", _strategist_stage, (), ("strategy",), "Strategist"),
+    Stage("seo", _plan_seo_stage, ("strategy",), ("seo_content",), "SEO Specialist"),
+    Stage("parse_queries", _parse_queries_stage, ("seo_content",), ("queries_typed", "queries")),
+    Stage("head_of_content", _plan_head_stage, ("strategy", "seo_content"), ("polished",), "Head of Content"),
+    Stage("verdict", _plan_verdict_stage, ("polished",), VERDICT_KEYS),
+    Stage("coverage", _coverage_stage, ("final_content", "queries_typed"), ("coverage",)),
+]
+
+# Full run: all five agents from strategy to editorial approval. Every stage
+# needs the one before, so the stages run one after another.
+FULL_STAGES = [
+    Stage("strategist", _strategist_stage, (), ("strategy",), "Strategist"),
+    Stage("seo", _seo_stage, ("strategy",), ("seo_content",), "SEO Specialist"),
+    Stage("parse_queries", _parse_queries_stage, ("seo_content",), ("queries_typed", "queries")),
+    Stage("writer", _writer_stage, ("strategy", "queries"), ("draft",), "Specialist Writer"),
+    Stage("head_of_content", _head_stage, ("draft",), ("polished", "refinement"), "Head of Content"),
+    Stage("editor", _editor_stage, ("polished",), ("editor_review",), "Editor-in-Chief"),
+    Stage("verdict", _verdict_stage, ("editor_review", "polished"), VERDICT_KEYS),
+    Stage("coverage", _coverage_stage, ("final_content", "queries_typed"), ("coverage",)),
+]
+
+
+def run_content_pipeline(inputs, model, api_key, plan_mode=False, reporter=None, use_cache=True, backend=None,
+                         resume=None, rerun_from=None, routing=True):
+    """Run the full 5-agent content creation pipeline
+
+    Parameters
+    ----------
+    inputs : dict
+        Brief fields: ``content_type``, ``topic``, ``audience``, ``length``,
+        ``key_messages``, ``brand_voice``, ``keywords``, ``compliance`` and
+        ``references``.
+
+    plan_mode : bool
+        Run ``PLAN_STAGES`` instead of ``FULL_STAGES``.
+
+    reporter : PipelineReporter, optional
+        Receives stage, progress and streaming events.
+
+    use_cache : bool
+        Reuse cached agent replies for unchanged prompts.
+
+    backend : callable, optional
+        LLM backend passed to ``call_agent``.
+
+    resume : bool, optional
+        Replay stages whose inputs match a saved checkpoint instead of
+        running them. Defaults to ``use_cache``. Every stage that completes
+        is checkpointed either way, so a failed run can be resumed.
+
+    rerun_from : str, optional
+        Name of a stage to run again, with every stage downstream of it and
+        without cached replies; the stages upstream are replayed from their
+        checkpoints.
+
+    routing : bool
+        Give each agent the model and output budget ``MODEL_ROUTES`` assigns
+        it for this content type and length, with ``model`` as the default.
+        Without routing every agent uses ``model``.
+
+    Returns the results dict, or ``None`` if an agent call failed. The
+    ``timeline`` entry lists when each stage ran and ``critical_path`` the
+    stages that determined the total run time. ``context_reports`` records,
+    per agent, how the ``CONTEXT_BUDGETS`` entry for its model was spent and
+    which knowledge chunks were retrieved for it. ``resume`` lists the
+    stages replayed from checkpoints and the time and estimated tokens
+    their original runs took. ``profiles`` holds each agent's model, output
+    budget and fallback.
+    """
+    reporter = reporter or PipelineReporter()
+    stages = PLAN_STAGES if plan_mode else FULL_STAGES
+    rerun = downstream_stages(stages, rerun_from) if rerun_from else set()
+    resume = rerun_from is not None or (use_cache if resume is None else resume)
+
+    brief_text = (
+        f"Content Type: {inputs['content_type']}\n"
+        f"Topic: {inputs['topic']}\n"
+        f"Target Audience: {inputs['audience']}\n"
+        f"Length: {inputs['length']}\n"
+        f"Key Messages: {inputs['key_messages']}\n"
+        f"Brand Voice: {inputs['brand_voice'] or 'Professional, data-driven, friendly'}\n"
+        f"SEO Keywords: {inputs['keywords']}\n"
+        f"Compliance Requirements: {inputs['compliance']}"
+    )
+    sections = [
+        ContextSection("", brief_text, required=True),
+        ContextSection("Reference Materials", inputs["references"], weight=2.0),
+    ]
+
+    agents = [stage.agent for stage in stages if stage.agent]
+    fresh = [stage.agent for stage in stages if stage.name in rerun]
+    run = PipelineRun(inputs, model, api_key, sections, reporter, len(agents), use_cache, backend, fresh, routing)
+    reporter.start([agent for agent in AGENTS if agent not in agents])
+
+    results = {}
+    timeline = run_stage_graph(
+        [checkpointed(stage, resume and stage.name not in rerun) for stage in stages], results, context=run,
+        initializer=reporter.bind_thread,
+    )
+    if any(entry["status"] == "failed" for entry in timeline):
+        return None
+
+    reporter.finished()
+
+    results["next_steps"] = run.next_steps
+    results["context_info"] = run.context_info
+    results["context_reports"] = run.context_reports
+    results["timings"] = run.timings
+    results["profiles"] = {agent: asdict(run.profiles[agent]) for agent in agents}
+    results["timeline"] = timeline
+    results["critical_path"] = critical_path(stages, timeline)
+    results["resume"] = {
+        "restored": [entry["stage"] for entry in run.restored],
+        "seconds_saved": round(sum(entry["seconds"] for entry in run.restored), 3),
+        "tokens_saved": sum(entry["tokens"] for entry in run.restored),
+    }
+    return results
+
+
+def _parse_revision(revised):
+    """Split an Editor-in-Chief revision into content, approval and score."""
+    content_parts = revised.split("APPROVAL:")
+    revised_content = content_parts[0].strip()
+
+    approval = "Approved"
+    score = "9/10"
+
+    if len(content_parts) > 1:
+        meta_parts = content_parts[1]
+        if "Approved" in meta_parts:
+            approval = "Approved"
+        elif "Needs Revision" in meta_parts:
+            approval = "Needs Revision"
+
+        if "SCORE:" in meta_parts:
+            score = meta_parts.split("SCORE:")[1].strip().split('\n')[0]
+    return revised_content, approval, score
+
+
+def _score_value(score):
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*/\s*(\d+)", score)
+    return float(match.group(1)) / float(match.group(2)) if match and float(match.group(2)) else 1.0
+
+
+def route_feedback(sections, feedback, model, api_key, on_error=None, use_cache=True, backend=None):
+    """Return the indexes of the ``sections`` that ``feedback`` concerns.
+
+    The Editor-in-Chief only sees each heading and the start of its section,
+    so the call is short. Every section is returned when the reply asks for
+    all of them or names none. Returns ``None`` if the call fails."""
+    outline = "\n".join(
+        f"{number}. {section.heading or '(opening, no heading)'}: {section.body[:ROUTING_EXCERPT_CHARS]}"
+        for number, section in enumerate(sections, 1)
+    )
+    routing_prompt = f"""
+    Decide which sections of this content the following user feedback applies to.
+
+    Feedback: {feedback}
+
+    Sections:
+    {outline}
+
+    Reply with one line "SECTIONS: " followed by the numbers of the sections that need changes, separated by
+    commas, or "SECTIONS: all" if the feedback applies to the whole piece. Do not add next steps.
+    """
+    reply = call_agent(
+        "Editor-in-Chief", routing_prompt, model, api_key, on_error=on_error, use_cache=use_cache, backend=backend
+    )
+    if not reply:
+        return None
+    match = re.search(r"SECTIONS:\s*(.*)", reply, re.IGNORECASE)
+    picked = match.group(1) if match else ""
+    numbers = sorted({int(n) for n in re.findall(r"\d+", picked) if 1 <= int(n) <= len(sections)})
+    if re.search(r"\ball\b", picked, re.IGNORECASE) or not numbers:
+        return list(range(len(sections)))
+    return [number - 1 for number in numbers]
+
+
+def apply_revision(content, feedback, model, api_key, context="", on_error=None, use_cache=True, backend=None):
+    """Apply user feedback to revise content
+
+    Content with at least ``MIN_SECTIONS`` sections is revised as a patch:
+    ``route_feedback`` picks the sections the feedback concerns, only those
+    are rewritten, all at once, and they replace the originals in place. The
+    reply is then as long as the edit rather than the whole piece. The
+    approval is "Needs Revision" if any revised section needs it, and the
+    score is the lowest one given. Shorter content is revised in one call.
+
+    ``revision`` in the result holds the number of ``sections`` and the
+    ``revised`` headings ("" for an opening without one)."""
+    sections = split_sections(content)
+    if len(sections) < MIN_SECTIONS:
+        revision_prompt = f"""
+    Apply the following user feedback to revise this content:
+    
+    Feedback: {feedback}
+    
+    Current content:
+    {content}
+    
+    Provide the full revised content and then add:
+    APPROVAL: [Approved/Needs Revision]
+    SCORE: [X/10]
+    """
+        revised = call_agent(
+            "Editor-in-Chief", revision_prompt, model, api_key, context, on_error=on_error, use_cache=use_cache,
+            backend=backend
+        )
+        if not revised:
+            return None
+        revised_content, approval, score = _parse_revision(revised)
+        return {
+            "content": revised_content,
+            "approval": approval,
+            "score": score,
+            "revision": {"sections": 1, "revised": [""]},
+        }
+
+    targets = route_feedback(sections, feedback, model, api_key, on_error, use_cache, backend)
+    if targets is None:
+        return None
+    headings = "\n".join(f"- {section.heading or '(opening)'}" for section in sections)
+    errors = []
+
+    def revise(index):
+        section = sections[index]
+        start = f'Start with the line "{section.heading}". ' if section.heading else ""
+        section_prompt = f"""
+    Apply the following user feedback to one section of a longer piece. The other sections are not being
+    changed, so apply only the parts of the feedback that concern this section.
+
+    Feedback: {feedback}
+
+    The piece has these sections:
+    {headings}
+
+    Section to revise:
+    {section.text}
+
+    Return only the revised section. {start}Then add:
+    APPROVAL: [Approved/Needs Revision]
+    SCORE: [X/10]
+    """
+        # Errors are collected and reported from the calling thread
+        return call_agent(
+            "Editor-in-Chief", section_prompt, model, api_key, context, on_error=errors.append,
+            use_cache=use_cache, backend=backend
+        )
+
+    with ThreadPoolExecutor(max_workers=min(len(targets), PARALLEL_AGENT_CALLS)) as pool:
+        replies = list(pool.map(revise, targets))
+    for message in errors:
+        if on_error is not None:
+            on_error(message)
+        else:
+            logger.warning(message)
+    if not all(replies):
+        return None
+
+    revised_sections = list(sections)
+    approvals, scores = [], []
+    for index, reply in zip(targets, replies):
+        revised_text, approval, score = _parse_revision(parse_next_steps(reply)[0])
+        heading = sections[index].heading
+        body = strip_heading(revised_text, heading) if heading else revised_text
+        revised_sections[index] = ContentSection(heading, body)
+        approvals.append(approval)
+        scores.append(score)
+    return {
+        "content": join_sections(revised_sections),
+        "approval": "Needs Revision" if "Needs Revision" in approvals else "Approved",
+        "score": min(scores, key=_score_value),
+        "revision": {"sections": len(sections), "revised": [sections[index].heading for index in targets]},
+    }
@@ -0,0 +1,145 @@
+"""Sections of a piece of content.
+
+Agents are asked for plain text, so a section heading is a short line on
+its own, without closing punctuation, at the start of a paragraph block.
+Markdown ``#`` headings are recognised too. Long content is drafted,
+refined and revised section by section on top of this.
+"""
+
+import re
+from dataclasses import dataclass
+
+# Outlines with fewer sections are drafted in one call
+MIN_SECTIONS = 3
+MAX_SECTIONS = 8
+MAX_HEADING_CHARS = 80
+
+# Lines that introduce the section list, most specific first
+_OUTLINE_ANCHORS = (
+    re.compile(r"section flow|outline|sections", re.IGNORECASE),
+    re.compile(r"content architecture|structure", re.IGNORECASE),
+)
+_OUTLINE_END = re.compile(r"recommended next steps", re.IGNORECASE)
+_NUMBERED_ITEM = re.compile(r"^(\s*)(?:#{1,6}\s*)?(?:\*\*)?(?:section\s+)?(\d{1,2})[.):]\s+(.+)$", re.IGNORECASE)
+_BULLET_ITEM = re.compile(r"^(\s*)[-*•]\s+(.+)$")
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$")
+
+
+@dataclass
+class ContentSection:
+    """A heading and the text under it; the intro before the first heading
+    has an empty heading."""
+
+    heading: str
+    body: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.heading}\n{self.body}" if self.heading else self.body
+
+
+def clean_heading(line: str) -> str:
+    """Strip Markdown markers and a trailing colon from a heading line."""
+    line = _MARKDOWN_HEADING.sub(r"\1", line.strip())
+    return line.replace("**", "").strip().rstrip(":").strip()
+
+
+def _numbered_run(lines: list[str]) -> list[str]:
+    """Items of the first list numbered 1, 2, 3, ... at one indentation."""
+    run, indent = [], None
+    for line in lines:
+        match = _NUMBERED_ITEM.match(line)
+        if not match:
+            continue
+        if match.group(2) == "1":
+            if len(run) >= MIN_SECTIONS:
+                break
+            run, indent = [match.group(3)], match.group(1)
+        elif run and match.group(1) == indent and int(match.group(2)) == len(run) + 1:
+            run.append(match.group(3))
+    return run if len(run) >= MIN_SECTIONS else []
+
+
+def _bullet_run(lines: list[str]) -> list[str]:
+    """Items of the first bullet list, at the indentation of its first item."""
+    run, indent = [], None
+    for line in lines:
+        match = _BULLET_ITEM.match(line)
+        if indent is None:
+            if match:
+                run, indent = [match.group(2)], match.group(1)
+            continue
+        if match and match.group(1) == indent:
+            run.append(match.group(2))
+        elif line.strip() and len(line) - len(line.lstrip()) <= len(indent):
+            break
+    return run
+
+
+def extract_outline(strategy: str, max_sections: int = MAX_SECTIONS) -> list[str]:
+    """Return the section headings of the Strategist's content architecture.
+
+    Looks after the line that introduces the section flow or outline (or,
+    failing that, the content architecture) for a list numbered from 1, or
+    else for a bullet list. Returns ``[]`` when fewer than ``MIN_SECTIONS``
+    are found, so callers can fall back to one draft."""
+    lines = strategy.splitlines()
+    end = next((i for i, line in enumerate(lines) if _OUTLINE_END.search(line)), len(lines))
+    for anchor in _OUTLINE_ANCHORS:
+        start = next((i for i, line in enumerate(lines[:end]) if anchor.search(line)), None)
+        if start is None:
+            continue
+        items = _numbered_run(lines[start + 1:end]) or _bullet_run(lines[start + 1:end])
+        headings = [heading for heading in map(clean_heading, items) if heading][:max_sections]
+        if len(headings) >= MIN_SECTIONS:
+            return headings
+    return []
+
+
+def _is_heading(line: str, has_body: bool) -> bool:
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    line = line.strip()
+    return (
+        has_body and 0 < len(line) <= MAX_HEADING_CHARS
+        and line[0].isupper() and line[-1] not in ".!?,;"
+    )
+
+
+def split_sections(text: str) -> list[ContentSection]:
+    """Split content at its heading lines, keeping everything in order.
+
+    A heading is a Markdown heading, or a short capitalised line without
+    closing punctuation that starts a paragraph block followed by text."""
+    sections = [ContentSection("", "")]
+    body: list[str] = []
+    blocks = re.split(r"\n\s*\n", text.strip())
+    for index, block in enumerate(blocks):
+        first, _, rest = block.partition("\n")
+        has_body = bool(rest.strip()) or index + 1 < len(blocks)
+        if _is_heading(first, has_body):
+            sections[-1].body = "\n\n".join(body)
+            sections.append(ContentSection(clean_heading(first), ""))
+            body = [rest.strip()] if rest.strip() else []
+        else:
+            body.append(block.strip())
+    sections[-1].body = "\n\n".join(body)
+    if not sections[0].body:
+        sections.pop(0)
+    return sections
+
+
+def join_sections(sections: list[ContentSection]) -> str:
+    return "\n\n".join(section.text for section in sections if section.text)
+
+
+def paragraphs(body: str) -> list[str]:
+    return [part.strip() for part in re.split(r"\n\s*\n", body) if part.strip()]
+
+
+def strip_heading(text: str, heading: str) -> str:
+    """Drop a leading line that repeats ``heading`` from an agent's reply."""
+    first, _, rest = text.strip().partition("\n")
+    if clean_heading(first).lower() == heading.lower():
+        return rest.strip()
+    return text.strip()
@@ -0,0 +1,173 @@
+"""Token counting and budgeted assembly of the shared agent context.
+
+Token counts are a local approximation of a BPE tokenizer: short words and
+punctuation marks are one token each, long words and numbers are split into
+several. That is close enough to budget prompts without shipping a vocabulary.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# Words, runs of digits, or single punctuation marks
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece.isdigit():
+        return 1 + (len(piece) - 1) // 3
+    if piece.isalpha():
+        return 1 + (len(piece) - 1) // 5
+    return 1
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of model tokens in ``text``."""
+    return sum(_piece_tokens(piece) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to at most ``max_tokens`` tokens.
+
+    The cut moves back to the previous line break when that keeps at least
+    80% of the allowed text, so excerpts end on whole lines."""
+    if max_tokens <= 0:
+        return ""
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            end = match.start()
+            break
+    else:
+        return text
+    line_end = text.rfind("\n", 0, end)
+    if line_end >= 0.8 * end:
+        end = line_end
+    return text[:end].rstrip()
+
+
+def _water_fill(needs: list[int], weights: list[float], budget: int) -> list[int]:
+    """Share ``budget`` tokens by weight, giving what a small need does not
+    use to the larger ones. Returns the tokens allowed for each need."""
+    allowed = [0] * len(needs)
+    remaining = max(0, budget)
+    active = [i for i, need in enumerate(needs) if need]
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active) or 1.0
+        shares = {i: remaining * weights[i] / total_weight for i in active}
+        satisfied = [i for i in active if needs[i] <= shares[i]]
+        if not satisfied:
+            for i in active:
+                allowed[i] = int(shares[i])
+            break
+        for i in satisfied:
+            allowed[i] = needs[i]
+            remaining -= needs[i]
+            active.remove(i)
+    return allowed
+
+
+def fit_texts(texts: dict[str, str], budget: int) -> tuple[dict[str, str], list[dict]]:
+    """Cut the named ``texts`` so that together they fit ``budget`` tokens.
+
+    Each gets an equal share, and what a short text does not need goes to
+    the longer ones. A cut text ends in " ...". Returns the texts and a
+    report entry per text, in the format of ``assemble_context``."""
+    needs = [count_tokens(text) for text in texts.values()]
+    allowed = _water_fill(needs, [1.0] * len(needs), budget)
+    fitted = {}
+    report = []
+    for (name, text), need, share in zip(texts.items(), needs, allowed):
+        if share < need:
+            text = truncate_to_tokens(text, share - 3)
+            text = text + " ..." if text else ""
+        fitted[name] = text
+        included = count_tokens(text)
+        report.append({"section": name, "tokens": need, "included": included, "dropped": need - included})
+    return fitted, report
+
+
+@dataclass
+class ContextSection:
+    """One block of the shared context.
+
+    ``required`` sections are always included in full (budget permitting).
+    The rest share whatever budget is left in proportion to ``weight``.
+
+    A section built from ``chunks`` (best first) is cut by dropping whole
+    chunks rather than mid-text."""
+
+    label: str
+    text: str = ""
+    weight: float = 1.0
+    required: bool = False
+    chunks: list[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.chunks and not self.text:
+            self.text = "\n\n".join(self.chunks)
+
+    def render(self, text: str) -> str:
+        return f"{self.label}:\n{text}" if self.label else text
+
+
+def assemble_context(sections: list[ContextSection], budget: int) -> tuple[str, list[dict]]:
+    """Fit ``sections`` into ``budget`` tokens.
+
+    Returns the context text and a report with one entry per section giving
+    its size in ``tokens`` and how many were ``included`` and ``dropped``.
+    Entries for chunked sections also list the indices of the ``chunks``
+    that made it in.
+
+    Optional sections are water-filled: each gets a share of the remaining
+    budget by weight, and whatever a small section does not need is shared
+    out again among the larger ones."""
+    needs = [count_tokens(section.render(section.text)) for section in sections]
+    allowed = [0] * len(sections)
+    remaining = max(0, budget)
+
+    for i, section in enumerate(sections):
+        if section.required:
+            allowed[i] = min(needs[i], remaining)
+            remaining -= allowed[i]
+
+    optional = [i for i, section in enumerate(sections) if not section.required]
+    shares = _water_fill([needs[i] for i in optional], [sections[i].weight for i in optional], remaining)
+    for i, share in zip(optional, shares):
+        allowed[i] = share
+
+    parts = []
+    report = []
+    for i, section in enumerate(sections):
+        text = section.text
+        kept = list(range(len(section.chunks)))
+        if allowed[i] < needs[i] and section.chunks:
+            # Skip a chunk that does not fit, a smaller one further down may
+            room = allowed[i] - count_tokens(section.render(""))
+            kept = []
+            for index, chunk in enumerate(section.chunks):
+                size = count_tokens(chunk)
+                if size <= room:
+                    kept.append(index)
+                    room -= size
+            text = "\n\n".join(section.chunks[index] for index in kept) or None
+        elif allowed[i] < needs[i]:
+            # Leave room for the label and the " ..." marking the cut
+            header = count_tokens(section.render(""))
+            text = truncate_to_tokens(section.text, allowed[i] - header - 3)
+            text = text + " ..." if text else None
+        included = 0
+        if text is not None:
+            rendered = section.render(text)
+            parts.append(rendered)
+            included = count_tokens(rendered)
+        entry = {
+            "section": section.label or "Brief",
+            "tokens": needs[i],
+            "included": included,
+            "dropped": needs[i] - included,
+        }
+        if section.chunks:
+            entry["chunks"] = kept
+        report.append(entry)
+    return "\n".join(parts), report
@@ -0,0 +1,136 @@
+"""Local text embeddings from hashed word and character n-grams.
+
+Each text is turned into word unigrams, word bigrams and character trigrams.
+Every feature is hashed to one of ``dim`` columns with a hashed sign, so
+collisions cancel out on average instead of piling up. Rows are L2
+normalised, which makes cosine similarity a plain dot product and lets whole
+query lists be compared with one matrix multiply.
+
+The vectors capture lexical overlap ("tracing tools" is close to "best
+tracing tool"), not meaning, and need no model download.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+# Relative weight of each feature family. Character trigrams are numerous,
+# so they are damped to keep word overlap the dominant signal.
+FEATURE_WEIGHTS = {"w": 1.0, "b": 1.0, "c": 0.3}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def text_features(text: str) -> list[str]:
+    """Return the n-gram features of ``text``, prefixed by family."""
+    words = _WORD_PATTERN.findall(text.lower())
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_slot(feature: str, dim: int) -> tuple[int, float]:
+    digest = zlib.crc32(feature.encode("utf-8"))
+    sign = 1.0 if digest & 0x80000000 else -1.0
+    return digest % dim, sign * FEATURE_WEIGHTS[feature[0]]
+
+
+def embed_texts(texts: list[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed ``texts`` as an ``(len(texts), dim)`` float32 array of unit rows.
+
+    A text with no words embeds as a zero row."""
+    rows, cols, values = [], [], []
+    for row, text in enumerate(texts):
+        for feature in text_features(text):
+            col, value = _feature_slot(feature, dim)
+            rows.append(row)
+            cols.append(col)
+            values.append(value)
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+              np.asarray(values, dtype=np.float32))
+    return normalize_rows(vectors)
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed a single text; see ``embed_texts``."""
+    return embed_texts([text], dim)[0]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length, leaving zero rows at zero."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def cosine_matrix(a: np.ndarray, b: np.ndarray | None = None) -> np.ndarray:
+    """Cosine similarity between every row of ``a`` and every row of ``b``.
+
+    ``b`` defaults to ``a``. Rows need not be normalised beforehand."""
+    a = normalize_rows(np.atleast_2d(np.asarray(a, dtype=np.float32)))
+    b = a if b is None else normalize_rows(np.atleast_2d(np.asarray(b, dtype=np.float32)))
+    return a @ b.T
+
+
+# Largest similarity block held in memory at once
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _block_rows(n: int, block_rows: int | None) -> int:
+    return block_rows or max(1, MAX_BLOCK_BYTES // (4 * max(n, 1)))
+
+
+def iter_similarity_blocks(vectors: np.ndarray, block_rows: int | None = None):
+    """Yield ``(start, block)`` slices of the pairwise cosine matrix.
+
+    ``block`` holds rows ``start:start + len(block)`` against every row, so
+    only ``block_rows x n`` similarities exist at a time (by default about
+    ``MAX_BLOCK_BYTES``)."""
+    vectors = normalize_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+    rows = _block_rows(len(vectors), block_rows)
+    for start in range(0, len(vectors), rows):
+        yield start, vectors[start:start + rows] @ vectors.T
+
+
+def similarity_matrix(vectors: np.ndarray, block_rows: int | None = None) -> np.ndarray:
+    """Return the full ``n x n`` cosine matrix, computed block by block.
+
+    The result itself takes ``4 * n * n`` bytes; use ``top_k_neighbors`` when
+    only the nearest rows are needed."""
+    n = len(vectors)
+    matrix = np.empty((n, n), dtype=np.float32)
+    for start, block in iter_similarity_blocks(vectors, block_rows):
+        matrix[start:start + len(block)] = block
+    return matrix
+
+
+def top_k_neighbors(vectors: np.ndarray, k: int = 5, block_rows: int | None = None,
+                    exclude_self: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Return the ``k`` most similar rows for every row, best first.
+
+    Returns ``(indices, scores)``, both shaped ``(n, k)``. ``k`` is capped at
+    the number of other rows. Memory stays at one similarity block, so this
+    scales to tens of thousands of queries."""
+    n = len(vectors)
+    k = max(0, min(k, n - 1 if exclude_self else n))
+    indices = np.empty((n, k), dtype=np.intp)
+    scores = np.empty((n, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+    for start, block in iter_similarity_blocks(vectors, block_rows):
+        rows = np.arange(len(block))
+        if exclude_self:
+            block[rows, start + rows] = -np.inf
+        candidates = np.argpartition(block, n - k, axis=1)[:, n - k:]
+        candidate_scores = np.take_along_axis(block, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        indices[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(candidate_scores, order, axis=1)
+    return indices, scores
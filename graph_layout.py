@@ -0,0 +1,227 @@
+"""Server-side layout and compact HTML for query fan-out graphs.
+
+vis.js can lay a graph out in the browser with a force simulation, but that
+freezes the tab past a few hundred nodes. Here positions are computed once
+in NumPy: a spectral layout of the tree plus similarity edges gives the
+starting point, and a few vectorised Fruchterman-Reingold iterations spread
+the nodes out. The page is then drawn with physics disabled.
+
+Large fan-outs are cut to a level of detail first: levels below the deepest
+one that fits ``MAX_GRAPH_NODES`` are folded into one summary node per
+parent, labelled with how many queries it holds.
+"""
+
+import json
+
+import numpy as np
+
+MAX_GRAPH_NODES = 300
+# Average distance between connected nodes, in vis.js pixels
+NODE_SPACING = 250
+SPRING_ITERATIONS = 60
+# How many hidden queries a summary node tooltip lists
+FOLDED_PREVIEW = 5
+
+
+def subtree_sizes(parents) -> np.ndarray:
+    """Number of descendants of every node, for nodes listed parents first."""
+    sizes = np.zeros(len(parents), dtype=np.int64)
+    for child in range(len(parents) - 1, 0, -1):
+        sizes[parents[child]] += sizes[child] + 1
+    return sizes
+
+
+def detail_level(parents, levels, max_nodes: int = MAX_GRAPH_NODES) -> int:
+    """Deepest level to draw so that nodes plus summary nodes fit ``max_nodes``.
+
+    Never less than 1, so the base queries are always shown."""
+    levels = np.asarray(levels)
+    if len(levels) <= max_nodes:
+        return int(levels.max(initial=0))
+    sizes = subtree_sizes(parents)
+    best = 1
+    for level in range(1, int(levels.max()) + 1):
+        at_level = levels == level
+        visible = int((levels <= level).sum()) + int((at_level & (sizes > 0)).sum())
+        if visible > max_nodes:
+            break
+        best = level
+    return best
+
+
+def collapse_levels(parents, levels, max_level: int):
+    """Fold nodes deeper than ``max_level`` into their ancestor at that level.
+
+    Returns ``(kept, folded)``: the node ids still drawn, and a dict from
+    each ancestor at ``max_level`` to the ids of the nodes folded under it,
+    in fan-out order."""
+    anchors = np.arange(len(parents))
+    kept, folded = [], {}
+    for node in range(len(parents)):
+        if levels[node] <= max_level:
+            kept.append(node)
+            continue
+        anchors[node] = anchors[parents[node]]
+        folded.setdefault(int(anchors[node]), []).append(node)
+    return kept, folded
+
+
+def spectral_layout(n: int, edges, weights=None) -> np.ndarray:
+    """Place ``n`` nodes with the two smallest non-trivial eigenvectors of
+    the weighted graph Laplacian. Returns an ``(n, 2)`` array in [-1, 1]."""
+    if n < 3:
+        return np.array([[0.0, 0.0], [1.0, 0.0]][:n])
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    adjacency = np.zeros((n, n))
+    np.add.at(adjacency, (edges[:, 0], edges[:, 1]), weights)
+    np.add.at(adjacency, (edges[:, 1], edges[:, 0]), weights)
+    laplacian = np.diag(adjacency.sum(axis=1)) - adjacency
+    _, vectors = np.linalg.eigh(laplacian)
+    pos = vectors[:, 1:3]
+    # Eigenvector signs are arbitrary; fix them so layouts are reproducible
+    pos = pos * np.where(pos[np.abs(pos).argmax(axis=0), [0, 1]] < 0, -1, 1)
+    return pos / np.maximum(np.abs(pos).max(axis=0), 1e-9)
+
+
+def spring_layout(pos: np.ndarray, edges, weights=None, iterations: int = SPRING_ITERATIONS) -> np.ndarray:
+    """Refine ``pos`` with Fruchterman-Reingold forces, all pairs at once.
+
+    Connected nodes attract in proportion to their edge weight and every
+    pair repels. Returns positions scaled to ``NODE_SPACING``."""
+    n = len(pos)
+    pos = np.array(pos, dtype=np.float64)
+    if n < 2:
+        return pos * NODE_SPACING
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    k = 2.0 / np.sqrt(n)
+    temperature = 0.2
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=2), 1e-3)
+        force = (delta * (k * k / distance ** 2)[:, :, None]).sum(axis=1)
+        edge_delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+        edge_distance = np.maximum(np.linalg.norm(edge_delta, axis=1), 1e-3)
+        pull = edge_delta * (weights * edge_distance / k)[:, None]
+        np.add.at(force, edges[:, 0], -pull)
+        np.add.at(force, edges[:, 1], pull)
+        length = np.maximum(np.linalg.norm(force, axis=1), 1e-9)
+        pos += force / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.95
+    pos -= pos.mean(axis=0)
+    if len(edges):
+        scale = np.linalg.norm(pos[edges[:, 0]] - pos[edges[:, 1]], axis=1).mean()
+    else:
+        scale = k
+    return pos * (NODE_SPACING / max(scale, 1e-9))
+
+
+def layout_graph(n: int, edges, weights=None) -> np.ndarray:
+    """Spectral start refined by springs; see the module docstring."""
+    return spring_layout(spectral_layout(n, edges, weights), edges, weights)
+
+
+# Node styles live in vis.js groups, so each node only names its group
+GRAPH_GROUPS = {
+    "topic": {"color": {"background": "#18ff4e", "border": "#141517"}, "font": {"size": 16}},
+    "query": {"color": {"background": "#FFFFFF", "border": "#c9c7bb"}},
+    "folded": {"color": {"background": "#e8e6da", "border": "#999999"}, "shapeProperties": {"borderDashes": [4, 4]}},
+}
+
+# Backgrounds for topic groups, in group order
+GROUP_PALETTE = [
+    "#cfe8ff", "#ffe3c2", "#d9f2d0", "#f3d6f5", "#fff3b0", "#d6f0f0",
+    "#ffd6d6", "#e2dcff", "#e8f5c8", "#f5e0cc", "#d0e4f5", "#f0d9e6",
+]
+
+# Whether the SEO Specialist's type agrees with the automatic one, shown as
+# the node border so the group colour stays visible
+NODE_STATUS = {
+    "match": {"borderWidth": 3, "color": {"border": "#2e9e3e"}},
+    "mismatch": {"borderWidth": 3, "color": {"border": "#d9534f"}},
+}
+
+
+def palette_groups(count: int) -> dict:
+    """vis.js groups ``group0`` ... for ``count`` topic groups."""
+    return {
+        f"group{i}": {"color": {"background": GROUP_PALETTE[i % len(GROUP_PALETTE)], "border": "#c9c7bb"}}
+        for i in range(count)
+    }
+
+GRAPH_OPTIONS = {
+    "physics": {"enabled": False},
+    "layout": {"improvedLayout": False},
+    "nodes": {"shape": "box", "font": {"face": "sans-serif", "size": 13}, "scaling": {"min": 10, "max": 40}},
+    "edges": {"arrows": "to", "smooth": False, "color": {"color": "#b5b3a8"}, "scaling": {"min": 1, "max": 4}},
+    "interaction": {"hover": True, "tooltipDelay": 150, "hideEdgesOnDrag": True},
+    "groups": GRAPH_GROUPS,
+}
+
+GRAPH_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8">
+<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js"></script>
+<script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
+<style>
+body {margin: 0; background-color: #f7f6ed; font-family: -apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;}
+#mynetwork {width: 100%; height: __HEIGHT__; background-color: #f7f6ed;}
+.bar {text-align: center; margin-bottom: 10px;}
+.query-card {background-color: #FFFFFF; border-radius: 0.75rem; padding: 0.5rem 0.75rem; font-size: 0.85rem; max-width: 20rem;}
+.query-text {font-weight: 600; margin-bottom: 0.25rem;}
+.query-meta {font-size: 0.75rem; color: #555;}
+</style></head>
+<body>
+<div class="bar">
+  <button onclick="document.getElementById('mynetwork').requestFullscreen()">Full screen</button>
+  <button onclick="downloadPNG()">Download PNG</button>
+  <button onclick="downloadJSON()">Download JSON</button>
+</div>
+<div id="mynetwork"></div>
+<script>
+var graph = __GRAPH__;
+function line(cls, text){var d=document.createElement('div');d.className=cls;d.textContent=text;return d;}
+function card(n){
+  var c=document.createElement('div');c.className='query-card';
+  c.appendChild(line('query-text', n[1]));
+  n[6].forEach(function(t){c.appendChild(line('query-meta', t));});
+  return c;
+}
+var nodes = new vis.DataSet(graph.nodes.map(function(n){
+  var node={id:n[0], label:n[1], x:n[2], y:n[3], value:n[4], group:n[5], title:card(n)};
+  return n[7] ? Object.assign(node, graph.status[n[7]]) : node;
+}));
+var edges = new vis.DataSet(graph.edges.map(function(e){return {from:e[0], to:e[1], value:e[2]};}));
+var network = new vis.Network(document.getElementById('mynetwork'), {nodes:nodes, edges:edges}, graph.options);
+function downloadPNG(){
+  html2canvas(document.getElementById('mynetwork')).then(function(canvas){
+    var link=document.createElement('a');
+    link.href=canvas.toDataURL();
+    link.download='queries.png';
+    link.click();
+  });
+}
+function downloadJSON(){
+  var data={'nodes':nodes.get().map(function(n){return {id:n.id,label:n.label,x:n.x,y:n.y,group:n.group};}),'edges':edges.get()};
+  var link=document.createElement('a');
+  link.href='data:text/json;charset=utf-8,'+encodeURIComponent(JSON.stringify(data));
+  link.download='queries.json';
+  link.click();
+}
+</script>
+</body></html>
+"""
+
+
+def render_graph_html(nodes: list, edges: list, groups: dict | None = None, height: str = "450px") -> str:
+    """Render a positioned graph as a self-contained vis.js page.
+
+    ``nodes`` are ``[id, label, x, y, size, group, tooltip_lines, status]``
+    lists, where ``status`` is a ``NODE_STATUS`` key or ``None``, and
+    ``edges`` are ``[from, to, weight]`` lists. ``groups`` adds vis.js groups
+    to ``GRAPH_GROUPS``. Tooltips are built in the browser from the plain
+    text lines, so query text is never parsed as HTML."""
+    options = dict(GRAPH_OPTIONS, groups={**GRAPH_GROUPS, **(groups or {})})
+    graph = {"nodes": nodes, "edges": edges, "options": options, "status": NODE_STATUS}
+    payload = json.dumps(graph, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+    return GRAPH_TEMPLATE.replace("__HEIGHT__", height).replace("__GRAPH__", payload)
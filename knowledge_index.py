@@ -0,0 +1,140 @@
+"""BM25 retrieval over heading-level chunks of the knowledge base.
+
+Instead of handing every agent the first part of the concatenated knowledge
+files, each call asks the index for the chunks that best match its role and
+the topic at hand. The index is rebuilt only when the ``KnowledgeStore``
+reports a new version.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+
+from context_budget import count_tokens
+from knowledge_store import KNOWLEDGE_DIR, get_knowledge_store
+
+CHUNK_MAX_TOKENS = 350
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its of on or our so "
+    "that the their them they this to us we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words without stopwords, with plurals folded."""
+    terms = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def chunk_markdown(source: str, text: str, max_tokens: int = CHUNK_MAX_TOKENS) -> list[dict]:
+    """Split a Markdown document into one chunk per heading.
+
+    Each chunk records its ``source`` file and ``heading`` path (e.g.
+    ``Brand Style Guide > Our Voice``). Sections longer than ``max_tokens``
+    are split further at blank lines."""
+    chunks = []
+    # (level, title) of the enclosing headings, outermost first
+    path: list[tuple[int, str]] = []
+    lines: list[str] = []
+
+    def flush():
+        body = "\n".join(lines).strip()
+        lines.clear()
+        if not body:
+            return
+        heading = " > ".join(title for _, title in path) or source
+        part: list[str] = []
+        used = 0
+        for paragraph in re.split(r"\n\s*\n", body):
+            size = count_tokens(paragraph)
+            if part and used + size > max_tokens:
+                chunks.append({"source": source, "heading": heading, "text": "\n\n".join(part)})
+                part, used = [], 0
+            part.append(paragraph)
+            used += size
+        if part:
+            chunks.append({"source": source, "heading": heading, "text": "\n\n".join(part)})
+
+    for line in text.splitlines():
+        match = _HEADING_PATTERN.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2)))
+        else:
+            lines.append(line)
+    flush()
+    for chunk in chunks:
+        chunk["tokens"] = count_tokens(render_chunk(chunk))
+    return chunks
+
+
+def render_chunk(chunk: dict) -> str:
+    """Format a chunk for the prompt with its source as a label."""
+    return f"[{chunk['source']} > {chunk['heading']}]\n{chunk['text']}"
+
+
+class KnowledgeIndex:
+    """Okapi BM25 over a list of chunks."""
+
+    def __init__(self, chunks: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths = []
+        for i, chunk in enumerate(chunks):
+            # Headings say what a section is about, so they count twice
+            terms = tokenize(chunk["text"]) + tokenize(chunk["heading"]) * 2
+            self.lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                self.postings.setdefault(term, []).append((i, freq))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        n = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.chunks) - n + 0.5) / (n + 0.5))
+
+    def search(self, query: str, k: int = 5) -> list[tuple[float, dict]]:
+        """Return up to ``k`` ``(score, chunk)`` pairs, best first."""
+        scores: dict[int, float] = {}
+        for term, weight in Counter(tokenize(query)).items():
+            idf = self.idf(term)
+            for i, freq in self.postings.get(term, ()):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + weight * idf * freq * (self.k1 + 1) / (freq + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(round(score, 4), self.chunks[i]) for i, score in best]
+
+
+_indexes: dict[str, tuple[int, KnowledgeIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_knowledge_index(directory: str = KNOWLEDGE_DIR) -> KnowledgeIndex:
+    """Return the index for ``directory``, rebuilding it if files changed."""
+    store = get_knowledge_store(directory)
+    store.refresh()
+    with _indexes_lock:
+        cached = _indexes.get(store.directory)
+        if cached is None or cached[0] != store.version:
+            chunks = []
+            for name, text in store.documents().items():
+                chunks.extend(chunk_markdown(name, text))
+            cached = (store.version, KnowledgeIndex(chunks))
+            _indexes[store.directory] = cached
+        return cached[1]
@@ -0,0 +1,143 @@
+"""Process-wide, change-aware cache of the knowledge directory.
+
+Every pipeline run used to reread every Markdown file. The store keeps the
+parsed files in memory, keyed by path, and on each refresh only rereads a
+file whose modification time or size changed (and only treats it as changed
+if its SHA-256 differs). All Streamlit sessions and batch workers share one
+store per directory.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge")
+
+
+class KnowledgeStore:
+    """Markdown files of one directory, reloaded only when they change."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: dict[str, dict] = {}
+        self.version = 0
+        self.last_refresh = {"files": 0, "reloaded": 0, "removed": 0, "errors": 0, "elapsed_ms": 0.0}
+        self._text = ""
+        self._lock = threading.Lock()
+
+    def refresh(self) -> dict:
+        """Pick up added, changed and removed files; return refresh stats.
+
+        ``version`` increases whenever the combined text changes, so anything
+        derived from the store can tell when to rebuild."""
+        start = time.perf_counter()
+        with self._lock:
+            try:
+                entries = sorted(
+                    (entry for entry in os.scandir(self.directory)
+                     if entry.is_file() and entry.name.endswith(".md")),
+                    key=lambda entry: entry.name,
+                )
+            except OSError as e:
+                logger.warning("cannot list knowledge directory %s: %s", self.directory, e)
+                entries = []
+
+            changed = False
+            reloaded = errors = 0
+            seen = set()
+            for entry in entries:
+                seen.add(entry.name)
+                stat = entry.stat()
+                cached = self.files.get(entry.name)
+                if cached and (cached["mtime_ns"], cached["bytes"]) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                record = self._load(entry.path, entry.name, stat)
+                reloaded += 1
+                errors += bool(record["error"])
+                if not cached or cached["sha256"] != record["sha256"]:
+                    changed = True
+                self.files[entry.name] = record
+
+            removed = [name for name in self.files if name not in seen]
+            for name in removed:
+                del self.files[name]
+            if removed:
+                changed = True
+
+            if changed:
+                self._text = "".join(
+                    f"\n\n--- {name} ---\n{record['text']}"
+                    for name, record in sorted(self.files.items())
+                    if not record["error"]
+                )
+                self.version += 1
+
+            self.last_refresh = {
+                "files": len(self.files),
+                "reloaded": reloaded,
+                "removed": len(removed),
+                "errors": errors,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            return self.last_refresh
+
+    def _load(self, path, name, stat) -> dict:
+        start = time.perf_counter()
+        record = {
+            "name": name,
+            "bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": "",
+            "text": "",
+            "error": "",
+        }
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            record["sha256"] = hashlib.sha256(data).hexdigest()
+            record["text"] = data.decode("utf-8").strip()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning("cannot read knowledge file %s: %s", path, e)
+            record["error"] = str(e)
+        record["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return record
+
+    def text(self) -> str:
+        """Return every file as ``--- name ---`` blocks, refreshing first."""
+        self.refresh()
+        return self._text
+
+    def documents(self) -> dict[str, str]:
+        """Return the text of every readable file by name, refreshing first."""
+        self.refresh()
+        with self._lock:
+            return {
+                name: record["text"]
+                for name, record in sorted(self.files.items())
+                if not record["error"]
+            }
+
+    def inventory(self) -> list[dict]:
+        """Return one row per file with its size, hash, load time and error."""
+        with self._lock:
+            return [
+                {key: value for key, value in record.items() if key != "text"}
+                for _, record in sorted(self.files.items())
+            ]
+
+
+_stores: dict[str, KnowledgeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_knowledge_store(directory: str = KNOWLEDGE_DIR) -> KnowledgeStore:
+    """Return the shared store for ``directory``."""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = KnowledgeStore(key)
+        return _stores[key]
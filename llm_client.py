@@ -0,0 +1,222 @@
+"""OpenAI backend with shared rate limiting and automatic retries.
+
+A backend is any callable ``backend(params, api_key, stream=False)`` that
+yields the reply text in one or more chunks. ``openai_backend`` talks to the
+API directly; ``ResilientBackend`` wraps any backend so that
+
+* every request first reserves capacity in a per-model requests-per-minute
+  and tokens-per-minute bucket shared by the whole process (all Streamlit
+  sessions and batch workers), and
+* rate limits, 5xx responses and connection errors are retried with jittered
+  exponential backoff, honouring ``Retry-After``.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Requests and tokens per minute for each resolved model name. OpenAI counts
+# max_tokens against the token limit when a request is accepted, so the
+# bucket does the same.
+DEFAULT_RATE_LIMIT = (
+    int(os.environ.get("OPENAI_RPM_LIMIT", 500)),
+    int(os.environ.get("OPENAI_TPM_LIMIT", 800_000)),
+)
+RATE_LIMITS: dict[str, tuple[int, int]] = {}
+
+
+def openai_backend(params, api_key, stream=False):
+    """Send a chat completion request to OpenAI and yield the reply text."""
+    if not stream:
+        response = openai.ChatCompletion.create(api_key=api_key, **params)
+        yield response.choices[0].message.content
+        return
+    for chunk in openai.ChatCompletion.create(api_key=api_key, stream=True, **params):
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.get("content")
+        if text:
+            yield text
+
+
+def estimate_request_tokens(params: dict) -> int:
+    """Estimate the tokens a request counts against the per-minute limit."""
+    prompt_chars = sum(len(message["content"]) for message in params.get("messages", []))
+    max_output = params.get("max_tokens") or params.get("max_completion_tokens") or 0
+    return prompt_chars // 4 + max_output
+
+
+class TokenBucket:
+    """Continuously refilling bucket that hands out reservations.
+
+    ``reserve`` always succeeds and returns how long the caller must wait
+    before using what it reserved, so concurrent callers queue up in order
+    instead of polling."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def reserve(self, amount: float) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A request larger than the bucket would otherwise wait forever
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one model."""
+
+    def __init__(self, rpm: int, tpm: int, clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.clock = clock
+        self.sleep = sleep
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """Block until one request of ``tokens`` tokens may be sent."""
+        with self._lock:
+            wait = max(
+                self.requests.reserve(1),
+                self.tokens.reserve(tokens),
+                self.paused_until - self.clock(),
+            )
+            self.waited += max(0.0, wait)
+        if wait > 0:
+            self.sleep(wait)
+        return max(0.0, wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds``, e.g. after a 429."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """Return the process-wide rate limiter for a resolved model name."""
+    with _limiters_lock:
+        if model not in _limiters:
+            rpm, tpm = RATE_LIMITS.get(model, DEFAULT_RATE_LIMIT)
+            _limiters[model] = RateLimiter(rpm, tpm)
+        return _limiters[model]
+
+
+def configure_rate_limit(model: str, rpm: int, tpm: int):
+    """Set the limits for ``model`` and reset its shared limiter."""
+    with _limiters_lock:
+        RATE_LIMITS[model] = (rpm, tpm)
+        _limiters.pop(model, None)
+
+
+def retry_after(exc) -> float | None:
+    """Return the server's ``Retry-After`` hint in seconds, if any."""
+    headers = getattr(exc, "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name) or headers.get(name.title())
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return None
+
+
+def is_retryable(exc) -> bool:
+    """Whether ``exc`` is a transient API failure worth retrying."""
+    if isinstance(exc, openai.error.RateLimitError):
+        body = exc.json_body if isinstance(exc.json_body, dict) else {}
+        # An exhausted quota will not recover by waiting
+        return (body.get("error") or {}).get("code") != "insufficient_quota"
+    if isinstance(exc, (
+        openai.error.ServiceUnavailableError,
+        openai.error.APIConnectionError,
+        openai.error.Timeout,
+        openai.error.TryAgain,
+    )):
+        return True
+    if isinstance(exc, openai.error.APIError):
+        return exc.http_status is None or exc.http_status >= 500
+    return False
+
+
+def is_timeout(exc) -> bool:
+    """Whether ``exc`` means the request ran out of time."""
+    return isinstance(exc, (openai.error.Timeout, TimeoutError))
+
+
+class ResilientBackend:
+    """Wrap a backend with the shared rate limiters and retries.
+
+    Failures before the first chunk arrives are retried up to
+    ``max_attempts`` times; once text has been streamed to the caller an
+    error is raised as is, since the partial reply cannot be taken back.
+    A request with its own ``request_timeout`` is not retried when it times
+    out: the caller bounded the wait, usually because it has a fallback."""
+
+    def __init__(self, backend=openai_backend, max_attempts: int = 6, base_delay: float = 1.0,
+                 max_delay: float = 60.0, limiter_for=get_rate_limiter, sleep=time.sleep):
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter_for = limiter_for
+        self.sleep = sleep
+        self.retries = 0
+
+    def backoff(self, attempt: int, exc) -> float:
+        """Seconds to wait before retry number ``attempt`` (from 1)."""
+        hint = retry_after(exc)
+        if hint is not None:
+            return hint + random.uniform(0, self.base_delay)
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def __call__(self, params, api_key, stream=False):
+        limiter = self.limiter_for(params["model"])
+        tokens = estimate_request_tokens(params)
+        attempt = 0
+        while True:
+            attempt += 1
+            limiter.acquire(tokens)
+            chunks = self.backend(params, api_key, stream)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    raise
+                if is_timeout(e) and params.get("request_timeout"):
+                    raise
+                delay = self.backoff(attempt, e)
+                if isinstance(e, openai.error.RateLimitError):
+                    limiter.pause(delay)
+                self.retries += 1
+                logger.warning(
+                    "%s request failed (%s), retry %d/%d in %.1fs",
+                    params["model"], e, attempt, self.max_attempts - 1, delay,
+                )
+                self.sleep(delay)
+                continue
+            yield first
+            yield from chunks
+            return
@@ -0,0 +1,88 @@
+"""Which model, and how many output tokens, each agent gets.
+
+The model picked for a run is the default. ``MODEL_ROUTES`` then moves
+agents that do not need it to a faster model (the Strategist and the SEO
+query list), gives the Editor-in-Chief a reasoning model, and caps the
+output of every agent at what the content type and length can use, instead
+of one large limit for everything. Rules are applied in order and each
+matching rule overrides the fields it sets, so general rules come first.
+
+A route with a ``fallback`` also sets a ``timeout``: a request to the
+primary model that takes longer is abandoned and the agent's prompt is sent
+to the fallback model instead.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Optional
+
+# Output budget for calls outside the routing table (chat, revisions)
+DEFAULT_MAX_OUTPUT = 20000
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """The model, output budget and fallback for one agent in one run."""
+
+    model: str
+    max_output: int = DEFAULT_MAX_OUTPUT
+    timeout: Optional[float] = None
+    fallback: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """One rule of the routing table.
+
+    ``agent``, ``content_type`` and ``length`` restrict where the rule
+    applies; ``None`` matches anything. The other fields are what the rule
+    sets; ``None`` leaves them as earlier rules had them."""
+
+    agent: Optional[str] = None
+    content_type: Optional[str] = None
+    length: Optional[str] = None
+    model: Optional[str] = None
+    max_output: Optional[int] = None
+    timeout: Optional[float] = None
+    fallback: Optional[str] = None
+
+    def matches(self, agent: str, content_type: str, length: str) -> bool:
+        return all(
+            wanted is None or wanted == value
+            for wanted, value in ((self.agent, agent), (self.content_type, content_type), (self.length, length))
+        )
+
+
+# o3 spends part of max_completion_tokens on reasoning, so its budgets leave
+# room for that on top of the reply
+MODEL_ROUTES = [
+    ModelRoute(max_output=4000),
+    ModelRoute(agent="Strategist", model="4o-mini", max_output=3000, timeout=60, fallback="4o"),
+    ModelRoute(agent="SEO Specialist", model="4o-mini", max_output=2000, timeout=60, fallback="4o"),
+    ModelRoute(agent="Specialist Writer", max_output=6000),
+    ModelRoute(agent="Head of Content", max_output=6000),
+    ModelRoute(agent="Editor-in-Chief", model="o3", max_output=12000, timeout=180, fallback="4o"),
+    ModelRoute(agent="Specialist Writer", length="Short (~300 words)", max_output=1200),
+    ModelRoute(agent="Head of Content", length="Short (~300 words)", max_output=1200),
+    ModelRoute(content_type="Social Media Caption", max_output=600),
+    ModelRoute(agent="SEO Specialist", content_type="Social Media Caption", max_output=1500),
+    ModelRoute(agent="Editor-in-Chief", content_type="Social Media Caption", max_output=6000),
+    ModelRoute(agent="Specialist Writer", content_type="Product Description", max_output=1500),
+]
+
+
+def resolve_profile(agent: str, content_type: str, length: str, default_model: str,
+                    routes: list[ModelRoute] = MODEL_ROUTES) -> GenerationProfile:
+    """Apply every route that matches ``agent``, ``content_type`` and
+    ``length`` on top of ``default_model`` with the default output budget."""
+    profile = GenerationProfile(default_model)
+    for route in routes:
+        if route.matches(agent, content_type, length):
+            changes = {
+                field: getattr(route, field)
+                for field in ("model", "max_output", "timeout", "fallback")
+                if getattr(route, field) is not None
+            }
+            profile = replace(profile, **changes)
+    if profile.fallback == profile.model:
+        profile = replace(profile, timeout=None, fallback=None)
+    return profile
@@ -0,0 +1,108 @@
+"""Near-duplicate detection for search queries with MinHash and LSH.
+
+Each query becomes the set of its words (lowercased, plural ``s`` dropped).
+A MinHash signature of ``num_perm`` values estimates the Jaccard similarity
+between two sets; locality-sensitive hashing splits the signature into bands
+and only compares queries that share a band exactly. Candidates are then
+confirmed with the exact Jaccard similarity of their word sets, so the cost
+grows with the number of queries, not the number of pairs.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_NUM_PERM = 64
+
+_PRIME = (1 << 31) - 1
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def query_shingles(text: str) -> frozenset[str]:
+    """Return the word set of ``text`` used for Jaccard similarity."""
+    words = set()
+    for word in _WORD_PATTERN.findall(text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return frozenset(words)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def lsh_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Pick ``(bands, rows)`` with ``bands * rows == num_perm`` whose
+    S-curve midpoint ``(1 / bands) ** (1 / rows)`` is closest to
+    ``threshold``, preferring more bands (fewer missed duplicates)."""
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: (abs((1 / option[0]) ** (1 / option[1]) - threshold), -option[0]))
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash LSH index over queries.
+
+    ``add`` returns the id of an earlier representative at or above
+    ``threshold`` Jaccard similarity, or registers the query as the next
+    representative (ids count up from 0) and returns ``None``.
+    ``counts[rep]`` is how many duplicates were folded into each
+    representative."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self.shingles: list[frozenset] = []
+        self.counts: list[int] = []
+
+    def signature(self, shingles: frozenset) -> np.ndarray:
+        """MinHash signature of a shingle set (all-max for an empty set)."""
+        if not shingles:
+            return np.full(len(self._a), _PRIME, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) & _PRIME for shingle in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def add(self, text: str) -> int | None:
+        shingles = query_shingles(text)
+        signature = self.signature(shingles)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        checked = set()
+        for band, key in enumerate(keys):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if jaccard(shingles, self.shingles[candidate]) >= self.threshold:
+                    self.counts[candidate] += 1
+                    return candidate
+        rep = len(self.shingles)
+        self.shingles.append(shingles)
+        self.counts.append(0)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(rep)
+        return None
+
+
+def collapse_near_duplicates(items: list, key=lambda item: item, threshold: float = DEFAULT_THRESHOLD,
+                             num_perm: int = DEFAULT_NUM_PERM) -> list[tuple]:
+    """Keep the first of each group of near-duplicate ``items``.
+
+    Returns ``(item, duplicates)`` pairs in input order, where ``duplicates``
+    counts the later items folded into it."""
+    index = NearDuplicateIndex(threshold, num_perm)
+    kept = []
+    for item in items:
+        if index.add(key(item)) is None:
+            kept.append(item)
+    return list(zip(kept, index.counts))
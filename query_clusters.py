@@ -0,0 +1,113 @@
+"""Topic groups for fan-out queries with spherical k-means.
+
+Query vectors from ``embeddings.py`` are unit length, so clusters are found
+by cosine similarity: each query joins the centroid it has the largest dot
+product with, and centroids are the renormalised means of their members.
+Seeding (greedy k-means++) uses a fixed random seed, so the same queries always
+give the same groups. Every step is a matrix product; past
+``FIT_SAMPLE_SIZE`` queries the centroids are fitted on a fixed sample and
+every query is then assigned once, which keeps 10k queries well under a
+second.
+"""
+
+import numpy as np
+
+from embeddings import normalize_rows
+
+MAX_CLUSTERS = 12
+KMEANS_ITERATIONS = 25
+# Stop once fewer than this share of queries change cluster in a pass
+KMEANS_TOLERANCE = 0.001
+FIT_SAMPLE_SIZE = 2048
+
+
+def default_cluster_count(n: int) -> int:
+    """About ``sqrt(n / 2)`` groups, between 1 and ``MAX_CLUSTERS``."""
+    return max(1, min(MAX_CLUSTERS, n, round((n / 2) ** 0.5)))
+
+
+def _seed_centroids(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Greedy k-means++: each step draws a few candidates in proportion to
+    their cosine distance from the nearest seed so far and keeps the one
+    that lowers the total distance most."""
+    candidates_per_step = 2 + int(np.log(k))
+    chosen = [int(rng.integers(len(vectors)))]
+    closest = vectors @ vectors[chosen[0]]
+    for _ in range(1, k):
+        distance = np.maximum(1.0 - closest, 0.0).astype(np.float64)
+        total = distance.sum()
+        if total > 0:
+            candidates = rng.choice(len(vectors), candidates_per_step, p=distance / total)
+        else:
+            candidates = rng.integers(len(vectors), size=candidates_per_step)
+        trial = np.maximum(closest[None, :], vectors[candidates] @ vectors.T)
+        best = int(trial.sum(axis=1).argmax())
+        chosen.append(int(candidates[best]))
+        closest = trial[best]
+    return vectors[chosen].copy()
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0,
+           sample_size: int | None = FIT_SAMPLE_SIZE):
+    """Spherical k-means on the rows of ``vectors``.
+
+    Returns ``(labels, centroids)``. Iteration stops early once fewer than
+    ``KMEANS_TOLERANCE`` of the queries change cluster. A cluster left empty
+    is reseeded with the query furthest from its own centroid. With more
+    than ``sample_size`` rows, centroids are fitted on a seeded sample and
+    refined by one pass over every row."""
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    rng = np.random.default_rng(seed)
+    if sample_size and len(vectors) > sample_size:
+        sample = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        _, centroids = kmeans(vectors[sample], k, iterations, seed, None)
+        return _lloyd(vectors, centroids, 1)
+    centroids = _seed_centroids(vectors, max(1, min(k, len(vectors))), rng)
+    return _lloyd(vectors, centroids, iterations)
+
+
+def _lloyd(vectors: np.ndarray, centroids: np.ndarray, iterations: int):
+    n, k = len(vectors), len(centroids)
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        scores = vectors @ centroids.T
+        new_labels = scores.argmax(axis=1)
+        changed = int((new_labels != labels).sum())
+        labels = new_labels
+        if changed <= KMEANS_TOLERANCE * n:
+            break
+        members = np.zeros((k, n), dtype=np.float32)
+        members[labels, np.arange(n)] = 1.0
+        sums = members @ vectors
+        empty = np.flatnonzero(members.sum(axis=1) == 0)
+        if len(empty):
+            fit = scores[np.arange(n), labels]
+            for cluster, index in zip(empty, np.argsort(fit)[:len(empty)]):
+                sums[cluster] = vectors[index]
+                labels[index] = cluster
+        centroids = normalize_rows(sums)
+    return labels, centroids
+
+
+def cluster_queries(vectors: np.ndarray, k: int | None = None, seed: int = 0):
+    """Group query vectors into topics, largest group first.
+
+    Returns ``(labels, representatives)``: the cluster of every row, and for
+    each cluster the row closest to its centroid, which names the group.
+    ``k`` defaults to ``default_cluster_count``."""
+    n = len(vectors)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp), []
+    labels, centroids = kmeans(vectors, k or default_cluster_count(n), seed=seed)
+    sizes = np.bincount(labels, minlength=len(centroids))
+    # Largest first; ties keep the order clusters were seeded in
+    order = np.argsort(-sizes, kind="stable")
+    order = order[sizes[order] > 0]
+    rank = np.empty(len(centroids), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    fit = (normalize_rows(np.asarray(vectors, dtype=np.float32)) @ centroids.T)[np.arange(n), labels]
+    representatives = []
+    for cluster in order:
+        members = np.flatnonzero(labels == cluster)
+        representatives.append(int(members[fit[members].argmax()]))
+    return rank[labels], representatives
@@ -0,0 +1,95 @@
+"""Local coverage of search queries by the content.
+
+The content is split into passages of about ``PASSAGE_CHARS`` characters,
+the answer size the SEO Specialist is asked to write for. Passages and
+queries are embedded together in one batch with ``embeddings.py`` and every
+query is matched to its most similar passage. Queries whose best passage
+scores below ``COVERAGE_THRESHOLD`` are reported as gaps. Nothing is sent to
+a model, so coverage is deterministic and can be recomputed after every
+revision.
+"""
+
+import re
+
+from content_sections import paragraphs, split_sections
+from embeddings import cosine_matrix, embed_texts
+
+PASSAGE_CHARS = 320
+COVERAGE_THRESHOLD = 0.25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pack(pieces: list[str], max_chars: int) -> list[str]:
+    """Join ``pieces`` with spaces into runs of at most ``max_chars``; a
+    piece longer than that is cut at word boundaries."""
+    passages, current = [], ""
+    for piece in pieces:
+        while len(piece) > max_chars:
+            cut = piece.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            head, piece = piece[:cut].rstrip(), piece[cut:].lstrip()
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(head)
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> list[dict]:
+    """Split content into passages of at most ``max_chars`` characters.
+
+    Headings are found by ``content_sections.split_sections``, so plain-text
+    headings count as well as Markdown ones. Paragraphs are kept whole when
+    they fit and otherwise split between sentences. Each passage is a dict
+    with its ``heading`` (the nearest heading above it, or "") and ``text``."""
+    passages = []
+    for section in split_sections(text):
+        for paragraph in paragraphs(section.body):
+            sentences = _SENTENCE_END.split(" ".join(line.strip() for line in paragraph.splitlines() if line.strip()))
+            passages.extend({"heading": section.heading, "text": chunk} for chunk in _pack(sentences, max_chars))
+    return passages
+
+
+def score_coverage(content: str, queries_typed: list[dict], threshold: float = COVERAGE_THRESHOLD,
+                   max_chars: int = PASSAGE_CHARS) -> dict:
+    """Match every query to the passage of ``content`` that answers it best.
+
+    Returns a dict with ``passages`` (the number of passages), ``threshold``,
+    ``covered`` (how many queries reach it) and ``queries``: one entry per
+    query with its ``query``, ``type``, best ``passage`` index (``None`` if
+    the content is empty), the passage ``heading`` and ``excerpt``, the
+    cosine ``score`` and whether it is ``covered``. A passage is embedded
+    with its heading, since headings often carry the query's entity."""
+    passages = split_passages(content, max_chars)
+    queries = [q["query"] for q in queries_typed]
+    entries = []
+    if passages and queries:
+        vectors = embed_texts(queries + [f"{p['heading']} {p['text']}" for p in passages])
+        scores = cosine_matrix(vectors[:len(queries)], vectors[len(queries):])
+        best = scores.argmax(axis=1)
+        for q, row, passage in zip(queries_typed, scores, best.tolist()):
+            score = round(float(row[passage]), 3)
+            entries.append({
+                "query": q["query"], "type": q.get("type", ""), "passage": passage,
+                "heading": passages[passage]["heading"], "excerpt": passages[passage]["text"],
+                "score": score, "covered": score >= threshold,
+            })
+    else:
+        entries = [
+            {"query": q["query"], "type": q.get("type", ""), "passage": None, "heading": "", "excerpt": "",
+             "score": 0.0, "covered": False}
+            for q in queries_typed
+        ]
+    return {
+        "passages": len(passages),
+        "threshold": threshold,
+        "covered": sum(entry["covered"] for entry in entries),
+        "queries": entries,
+    }
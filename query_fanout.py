@@ -0,0 +1,434 @@
+"""Search query parsing, classification and fan-out graph helpers.
+
+Large fan-outs can be generated and exported from the command line::
+
+    python query_fanout.py "Distributed tracing" queries.txt --max-queries 50000 --levels 6 -o fanout.csv
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+from array import array
+from collections import deque
+from itertools import islice
+
+import networkx as nx
+import numpy as np
+
+from embeddings import EMBEDDING_DIM, cosine_matrix, embed_texts, top_k_neighbors
+from near_duplicates import NearDuplicateIndex
+
+# Jaccard similarity of word sets at which two queries count as the same
+NEAR_DUPLICATE_THRESHOLD = 0.75
+
+
+_BULLET_PATTERN = re.compile(r"^\s*(?:[-*]|\d+[.)]|\d+:)\s*(.+)")
+_TYPED_PATTERN = re.compile(r"(?P<type>[^:-]+)\s*[:-]\s*(?P<rest>.+)")
+KNOWN_QUERY_TYPES = frozenset({
+    "reformulation",
+    "implicit",
+    "comparative",
+    "entity_expansion",
+    "personalized",
+    "temporal",
+    "location",
+    "user_intent",
+    "technical",
+})
+# Characters str.splitlines() breaks on
+_LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+class QueryStreamParser:
+    """Incremental version of ``parse_queries``.
+
+    ``feed`` takes the reply in chunks of any size and returns the queries
+    whose lines were completed by that chunk; ``close`` parses the final
+    line. Only the unfinished line is kept between calls, so a reply is
+    scanned once however it is split. Once the query list has ended the
+    parser ignores the rest of the reply (``done`` is then true).
+
+    ``feed_text`` takes the whole reply so far instead of the new chunk."""
+
+    def __init__(self):
+        self.restarts = 0
+        self.reset()
+
+    def reset(self):
+        """Forget everything read so far."""
+        self.queries: list[dict] = []
+        self.done = False
+        self._capture = False
+        self._found = False
+        self._seen: set[str] = set()
+        self._partial = ""
+        self._fed = 0
+
+    def feed_text(self, text: str) -> list[dict]:
+        """Like ``feed``, given the reply so far rather than the new chunk.
+
+        A reply shorter than the last one has started over, as when an agent
+        falls back to another model mid-reply; the parser is then reset and
+        ``restarts`` counts it."""
+        if len(text) < self._fed:
+            self.reset()
+            self.restarts += 1
+        new = self.feed(text[self._fed:])
+        self._fed = len(text)
+        return new
+
+    def feed(self, chunk: str) -> list[dict]:
+        if self.done:
+            return []
+        lines = (self._partial + chunk).splitlines(keepends=True)
+        self._partial = lines.pop() if lines and lines[-1][-1] not in _LINE_BREAKS else ""
+        return self._parse_lines(line.rstrip(_LINE_BREAKS) for line in lines)
+
+    def close(self) -> list[dict]:
+        partial, self._partial = self._partial, ""
+        new = self._parse_lines([partial]) if partial and not self.done else []
+        self.done = True
+        return new
+
+    def _parse_lines(self, lines) -> list[dict]:
+        new = []
+        for line in lines:
+            query = self._parse_line(line)
+            if self.done:
+                break
+            if query and query["query"].lower() not in self._seen:
+                self._seen.add(query["query"].lower())
+                self.queries.append(query)
+                new.append(query)
+        return new
+
+    def _parse_line(self, line: str) -> dict | None:
+        lower = line.lower().strip()
+        match = _BULLET_PATTERN.match(line)
+        if not self._capture:
+            heading = "search queries" in lower or (
+                "query" in lower and (":" in lower or lower.startswith("#"))
+            )
+            start_list = False
+            if match:
+                tmatch = _TYPED_PATTERN.match(match.group(1).strip())
+                if tmatch and tmatch.group("type").strip().lower().replace(" ", "_") in KNOWN_QUERY_TYPES:
+                    start_list = True
+            if heading or start_list:
+                self._capture = True
+                if not start_list:
+                    return None
+        if not line.strip():
+            return None
+
+        if not match:
+            if self._found:
+                self.done = True
+            return None
+
+        item = match.group(1).strip()
+        tmatch = _TYPED_PATTERN.match(item)
+        if tmatch:
+            qtype = tmatch.group("type").strip().lower().replace(" ", "_")
+            rest = tmatch.group("rest").strip()
+            if qtype not in KNOWN_QUERY_TYPES:
+                rest = item
+                qtype = ""
+        else:
+            qtype = ""
+            rest = item
+
+        if " - " in rest:
+            qtext, note = rest.split(" - ", 1)
+            qtext = qtext.strip()
+            note = note.strip()
+        else:
+            qtext = rest
+            note = ""
+
+        if not qtext:
+            return None
+        self._found = True
+        return {"type": qtype, "query": qtext, "note": note}
+
+
+def parse_queries(text: str) -> list[dict]:
+    """Extract search queries from SEO Specialist output.
+
+    Returns a list of dictionaries with ``type``, ``query`` and ``note`` keys
+    so we can validate how the SEO agent labeled each suggestion and capture
+    any explanation that follows a dash."""
+    parser = QueryStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser.queries
+
+
+def cosine_sim(v1, v2) -> float:
+    """Compute cosine similarity between two vectors."""
+    return float(cosine_matrix(v1, v2)[0, 0])
+
+
+# Fan-out type rules in priority order: the first rule that matches wins. A
+# tuple matches if any of its substrings occurs in the lowercased query.
+QUERY_TYPE_RULES = (
+    ("comparative", (" vs ", "versus", "compare", "difference", "better than")),
+    ("location", re.compile(r"\b(near me|in [a-z]+|at [a-z]+|location|city|country)\b")),
+    ("temporal", re.compile(
+        r"\b(20\d{2}|today|latest|this year|this month)\b|\b\d+[- ]?(day|week|month|year)s?\b"
+    )),
+    ("personalized", re.compile(r"\b(my|for me|i |personalized|best for me|should i)\b")),
+    ("technical", ("error", "install", "setup", "troubleshoot", "code", "configuration", "how to", "fix")),
+    ("entity_expansion", ("alternative", "similar", "related", "competitor")),
+    ("reformulation", ("what is", "define", "definition", "meaning")),
+)
+QUESTION_WORDS = frozenset(["how", "why", "what", "where", "when", "who"])
+
+
+def classify_query(query: str) -> str:
+    """Heuristically classify a query into fan-out types."""
+    q = query.lower()
+    for query_type, rule in QUERY_TYPE_RULES:
+        if isinstance(rule, tuple):
+            # A plain loop; any() with a generator is noticeably slower here
+            for t in rule:
+                if t in q:
+                    return query_type
+        elif rule.search(q):
+            return query_type
+
+    words = q.split()
+    if words and words[0] in QUESTION_WORDS:
+        return "user_intent"
+
+    return "implicit"
+
+
+def classify_queries(queries: list[str]) -> list[str]:
+    """Classify a list of queries, in order.
+
+    Each query goes through ``QUERY_TYPE_RULES`` rule by rule, exactly as
+    ``classify_query`` does; this is a convenience for callers with a list,
+    not a single-pass matcher."""
+    return [classify_query(q) for q in queries]
+
+
+def expand_query(query: str, root: str) -> list[str]:
+    """Create variations of a query for fan-out."""
+    templates = [
+        f"What is {query}?",
+        f"How does {query} compare to {root}?",
+        f"{query} best practices",
+        f"Examples of {query}",
+        f"Benefits of {query}",
+        f"{query} vs alternatives",
+    ]
+    return templates
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase ``text`` and reduce it to its words, for deduplication."""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def iter_fanout(title: str, base_queries: list[str], max_queries: int | None = None, levels: int = 3,
+                near_duplicates: NearDuplicateIndex | None = None):
+    """Generate the fan-out tree breadth first as ``(parent, level, text)``.
+
+    Node ids are positions in the output: the title comes first as node 0
+    (parent -1, level 0), the base queries are its children and every other
+    query is expanded with ``expand_query`` down to ``levels``. A query whose
+    normalized text was already produced is skipped, so each node is unique.
+    With a ``near_duplicates`` index, near-duplicates of earlier nodes are
+    skipped too and counted against them; representative ids then equal node
+    ids. Stops after ``max_queries`` queries, not counting the title."""
+    seen = {normalize_query(title)}
+    if near_duplicates is not None:
+        near_duplicates.add(title)
+    yield -1, 0, title
+    produced = 0
+    next_id = 1
+    queue = deque([(0, 0, title)])
+    while queue:
+        parent, level, text = queue.popleft()
+        children = base_queries if parent == 0 and level == 0 else expand_query(text, title)
+        for child in children:
+            if max_queries is not None and produced >= max_queries:
+                return
+            key = normalize_query(child)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if near_duplicates is not None and near_duplicates.add(child) is not None:
+                continue
+            yield parent, level + 1, child
+            if level + 1 < levels:
+                queue.append((next_id, level + 1, child))
+            next_id += 1
+            produced += 1
+
+
+class QueryFanout:
+    """A fan-out tree stored in flat arrays.
+
+    ``texts[i]``, ``parents[i]``, ``levels[i]``, ``vectors[i]`` and
+    ``similarity[i]`` (to the title) describe node ``i``; node 0 is the
+    title. Nodes are embedded in batches of ``batch_size`` as the generator
+    produces them, so no per-node objects are kept.
+
+    With a ``near_duplicate_threshold``, near-duplicate queries are collapsed
+    into the first of their group and ``duplicates[i]`` counts how many were
+    folded into node ``i``."""
+
+    def __init__(self, title: str, base_queries: list[str], max_queries: int | None = 30, levels: int = 3,
+                 batch_size: int = 4096, dim: int = EMBEDDING_DIM, near_duplicate_threshold: float | None = None):
+        self.texts: list[str] = []
+        self.parents = array("i")
+        self.levels = array("b")
+        vectors = np.empty((min(batch_size, (max_queries or batch_size) + 1), dim), dtype=np.float32)
+        index = NearDuplicateIndex(near_duplicate_threshold) if near_duplicate_threshold else None
+        nodes = iter_fanout(title, base_queries, max_queries, levels, index)
+        while batch := list(islice(nodes, batch_size)):
+            start = len(self.texts)
+            for parent, level, text in batch:
+                self.parents.append(parent)
+                self.levels.append(level)
+                self.texts.append(text)
+            if len(self.texts) > len(vectors):
+                grown = np.empty((max(len(self.texts), 2 * len(vectors)), dim), dtype=np.float32)
+                grown[:start] = vectors[:start]
+                vectors = grown
+            vectors[start:len(self.texts)] = embed_texts([text for _, _, text in batch], dim)
+        self.vectors = vectors[:len(self.texts)]
+        self.similarity = self.vectors @ self.vectors[0]
+        self.similarity[0] = 1.0
+        self.duplicates = array("i", index.counts if index else [0] * len(self.texts))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def edges(self):
+        """Yield ``(parent, child)`` node id pairs."""
+        for child in range(1, len(self.texts)):
+            yield self.parents[child], child
+
+    def neighbors(self, k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` most similar other queries per node, as node ids.
+
+        Row 0 (the title) is empty; see ``top_k_neighbors``."""
+        indices, scores = top_k_neighbors(self.vectors[1:], k)
+        pad = np.full((1, indices.shape[1]), -1, dtype=indices.dtype)
+        return np.vstack([pad, indices + 1]), np.vstack([np.zeros_like(pad, dtype=scores.dtype), scores])
+
+    def iter_rows(self, neighbors: int = 0):
+        """Yield one flat dict per node, for export."""
+        nearest = self.neighbors(neighbors)[0] if neighbors else None
+        for i, text in enumerate(self.texts):
+            row = {
+                "id": i,
+                "parent": self.parents[i],
+                "level": self.levels[i],
+                "query": text,
+                "similarity": round(float(self.similarity[i]), 4),
+                "duplicates": self.duplicates[i],
+            }
+            if nearest is not None:
+                row["nearest"] = [int(j) for j in nearest[i] if j >= 0]
+            yield row
+
+    def write_csv(self, out, neighbors: int = 0):
+        """Stream the nodes to ``out`` as CSV, one row per node."""
+        writer = csv.writer(out)
+        writer.writerow(
+            ["id", "parent", "level", "query", "similarity", "duplicates"] + (["nearest"] if neighbors else [])
+        )
+        for row in self.iter_rows(neighbors):
+            values = [row["id"], row["parent"], row["level"], row["query"], row["similarity"], row["duplicates"]]
+            if neighbors:
+                values.append(" ".join(map(str, row["nearest"])))
+            writer.writerow(values)
+
+    def write_json(self, out, neighbors: int = 0):
+        """Stream ``{"nodes": [...], "edges": [...]}`` to ``out``."""
+        out.write('{"nodes": [')
+        for i, row in enumerate(self.iter_rows(neighbors)):
+            out.write((",\n" if i else "\n") + json.dumps(row))
+        out.write('\n], "edges": [')
+        for i, (parent, child) in enumerate(self.edges()):
+            out.write((", " if i else "") + f'{{"from": {parent}, "to": {child}}}')
+        out.write("]}\n")
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Build a ``networkx`` graph with nodes ``n0``, ``n1``, ..."""
+        G = nx.DiGraph()
+        for i, text in enumerate(self.texts):
+            G.add_node(f"n{i}", label=text)
+        G.add_edges_from((f"n{parent}", f"n{child}") for parent, child in self.edges())
+        return G
+
+
+def build_query_graph(title: str, base_queries: list[str], min_queries: int = 30, levels: int = 3,
+                      neighbors: int = 3, near_duplicate_threshold: float | None = NEAR_DUPLICATE_THRESHOLD):
+    """Build query fan-out graph with embedding similarities to the title.
+
+    Returns the ``networkx`` graph and a dict of node data with ``text``,
+    fan-out ``level``, ``vector``, ``similarity``, the number of
+    near-``duplicates`` collapsed into the node and the ``neighbors`` most
+    similar other queries as ``(node id, similarity)`` pairs. Meant for graphs small enough
+    to draw; use ``QueryFanout`` directly for large fan-outs. All base
+    queries are kept; expansions are added until there are ``min_queries``."""
+    fanout = QueryFanout(
+        title, base_queries, max_queries=max(min_queries, len(base_queries)), levels=levels,
+        near_duplicate_threshold=near_duplicate_threshold,
+    )
+    nearest, scores = fanout.neighbors(neighbors)
+    node_data = {
+        f"n{i}": {
+            "text": text,
+            "level": fanout.levels[i],
+            "vector": fanout.vectors[i],
+            "similarity": float(fanout.similarity[i]),
+            "duplicates": fanout.duplicates[i],
+            "neighbors": [(f"n{j}", float(score)) for j, score in zip(nearest[i], scores[i]) if j >= 0],
+        }
+        for i, text in enumerate(fanout.texts)
+    }
+    return fanout.to_networkx(), node_data
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a query fan-out and export it as CSV or JSON.")
+    parser.add_argument("title", help="topic at the root of the fan-out")
+    parser.add_argument("queries", help="text file with one base query per line")
+    parser.add_argument("-o", "--output", default="-", help="output file; .json selects JSON (default: CSV on stdout)")
+    parser.add_argument("--max-queries", type=int, default=1000)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--neighbors", type=int, default=0, help="nearest queries to list per node")
+    parser.add_argument(
+        "--dedupe-threshold", type=float, default=None,
+        help=f"collapse queries at this word Jaccard similarity or above (e.g. {NEAR_DUPLICATE_THRESHOLD})",
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.queries) as f:
+        base_queries = [line.strip() for line in f if line.strip()]
+    fanout = QueryFanout(
+        args.title, base_queries, max_queries=args.max_queries, levels=args.levels,
+        near_duplicate_threshold=args.dedupe_threshold,
+    )
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        if args.output.endswith(".json"):
+            fanout.write_json(out, args.neighbors)
+        else:
+            fanout.write_csv(out, args.neighbors)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
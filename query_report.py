@@ -0,0 +1,177 @@
+"""Derived views of a pipeline result: the query table, CSV and graph HTML,
+and the HTML download of the final content.
+
+Building these means growing the query fan-out, classifying every node and
+laying out the graph, which takes seconds for a large run. The functions
+here are pure, so the app can memoize them on ``results_digest`` and only
+rebuild when the title, queries or content actually change.
+"""
+
+import csv
+import io
+
+import markdown
+import numpy as np
+
+from graph_layout import (
+    FOLDED_PREVIEW,
+    MAX_GRAPH_NODES,
+    collapse_levels,
+    detail_level,
+    layout_graph,
+    palette_groups,
+    render_graph_html,
+)
+from query_clusters import cluster_queries
+from query_fanout import build_query_graph, classify_queries
+from response_cache import make_cache_key
+
+QUERY_CSV_HEADER = "Provided,Auto,Logic,Query,Reason,Similarity,Nearest,Duplicates,Cluster"
+
+
+def results_digest(results: dict) -> str:
+    """Hash of the parts of ``results`` the derived views are built from."""
+    return make_cache_key(
+        "results",
+        results.get("final_title", ""),
+        results.get("queries", []),
+        results.get("queries_typed", []),
+        results.get("final_content", ""),
+    )
+
+
+def build_query_report(title: str, queries: list[str], queries_typed: list[dict],
+                       max_graph_nodes: int = MAX_GRAPH_NODES) -> dict:
+    """Build the query table, its CSV and the fan-out graph page.
+
+    Queries are grouped by topic with ``cluster_queries``. Returns a dict
+    with ``rows`` (one per fan-out query, root excluded, grouped by
+    cluster), ``groups`` (``label``, the group's most central query, and its
+    ``rows``), ``csv`` and ``html``. The table lists every query; the graph
+    folds deep levels into summary nodes past ``max_graph_nodes``."""
+    G, node_info = build_query_graph(title, queries, min_queries=30, levels=3)
+    query_ids = list(node_info)[1:]
+    labels, representatives = cluster_queries(np.array([node_info[nid]['vector'] for nid in query_ids]))
+    cluster_of = dict(zip(query_ids, labels.tolist()))
+    group_labels = [node_info[query_ids[i]]['text'] for i in representatives]
+
+    provided_map = {q['query']: q['type'] for q in queries_typed}
+    note_map = {q['query']: q.get('note', '') for q in queries_typed}
+    duplicate_map = {q['query']: q.get('duplicates', 0) for q in queries_typed}
+    # Classified once here, for both the table and the graph colours
+    auto_types = dict(zip(node_info, classify_queries([data['text'] for data in node_info.values()])))
+    groups = [{"label": label, "rows": []} for label in group_labels]
+    for nid in query_ids:
+        data = node_info[nid]
+        q_text = data['text']
+        auto_type = auto_types[nid]
+        provided = provided_map.get(q_text, "")
+        logic_check = "✓" if not provided or provided == auto_type else "⚠"
+        nearest = "; ".join(
+            f"{node_info[other]['text']} ({score:.2f})" for other, score in data['neighbors'][:2]
+        )
+        groups[cluster_of[nid]]["rows"].append({
+            "Provided": provided or "-",
+            "Auto": auto_type,
+            "Logic": logic_check,
+            "Query": q_text,
+            "Reason": note_map.get(q_text, ""),
+            "Similarity": round(data['similarity'], 2),
+            "Nearest": nearest,
+            "Duplicates": data['duplicates'] + duplicate_map.get(q_text, 0),
+            "Cluster": group_labels[cluster_of[nid]],
+        })
+    rows = [row for group in groups for row in group["rows"]]
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    columns = QUERY_CSV_HEADER.split(",")
+    writer.writerow(columns)
+    writer.writerows([r[column] for column in columns] for r in rows)
+    csv_content = out.getvalue().rstrip("\n")
+
+    html = query_graph_html(G, node_info, provided_map, note_map, auto_types, max_graph_nodes,
+                            cluster_of, group_labels)
+    return {"rows": rows, "groups": groups, "csv": csv_content, "html": html}
+
+
+def content_html(content: str, title: str) -> str:
+    """Render Markdown ``content`` as a standalone HTML document."""
+    html_content = markdown.markdown(content)
+    return f"""
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>{title}</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }}
+                h1, h2, h3 {{ color: #333; }}
+            </style>
+        </head>
+        <body>
+            {html_content}
+        </body>
+        </html>
+        """
+
+
+def query_graph_html(G, node_info: dict, provided_map: dict, note_map: dict, auto_types: dict,
+                     max_nodes: int = MAX_GRAPH_NODES, cluster_of: dict | None = None,
+                     group_labels: list[str] | None = None) -> str:
+    """Lay out the fan-out graph on the server and render it for vis.js.
+
+    Node ids in ``node_info`` are in fan-out order, parents first. Nearest
+    neighbour pairs pull nodes together during layout but are not drawn.
+    Nodes are coloured by ``cluster_of`` (node id to index in
+    ``group_labels``) and bordered by whether the provided type matches."""
+    cluster_of = cluster_of or {}
+    group_labels = group_labels or []
+    ids = list(node_info)
+    index = {nid: i for i, nid in enumerate(ids)}
+    parents = [0] * len(ids)
+    for src, dst in G.edges():
+        parents[index[dst]] = index[src]
+    levels = [node_info[nid]['level'] for nid in ids]
+    kept, folded = collapse_levels(parents, levels, detail_level(parents, levels, max_nodes))
+
+    drawn = [ids[i] for i in kept] + [f"c{anchor}" for anchor in folded]
+    position = {nid: k for k, nid in enumerate(drawn)}
+    edges = [[ids[parents[i]], ids[i], round(node_info[ids[i]]['similarity'], 3)] for i in kept[1:]]
+    edges += [
+        [ids[anchor], f"c{anchor}", round(float(np.mean([node_info[ids[i]]['similarity'] for i in hidden])), 3)]
+        for anchor, hidden in folded.items()
+    ]
+    pairs = [(position[src], position[dst]) for src, dst, _ in edges]
+    weights = [1.0] * len(pairs)
+    for nid in drawn[:len(kept)]:
+        for other, score in node_info[nid]['neighbors']:
+            if other in position:
+                pairs.append((position[nid], position[other]))
+                weights.append(0.5 * max(score, 0.0))
+    coords = layout_graph(len(drawn), pairs, weights)
+
+    nodes = []
+    for k, nid in enumerate(drawn[:len(kept)]):
+        data = node_info[nid]
+        provided = provided_map.get(data['text'])
+        note = note_map.get(data['text'])
+        group = "topic" if k == 0 else f"group{cluster_of[nid]}" if nid in cluster_of else "query"
+        status = None
+        if provided:
+            status = "match" if provided == auto_types[nid] else "mismatch"
+        tooltip = [f"Note: {note}"] if note else []
+        if nid in cluster_of:
+            tooltip.append(f"Group: {group_labels[cluster_of[nid]]}")
+        tooltip.append(f"Similarity to topic: {data['similarity']:.2f}")
+        tooltip += [f"Near: {node_info[other]['text']} ({score:.2f})" for other, score in data['neighbors']]
+        x, y = coords[k]
+        nodes.append([nid, data['text'], round(float(x), 1), round(float(y), 1),
+                      round(20 + data['similarity'] * 30, 1), group, tooltip, status])
+    for k, (anchor, hidden) in enumerate(folded.items(), start=len(kept)):
+        tooltip = [node_info[ids[i]]['text'] for i in hidden[:FOLDED_PREVIEW]]
+        if len(hidden) > FOLDED_PREVIEW:
+            tooltip.append(f"and {len(hidden) - FOLDED_PREVIEW} more")
+        x, y = coords[k]
+        nodes.append([f"c{anchor}", f"+{len(hidden)} more", round(float(x), 1), round(float(y), 1), 20, "folded",
+                      tooltip, None])
+    return render_graph_html(nodes, edges, palette_groups(len(group_labels)))
@@ -0,0 +1,276 @@
+"""Text extraction for uploaded reference materials.
+
+PDF pages are extracted in a shared process pool, a few pages per task, and
+handed back in page order as they finish. The file is written to a temporary
+path once and each task opens it there, so the PDF bytes are not pickled
+into every task. Extraction stops as soon as the
+reference token budget is full, so an 80-page report whose first pages
+already fill the prompt costs only those pages. DOCX files are read paragraph
+by paragraph under the same budget.
+
+Extracted text is cached on disk by the SHA-256 of the file bytes, so a
+document uploaded again in any session only costs hashing it.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from context_budget import count_tokens, truncate_to_tokens
+from response_cache import ResponseCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Pages per pool task
+PAGES_PER_TASK = 4
+# Smaller PDFs are read in the calling process; a pool round trip costs more
+INLINE_PAGE_LIMIT = 8
+POOL_WORKERS = os.cpu_count() or 2
+# Tasks in flight per PDF: enough to keep a few workers busy, few enough that
+# pages past the token budget are rarely extracted
+TASKS_AHEAD = min(POOL_WORKERS, 3) + 1
+
+# Extracted text cache settings. Bump EXTRACTOR_VERSION whenever extraction
+# output changes so older entries are not served.
+EXTRACTION_CACHE_PATH = os.environ.get("REFERENCE_CACHE_PATH", os.path.join(".cache", "references.sqlite3"))
+EXTRACTION_CACHE_MAX_BYTES = 128 * 1024 * 1024
+EXTRACTION_CACHE_TTL_SECONDS = 30 * 24 * 3600
+EXTRACTOR_VERSION = 1
+
+PDF_TYPES = {"application/pdf"}
+DOCX_TYPES = {"application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+
+_pool = None
+_pool_lock = threading.Lock()
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool shared by every session.
+
+    Workers are spawned rather than forked, since the Streamlit server that
+    owns this process is multi-threaded."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def get_extraction_cache() -> ResponseCache:
+    """Return the extracted text cache shared by the whole process."""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ResponseCache(
+                EXTRACTION_CACHE_PATH, max_bytes=EXTRACTION_CACHE_MAX_BYTES, ttl=EXTRACTION_CACHE_TTL_SECONDS
+            )
+        return _extraction_cache
+
+
+def _pdf_page_texts(source, first: int, last: int) -> list[str]:
+    """Extract pages ``first`` to ``last`` (exclusive) with pdfplumber.
+
+    ``source`` is the PDF bytes or the path of a PDF file. Falls back to
+    PyPDF2 for a page pdfplumber cannot parse."""
+    import pdfplumber
+
+    def open_source():
+        return io.BytesIO(source) if isinstance(source, bytes) else source
+
+    texts = []
+    with pdfplumber.open(open_source()) as pdf:
+        for number in range(first, last):
+            try:
+                texts.append(pdf.pages[number].extract_text() or "")
+            except Exception:
+                from PyPDF2 import PdfReader
+
+                texts.append(PdfReader(open_source()).pages[number].extract_text() or "")
+    return texts
+
+
+def pdf_page_count(data: bytes) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def iter_pdf_pages(data: bytes, page_count: int, pool=None):
+    """Yield the text of each page of a PDF, in order.
+
+    With a ``pool``, at most ``TASKS_AHEAD`` batches of ``PAGES_PER_TASK``
+    pages are extracted ahead of the consumer, and the next batch is only
+    submitted once the pages of an earlier one have been consumed. Closing
+    the generator cancels the batches not started."""
+    if pool is None or page_count <= INLINE_PAGE_LIMIT:
+        for first in range(0, page_count, PAGES_PER_TASK):
+            yield from _pdf_page_texts(data, first, min(first + PAGES_PER_TASK, page_count))
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as handle:
+        handle.write(data)
+    starts = iter(range(0, page_count, PAGES_PER_TASK))
+    pending = []
+
+    def submit_next():
+        first = next(starts, None)
+        if first is not None:
+            pending.append(pool.submit(_pdf_page_texts, handle.name, first, min(first + PAGES_PER_TASK, page_count)))
+
+    try:
+        for _ in range(TASKS_AHEAD):
+            submit_next()
+        while pending:
+            yield from pending.pop(0).result()
+            submit_next()
+    finally:
+        for future in pending:
+            future.cancel()
+        try:
+            os.remove(handle.name)
+        except OSError:
+            logger.warning("Could not remove temporary PDF %s", handle.name)
+
+
+def iter_docx_paragraphs(data: bytes):
+    """Yield the text of each non-empty paragraph and table row of a DOCX."""
+    import docx
+
+    document = docx.Document(io.BytesIO(data))
+    for paragraph in document.paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells]
+            if any(cells):
+                yield " | ".join(cells)
+
+
+def _iter_units(kind: str, data: bytes, page_count, pool):
+    if kind == "pdf":
+        yield from iter_pdf_pages(data, page_count, pool)
+    elif kind == "docx":
+        yield from iter_docx_paragraphs(data)
+    elif kind == "text":
+        yield data.decode("utf-8")
+
+
+def file_kind(name: str, mime_type: str = "") -> str:
+    """Classify an upload as ``pdf``, ``docx``, ``text`` or ``unsupported``."""
+    extension = os.path.splitext(name)[1].lower()
+    if mime_type in PDF_TYPES or extension == ".pdf":
+        return "pdf"
+    if mime_type in DOCX_TYPES or extension == ".docx":
+        return "docx"
+    if mime_type.startswith("text/") or extension in (".txt", ".md"):
+        return "text"
+    return "unsupported"
+
+
+def extract_text(name: str, data: bytes, mime_type: str = "", max_tokens: int | None = None, pool=None):
+    """Extract up to ``max_tokens`` tokens of text from one file.
+
+    Returns ``(text, report)``; the report gives the file's ``kind``, its
+    ``pages`` (PDF only), the ``parts`` (pages or paragraphs) actually read,
+    ``tokens`` kept, whether the text was ``truncated``, ``elapsed_ms`` and
+    any ``error``."""
+    start = time.perf_counter()
+    kind = file_kind(name, mime_type)
+    report = {"file": name, "kind": kind, "pages": None, "parts": 0, "tokens": 0,
+              "truncated": False, "elapsed_ms": 0.0, "error": ""}
+    parts = []
+    try:
+        if kind == "pdf":
+            report["pages"] = pdf_page_count(data)
+        elif kind == "unsupported":
+            report["error"] = "Unsupported file type"
+        units = _iter_units(kind, data, report["pages"], pool)
+
+        used = 0
+        for unit in units:
+            report["parts"] += 1
+            size = count_tokens(unit)
+            if max_tokens is not None and used + size > max_tokens:
+                unit = truncate_to_tokens(unit, max_tokens - used)
+                report["truncated"] = True
+                if unit:
+                    parts.append(unit)
+                    used += count_tokens(unit)
+                # Stops the pool from extracting pages nobody will read
+                units.close()
+                break
+            parts.append(unit)
+            used += size
+        report["tokens"] = used
+    except Exception as e:
+        logger.warning("cannot extract text from %s: %s", name, e)
+        report["error"] = str(e)
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return "\n\n".join(parts), report
+
+
+def cached_extract_text(name: str, data: bytes, mime_type: str = "", max_tokens: int | None = None,
+                        pool=None, cache: ResponseCache | None = None):
+    """``extract_text`` served from ``cache`` when the same bytes were seen.
+
+    The key is the SHA-256 of the file with the file kind and ``max_tokens``,
+    so the name a file was uploaded under does not matter. Failed extractions
+    are not cached. The report gains ``sha256`` and ``cached``."""
+    start = time.perf_counter()
+    digest = hashlib.sha256(data).hexdigest()
+    key = make_cache_key("reference", EXTRACTOR_VERSION, digest, file_kind(name, mime_type), max_tokens)
+    value = cache.get(key) if cache else None
+    if value is not None:
+        text, report = json.loads(value)
+        report.update(file=name, sha256=digest, cached=True,
+                      elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+        return text, report
+
+    text, report = extract_text(name, data, mime_type, max_tokens, pool)
+    report.update(sha256=digest, cached=False)
+    if cache and not report["error"]:
+        cache.set(key, json.dumps([text, report]), duration=report["elapsed_ms"] / 1000)
+    return text, report
+
+
+def extract_references(files, max_tokens: int | None = None, pool=None, cache: ResponseCache | None = None):
+    """Extract ``(name, data, mime_type)`` files into one reference text.
+
+    Files are read in order and share ``max_tokens``; once it is used up the
+    remaining files are not opened. Each file is extracted (or looked up in
+    ``cache``) up to the full ``max_tokens`` and then cut to what is left, so
+    a cached entry serves the file wherever it appears in the list. Returns
+    the text, with each file under a ``--- name ---`` header, and one report
+    per file."""
+    text = ""
+    reports = []
+    remaining = max_tokens
+    for name, data, mime_type in files:
+        if remaining is not None and remaining <= 0:
+            reports.append({"file": name, "kind": file_kind(name, mime_type), "pages": None, "parts": 0,
+                            "tokens": 0, "truncated": True, "elapsed_ms": 0.0, "error": ""})
+            continue
+        extracted, report = cached_extract_text(name, data, mime_type, max_tokens, pool, cache)
+        if report["error"]:
+            extracted = f"Error reading file: {report['error']}"
+        elif remaining is not None and report["tokens"] > remaining:
+            extracted = truncate_to_tokens(extracted, remaining)
+            report.update(tokens=count_tokens(extracted), truncated=True)
+        text += f"\n\n--- {name} ---\n{extracted}"
+        if remaining is not None:
+            remaining -= report["tokens"]
+        reports.append(report)
+    return text, reports
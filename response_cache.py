@@ -0,0 +1,137 @@
+"""Disk-backed LRU cache for agent responses.
+
+Entries live in a small SQLite database so the cache survives restarts and can
+be shared by every Streamlit session (and any other process) on the machine.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def make_cache_key(*parts) -> str:
+    """Return a stable SHA-256 key for any JSON-serialisable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed cache with size-based LRU eviction and a TTL.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file holding the cache. Parent directories are created.
+    max_bytes : int
+        Total size of stored values before least recently used entries are
+        evicted.
+    ttl : float
+        Seconds an entry stays valid after it was written. ``0`` disables
+        expiry.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " duration REAL NOT NULL DEFAULT 0,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        """Return the cached value for ``key`` or ``None`` on a miss."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, duration, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl and now - row[2] > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def set(self, key: str, value: str, duration: float = 0.0):
+        """Store ``value`` and evict old entries until the cache fits.
+
+        ``duration`` is how long the value took to produce; it is credited to
+        ``saved_seconds`` whenever the entry is served from the cache."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, duration, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, size, duration, now, now),
+            )
+            if self.ttl:
+                conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+                stale = []
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((old_key,))
+                    total -= old_size
+                conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 1),
+            "entries": entries,
+            "bytes": size,
+        }
@@ -0,0 +1,158 @@
+"""Declarative stage graphs and a concurrent scheduler for them.
+
+A stage names the state keys it reads and the keys it writes. The scheduler
+starts every stage whose inputs are available, so independent stages run at
+the same time, and records when each stage started and finished.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StageFailed(Exception):
+    """Raised by a stage that could not produce its outputs."""
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One node of a stage graph.
+
+    ``run(context, inputs)`` receives the shared run context and a dict with
+    just the declared ``inputs``, and returns a dict with every key listed in
+    ``outputs``. ``agent`` names the AI agent behind the stage, if any."""
+
+    name: str
+    run: Callable[[object, dict], dict]
+    inputs: tuple = ()
+    outputs: tuple = ()
+    agent: Optional[str] = None
+
+
+def topological_order(stages: list[Stage], available=()) -> list[Stage]:
+    """Return ``stages`` in dependency order.
+
+    Raises ``ValueError`` if an input is produced by no stage and is not in
+    ``available``, if two stages produce the same key, or on a cycle."""
+    producers: dict[str, str] = {}
+    for stage in stages:
+        for key in stage.outputs:
+            if key in producers:
+                raise ValueError(f"{key!r} is produced by both {producers[key]} and {stage.name}")
+            producers[key] = stage.name
+
+    known = set(available)
+    for stage in stages:
+        for key in stage.inputs:
+            if key not in producers and key not in known:
+                raise ValueError(f"stage {stage.name} needs {key!r}, which nothing produces")
+
+    ordered = []
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if all(k in known for k in s.inputs)]
+        if not ready:
+            raise ValueError("stage graph has a cycle: " + ", ".join(s.name for s in remaining))
+        for stage in ready:
+            remaining.remove(stage)
+            ordered.append(stage)
+            known.update(stage.outputs)
+    return ordered
+
+
+def downstream_stages(stages: list[Stage], name: str) -> set[str]:
+    """Return ``name`` and the names of every stage that reads its outputs,
+    directly or through other stages.
+
+    Raises ``ValueError`` if no stage is called ``name``."""
+    if name not in {stage.name for stage in stages}:
+        raise ValueError(f"no stage named {name!r}")
+    affected, keys = {name}, set()
+    changed = True
+    while changed:
+        keys.update(key for stage in stages if stage.name in affected for key in stage.outputs)
+        consumers = {stage.name for stage in stages if keys.intersection(stage.inputs)}
+        changed = not consumers <= affected
+        affected |= consumers
+    return affected
+
+
+def run_stage_graph(stages: list[Stage], state: dict, context=None, max_workers: int = 4,
+                    initializer=None) -> list[dict]:
+    """Run ``stages`` concurrently as their inputs become available.
+
+    Outputs are merged into ``state`` in place. Once a stage fails no new
+    stages are started, but those already running are allowed to finish.
+    ``initializer`` is called in each worker thread before it runs stages.
+
+    Returns the timeline: one entry per started stage with its ``start`` and
+    ``end`` offsets in seconds from the start of the run and its ``status``
+    (``completed`` or ``failed``)."""
+    pending = topological_order(stages, state)
+    timeline: list[dict] = []
+    running = {}
+    failed = False
+    origin = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), initializer=initializer) as pool:
+        while pending or running:
+            if not failed:
+                for stage in [s for s in pending if all(k in state for k in s.inputs)]:
+                    pending.remove(stage)
+                    inputs = {key: state[key] for key in stage.inputs}
+                    future = pool.submit(stage.run, context, inputs)
+                    running[future] = (stage, time.perf_counter() - origin)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, started = running.pop(future)
+                entry = {
+                    "stage": stage.name,
+                    "agent": stage.agent,
+                    "start": round(started, 3),
+                    "end": round(time.perf_counter() - origin, 3),
+                    "status": "completed",
+                }
+                try:
+                    outputs = future.result()
+                    missing = [key for key in stage.outputs if key not in outputs]
+                    if missing:
+                        raise StageFailed(f"stage {stage.name} did not produce {', '.join(missing)}")
+                    state.update({key: outputs[key] for key in stage.outputs})
+                except Exception as e:
+                    if not isinstance(e, StageFailed):
+                        logger.exception("stage %s raised", stage.name)
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                    failed = True
+                timeline.append(entry)
+    return timeline
+
+
+def critical_path(stages: list[Stage], timeline: list[dict]) -> list[str]:
+    """Return the chain of stages that determined when the run finished.
+
+    Starting from the stage that ended last, repeatedly step to whichever of
+    its dependencies finished last."""
+    # Timeline order breaks ties between stages that ended in the same tick
+    ends = {entry["stage"]: (entry["end"], i) for i, entry in enumerate(timeline)}
+    if not ends:
+        return []
+    producers = {key: stage for stage in stages for key in stage.outputs}
+    by_name = {stage.name: stage for stage in stages}
+    path = [max(ends, key=ends.get)]
+    while True:
+        deps = {
+            producers[key].name
+            for key in by_name[path[-1]].inputs
+            if key in producers and producers[key].name in ends
+        }
+        if not deps:
+            break
+        path.append(max(deps, key=ends.get))
+    return list(reversed(path))
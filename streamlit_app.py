@@ -1,20 +1,28 @@
 import streamlit as st
-import openai
 from datetime import datetime
 import json
 import io
 import time
 from docx import Document
-import markdown
 import base64
 import re
-import networkx as nx
-from pyvis.network import Network
 import streamlit.components.v1 as components
-import hashlib
-import random
-import math
-import os
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import threading
+from content_pipeline import (
+    REFERENCE_TOKEN_BUDGET,
+    PipelineReporter,
+    apply_revision,
+    call_agent,
+    get_response_cache,
+    run_content_pipeline,
+)
+from knowledge_store import get_knowledge_store
+from query_coverage import score_coverage
+from query_fanout import QueryStreamParser
+from query_report import build_query_report, content_html, results_digest
+from reference_extraction import extract_references, get_extraction_cache, get_process_pool
+from response_cache import make_cache_key
 
 
 # Page configuration
@@ -169,495 +177,138 @@ if "agent_status" not in st.session_state:
         "Editor-in-Chief": "Pending",
     }
 
-# Model mapping
-MODEL_MAP = {
-    "4.1": "gpt-4.1-2025-04-14",
-    "4o": "gpt-4o-2024-08-06",
-    "o3": "o3-2025-04-16"
-}
+def make_stream_writer(placeholders, label="", interval=0.15):
+    """Return an ``on_token`` callback that renders streamed text live.
 
-# Enhanced Agent System Prompts
+    Every redraw is a websocket message to the browser, so updates are
+    throttled to one per ``interval`` seconds with a final redraw at the end."""
+    last_draw = [0.0]
 
-AGENT_PROMPTS = {
-    "Strategist": """You are the Lead Content Strategist at Momentic, with deep expertise in B2B SaaS content strategy and technical audience engagement. You've studied how developers and technical decision-makers consume content, and you understand what makes them trust and engage with a brand.
+    def write(text, final=False):
+        now = time.perf_counter()
+        if not final and now - last_draw[0] < interval:
+            return
+        last_draw[0] = now
+        for placeholder in placeholders:
+            placeholder.text(f"{label}\n{text}" if label else text)
 
-    Your strategic foundation:
-    - People trust expertise demonstrated through understanding, not claims
-    - Clarity beats cleverness, but depth builds authority
-    - Every piece must solve a real problem for a real person
-    - Great content feels like advice from a helpful, knowledgeable colleague
-    
-    Strategic approach:
-    - Analyze the target audience's specific pain points, technical sophistication, and decision-making criteria
-    - Identify the unique angle that will differentiate this content from generic tech content
-    - Map content to the buyer's journey stage and specific use cases
-    - Balance immediate practical value with long-term thought leadership
-    
-    Deliverables:
-    1) **Refined Title**: Create 3 title variations - one SEO-optimized, one curiosity-driven, one value-focused. Recommend the best.
-    2) **Strategic Positioning**: Define the content's unique angle, key differentiators, and competitive advantage
-    3) **Detailed Content Architecture**:
-       - Hook strategy (first 150 words that earn attention)
-       - Section flow with smooth transition logic
-       - Information density distribution (where to go deep vs. high-level)
-       - Engagement tactics (examples, visuals, interactive elements)
-    4) **Voice & Tone Blueprint**:
-       - Technical sophistication level (1-5 scale with specific markers)
-       - Professional yet human tone balance
-       - Trust-building credibility markers
-       - Common pitfalls to avoid (buzzwords, jargon, condescension)
-    
-    Remember: You're setting up the team for success. Be specific, practical, and always keep the reader's needs at the center.
+    return write
 
-When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
-    
-    "Specialist Writer": """You are Momentic's Senior Technical Content Writer, specializing in making complex technical concepts accessible without dumbing them down. You have a background in software development and understand that great technical writing respects the reader's intelligence while ensuring clarity.
-
-    Your writing principles:
-    - Start with a hook that shows you understand the reader's world
-    - Use the "show, then tell" approach - concrete examples before abstract concepts
-    - Write like a helpful colleague, not a textbook
-    - Build narrative momentum even in technical content
-    - Every paragraph should make the reader want the next one
-    
-    Writing approach:
-    1) **Opening**: Craft a first paragraph that immediately demonstrates value and understanding
-    2) **Structure**: Follow the strategic outline while maintaining natural, conversational flow
-    3) **Technical Depth**: Include enough detail to be genuinely useful, not just informative
-    4) **Engagement**: Vary paragraph lengths, ask strategic questions, reveal insights progressively
-    5) **Evidence**: Support all claims with specific examples, real data, or concrete scenarios
-    6) **Conclusion**: End with actionable next steps, not just summary
-    
-    Style guidelines:
-    - Active voice unless passive serves clarity
-    - Short sentences for key points, longer for context
-    - Explain technical terms inline without condescension
-    - Professional but conversational - like explaining to a smart colleague
-    - Use "you" to speak directly to the reader
-    - Avoid buzzwords and corporate jargon entirely
-    
-    Your goal: Create content that a senior developer would actually bookmark and share with their team.
-
-When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
-        
-    "SEO Specialist": """You are Aurora-SEO at Momentic, a future-proof search strategist and relevance engineer specializing in driving organic impact across classic SERPs and AI surfaces (AI Overviews, AI Mode, ChatGPT, Perplexity).
-    
-    Core Identity:
-    - Mission: Drive measurable organic impact across traditional and AI-powered search surfaces
-    - Mindset: Treat search as a probabilistic system governed by LLM reasoning chains, not just keyword matching
-    - Ethic: Prioritize user trust, factual accuracy, and long-term brand equity
-    
-    Your RAISE-R Workflow:
-    1) **Request-clarify**: Understand the content's goal and target metrics
-    2) **Audit current surface**: Analyze SERP/AI Mode snapshots and competing passages
-    3) **Infer fan-out landscape**: Generate 20+ synthetic queries spanning all query fan out types. Things that actual humans would think/say/type in a chatbot.
-    4) **Score semantic gaps**: Identify where content fails to align with search intent and report this out.
-    5) **Engineer relevance**: Optimize for both traditional SEO and AI snippet capture. Do this by mapping cosine similarity and chunking.
-    6) **Review & report**: Report everything out in its proper place.
-    
-    Optimization Approach:
-    - **Snippet Sculpting**: Position key value props in first 160 characters for AI snippet capture
-    - **Semantic Structure**: Create modular chunks that answer in <320 chars with clear entity anchors
-    - **Multi-modal Optimization**: Ensure images, videos, and code blocks reinforce main claims
-    - **Citation Engineering**: Structure content to maximize AI system citations
-    - **Zero-Click Strategy**: Optimize for influence even without direct clicks
-    
-    Technical Implementation:
-    - Natural keyword integration that serves user intent
-    - Structured data only when genuinely helpful
-    - Passage indexing optimization for AI retrieval
-    - Clear entity linking and semantic triples
-    - Accessibility compliance (alt text, ARIA landmarks)
-    
-    Output Requirements:
-    - Concise, actionable recommendations
-    - Bullet points over prose
-    - Flag uncertainty rather than fabricate metrics
-    - Include measurement hooks for citation frequency and answer prominence
-    - Under a **Search Queries** heading, list each suggestion as `<Type>: <query>` and double-check that the type label matches the query intent.
-    
-    Never sacrifice readability for traditional SEO metrics. The best content serves users first and search engines second.
+def reset_chats():
+    """Clear all stored chat history."""
+    st.session_state.chats = {
+        "Strategist": [],
+        "SEO Specialist": [],
+        "Specialist Writer": [],
+        "Head of Content": [],
+        "Editor-in-Chief": []
+    }
 
-When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
-    
-    "Head of Content": """You are Momentic's Head of Content with 15+ years in B2B tech content leadership. You've built content programs that establish market authority while driving real business results. You review content through both strategic and practical lenses.
 
-    Your review framework:
-    
-    **Strategic Alignment**:
-    - Does this reinforce Momentic's position as a trusted technical authority?
-    - Are we demonstrating genuine expertise without arrogance?
-    - Is our unique perspective coming through clearly?
-    - Will this content build long-term brand equity?
-    
-    **Reader Value**:
-    - Does every section deliver on the title's promise?
-    - Are we solving a real problem or just adding noise?
-    - Is the advice practical and actionable?
-    - Would our target reader thank us for this content?
-    
-    **Message Clarity**:
-    - Are key points impossible to miss?
-    - Do we address likely objections naturally?
-    - Is our value proposition clear but not heavy-handed?
-    - Are transitions smooth and logical?
-    
-    **Quality Standards**:
-    - All claims substantiated with evidence
-    - Technical accuracy verified
-    - Consistent voice that builds trust
-    - Polish that reflects our standards
-    
-    Enhancement priorities:
-    1) Strengthen weak arguments with better evidence or remove them
-    2) Amplify unique insights only Momentic could provide
-    3) Ensure voice consistency - helpful colleague, not salesperson
-    4) Add CTAs that feel genuinely helpful, never pushy
-    5) Polish for memorability - what's the one thing readers will remember?
-    
-    Your goal: Elevate good content to exceptional. Make it something you'd be proud to put your name on.
 
-When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions.""",
-    
-    "Editor-in-Chief": """You are Momentic's Editor-in-Chief, the final guardian of content quality and brand reputation. You've edited thousands of technical articles and have developed an instinct for what truly serves technical audiences.
+class StreamlitReporter(PipelineReporter):
+    """Show pipeline progress in the sidebar, progress bar and live stage views.
 
-    Your review criteria:
-    
-    **Technical Excellence** (0-10):
-    - Accuracy of all technical claims
-    - Appropriate depth without overwhelming
-    - Quality of code examples and demonstrations
-    - Logical flow of technical arguments
-    
-    **Reader Value** (0-10):
-    - Does the hook immediately demonstrate understanding?
-    - Consistent value delivery throughout
-    - Practical, actionable insights
-    - Memorable takeaways they'll actually use
-    
-    **Brand Building** (0-10):
-    - Strengthens Momentic's authority authentically
-    - Clear differentiation from generic content
-    - Builds trust through demonstrated expertise
-    - Advances our thought leadership naturally
-    
-    **Professional Polish** (0-10):
-    - Grammar and style consistency
-    - Clarity of expression throughout
-    - Appropriate professional tone
-    - Ready for publication without embarrassment
-    
-    Non-negotiable standards:
-    - No unsubstantiated claims
-    - No buzzword bingo or corporate jargon
-    - No condescension or oversimplification
-    - No SEO tactics that hurt readability
-    - No generic insights anyone could write
-    
-    Provide your verdict:
-    APPROVAL: [Approved/Needs Minor Revision/Needs Major Revision]
-    OVERALL_SCORE: [X/40]
-    BREAKDOWN: Technical: [X/10] | Value: [X/10] | Brand: [X/10] | Polish: [X/10]
-    
-    STANDOUT STRENGTHS:
-    - [What makes this exceptional]
-    
-    REVISION REQUIREMENTS:
-    - [Specific issues that must be fixed]
-    
-    STRATEGIC IMPACT:
-    - [How this advances our content goals]
-    
-    FINAL_TITLE: [The polished, publication-ready title]
-    FINAL_SLUG: [SEO-optimized URL slug]
-    FINAL_DESCRIPTION: [A description of the content that convinces the reader that it's worth reading]
-    
-    Editor's instinct: Would YOU save this article? Would you share it with a colleague?
-
-When you finish, add a section titled 'Recommended Next Steps:' followed by a bullet list of actionable suggestions."""
-}
-
-def extract_text_from_file(uploaded_file):
-    """Extract text from uploaded files"""
-    try:
-        if uploaded_file.type == "text/plain":
-            return str(uploaded_file.read(), "utf-8")
-        elif uploaded_file.type == "application/pdf":
-            # Note: In production, you'd use PyPDF2 or pdfplumber
-            return "PDF content extraction would go here"
-        elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            # Note: In production, you'd properly extract from DOCX
-            return "DOCX content extraction would go here"
-        else:
-            return "Unsupported file type"
-    except Exception as e:
-        return f"Error reading file: {str(e)}"
-
-def load_knowledge(directory: str = "knowledge") -> str:
-    """Concatenate Markdown files from the knowledge directory."""
-    content = ""
-    try:
-        for name in sorted(os.listdir(directory)):
-            path = os.path.join(directory, name)
-            if os.path.isfile(path) and name.endswith(".md"):
-                with open(path, "r") as f:
-                    data = f.read().strip()
-                content += f"\n\n--- {name} ---\n{data}"
-    except Exception:
-        pass
-    return content
-
-def call_agent(agent_name, prompt, model, api_key, context=""):
-    """Make API call to OpenAI for an agent"""
-    try:
-        openai.api_key = api_key
-        
-        system_content = AGENT_PROMPTS[agent_name] + "\n\nRespond in plain text only. Do not use Markdown formatting."
-        messages = [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": f"{context}\n\n{prompt}"}
-        ]
-        
-        params = {
-            "model": MODEL_MAP[model],
-            "messages": messages,
-           # "temperature": 0.7,
-        }
-
-        if MODEL_MAP[model].startswith("o3"):
-            params["max_completion_tokens"] = 20000
-        else:
-            params["max_tokens"] = 20000
+    Parameters
+    ----------
+    status_container : st.container
+        Sidebar container used to display stage status messages.
 
-        response = openai.ChatCompletion.create(**params)
-        
-        return response.choices[0].message.content
-    except Exception as e:
-        st.error(f"Error calling {agent_name}: {str(e)}")
-        return None
+    session_placeholder : st.empty
+        Sidebar placeholder showing current session details.
 
-def parse_next_steps(output):
-    """Split agent output into main content and bullet list of next steps"""
-    if "Recommended Next Steps:" in output:
-        content, steps_part = output.split("Recommended Next Steps:", 1)
-        steps = [
-            line.strip("- ").strip()
-            for line in steps_part.strip().splitlines()
-            if line.strip().startswith("-")
-        ]
-        return content.strip(), steps
-    return output.strip(), []
-
-def parse_queries(text: str) -> list[dict]:
-    """Extract search queries from SEO Specialist output.
-
-    Returns a list of dictionaries with ``type``, ``query`` and ``note`` keys
-    so we can validate how the SEO agent labeled each suggestion and capture
-    any explanation that follows a dash."""
-
-    queries: list[dict] = []
-    bullet_pattern = re.compile(r"^\s*(?:[-*]|\d+[.)]|\d+:)\s*(.+)")
-    typed_pattern = re.compile(r"(?P<type>[^:-]+)\s*[:-]\s*(?P<rest>.+)")
-    known_types = {
-        "reformulation",
-        "implicit",
-        "comparative",
-        "entity_expansion",
-        "personalized",
-        "temporal",
-        "location",
-        "user_intent",
-        "technical",
-    }
-    capture = False
-    found = False
-    for line in text.splitlines():
-        lower = line.lower().strip()
-        match = bullet_pattern.match(line)
-        if not capture:
-            heading = "search queries" in lower or (
-                "query" in lower and (":" in lower or lower.startswith("#"))
-            )
-            start_list = False
-            if match:
-                item = match.group(1).strip()
-                tmatch = typed_pattern.match(item)
-                if tmatch:
-                    qtype_check = tmatch.group("type").strip().lower().replace(" ", "_")
-                    if qtype_check in known_types:
-                        start_list = True
-            if heading or start_list:
-                capture = True
-                if start_list:
-                    # Fall through to process this line as a query
-                    pass
-                else:
-                    continue
-        if not line.strip():
-            continue
+    stream_container : st.container, optional
+        Main-area container where each stage's output is streamed live.
 
-        match = bullet_pattern.match(line)
-        if match:
-            item = match.group(1).strip()
-            tmatch = typed_pattern.match(item)
-            if tmatch:
-                qtype = tmatch.group("type").strip().lower().replace(" ", "_")
-                rest = tmatch.group("rest").strip()
-                if qtype not in known_types:
-                    rest = item
-                    qtype = ""
-            else:
-                qtype = ""
-                rest = item
+    chat_placeholder : st.empty, optional
+        Sidebar chat placeholder that mirrors the stage currently streaming.
+    """
 
-            if " - " in rest:
-                qtext, note = rest.split(" - ", 1)
-                qtext = qtext.strip()
-                note = note.strip()
-            else:
-                qtext = rest
-                note = ""
+    STAGE_MESSAGES = {
+        "Strategist": "🎯 {time} - **Strategist** is planning content strategy...",
+        "SEO Specialist": "🔍 {time} - **SEO Specialist** is optimizing for search...",
+        "Specialist Writer": "✍️ {time} - **Specialist Writer** is drafting content...",
+        "Head of Content": "📝 {time} - **Head of Content** is refining for brand alignment...",
+        "Editor-in-Chief": "✅ {time} - **Editor-in-Chief** is reviewing for final approval...",
+    }
 
-            if qtext:
-                queries.append({"type": qtype, "query": qtext, "note": note})
-                found = True
+    def __init__(self, status_container, progress_bar, session_placeholder, stream_container=None, chat_placeholder=None):
+        self.status_container = status_container
+        self.progress_bar = progress_bar
+        self.session_placeholder = session_placeholder
+        self.stream_container = stream_container
+        self.chat_placeholder = chat_placeholder
+        self.streaming = stream_container is not None or chat_placeholder is not None
+        self._writers = {}
+        self._query_parser = None
+        self._query_view = None
+        self._script_ctx = get_script_run_ctx()
+
+    def start(self, skipped):
+        st.session_state.current_content = {}
+        for agent in st.session_state.agent_status:
+            st.session_state.agent_status[agent] = "Skipped" if agent in skipped else "Queued"
+        refresh_current_session(self.session_placeholder)
+
+    def stage_started(self, agent):
+        st.session_state.agent_status[agent] = "In progress"
+        refresh_current_session(self.session_placeholder)
+        self.status_container.info(self.STAGE_MESSAGES[agent].format(time=f"{datetime.now():%H:%M:%S}"))
+        targets = []
+        if self.stream_container is not None:
+            with self.stream_container:
+                expander = st.expander(agent, expanded=True)
+                targets.append(expander.empty())
+                if agent == "SEO Specialist":
+                    # Queries are listed as soon as their line is complete
+                    self._query_parser = QueryStreamParser()
+                    self._query_view = expander.empty()
+        if self.chat_placeholder is not None:
+            targets.append(self.chat_placeholder)
+        self._writers[agent] = make_stream_writer(targets, label=f"{agent}:")
+
+    def stage_token(self, agent, text, final=False):
+        self._writers[agent](text, final)
+        if agent == "SEO Specialist" and self._query_parser is not None:
+            parser = self._query_parser
+            restarts = parser.restarts
+            new = parser.feed_text(text)
+            if final:
+                new += parser.close()
+            if parser.restarts != restarts:
+                # The reply started over on a fallback model
+                self._query_view.empty()
+            if new:
+                self._query_view.table([
+                    {"Type": q["type"] or "-", "Query": q["query"], "Reason": q["note"]} for q in parser.queries
+                ])
+
+    def stage_completed(self, agent, key, output, metrics):
+        st.session_state.current_content[key] = output
+        st.session_state.agent_status[agent] = "Completed"
+        refresh_current_session(self.session_placeholder)
+        if metrics.get("restored"):
+            self.status_container.caption(f"{agent}: restored from checkpoint")
+        elif metrics.get("cached"):
+            self.status_container.caption(f"{agent}: reused cached reply")
         else:
-            if found:
-                break
-
-    seen = set()
-    unique = []
-    for q in queries:
-        qnorm = q["query"].lower()
-        if qnorm not in seen:
-            unique.append(q)
-            seen.add(qnorm)
-
-    return unique
-
-def pseudo_embedding(text: str, dim: int = 8) -> list[float]:
-    """Deterministic pseudo embedding based on text hash."""
-    seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % (2**32)
-    rng = random.Random(seed)
-    return [rng.random() for _ in range(dim)]
-
-
-def cosine_sim(v1: list[float], v2: list[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    dot = sum(a * b for a, b in zip(v1, v2))
-    norm1 = math.sqrt(sum(a * a for a in v1))
-    norm2 = math.sqrt(sum(b * b for b in v2))
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return dot / (norm1 * norm2)
-
-
-def classify_query(query: str) -> str:
-    """Heuristically classify a query into fan-out types."""
-    q = query.lower()
-
-    if any(t in q for t in [" vs ", "versus", "compare", "difference", "better than"]):
-        return "comparative"
-
-    if re.search(r"\b(near me|in [a-z]+|at [a-z]+|location|city|country)\b", q):
-        return "location"
-
-    if re.search(r"\b(20\d{2}|today|latest|this year|this month)\b", q) or re.search(r"\b\d+[- ]?(day|week|month|year)s?\b", q):
-        return "temporal"
-
-    if re.search(r"\b(my|for me|i |personalized|best for me|should i)\b", q):
-        return "personalized"
-
-    if any(t in q for t in ["error", "install", "setup", "troubleshoot", "code", "configuration", "how to", "fix"]):
-        return "technical"
-
-    if any(t in q for t in ["alternative", "similar", "related", "competitor"]):
-        return "entity_expansion"
-
-    if any(t in q for t in ["what is", "define", "definition", "meaning"]):
-        return "reformulation"
-
-    first = q.split()[0] if q.split() else ""
-    if first in ["how", "why", "what", "where", "when", "who"]:
-        return "user_intent"
-
-    return "implicit"
-
-
-def expand_query(query: str, root: str) -> list[str]:
-    """Create variations of a query for fan-out."""
-    templates = [
-        f"What is {query}?",
-        f"How does {query} compare to {root}?",
-        f"{query} best practices",
-        f"Examples of {query}",
-        f"Benefits of {query}",
-        f"{query} vs alternatives",
-    ]
-    return templates
-
-
-def build_query_graph(title: str, base_queries: list[str], min_queries: int = 30, levels: int = 3):
-    """Build query fan-out graph with pseudo-embedding similarities."""
-    G = nx.DiGraph()
-    node_data: dict[str, dict] = {}
-    root_vec = pseudo_embedding(title)
-    G.add_node("n0", label=title)
-    node_data["n0"] = {"text": title, "vector": root_vec, "similarity": 1.0}
-
-    node_id = 1
-    parents = ["n0"]
-    queries_added = 0
-
-    # First level from provided queries
-    for q in base_queries:
-        nid = f"n{node_id}"
-        node_id += 1
-        vec = pseudo_embedding(q)
-        sim = cosine_sim(root_vec, vec)
-        G.add_node(nid, label=q)
-        G.add_edge("n0", nid)
-        node_data[nid] = {"text": q, "vector": vec, "similarity": sim}
-        parents.append(nid)
-        queries_added += 1
-
-    level = 1
-    while queries_added < min_queries and level < levels:
-        new_parents = []
-        for pid in parents:
-            base_text = node_data[pid]["text"]
-            for exp in expand_query(base_text, title):
-                if queries_added >= min_queries:
-                    break
-                nid = f"n{node_id}"
-                node_id += 1
-                vec = pseudo_embedding(exp)
-                sim = cosine_sim(root_vec, vec)
-                G.add_node(nid, label=exp)
-                G.add_edge(pid, nid)
-                node_data[nid] = {"text": exp, "vector": vec, "similarity": sim}
-                new_parents.append(nid)
-                queries_added += 1
-            if queries_added >= min_queries:
-                break
-        parents = new_parents
-        level += 1
-        if not parents:
-            break
-
-    return G, node_data
+            self.status_container.caption(
+                f"{agent}: first token after {metrics['ttft']:.1f}s, done in {metrics['duration']:.1f}s"
+            )
 
+    def progress(self, fraction):
+        self.progress_bar.progress(fraction)
 
-def reset_chats():
-    """Clear all stored chat history."""
-    st.session_state.chats = {
-        "Strategist": [],
-        "SEO Specialist": [],
-        "Specialist Writer": [],
-        "Head of Content": [],
-        "Editor-in-Chief": []
-    }
+    def error(self, message):
+        st.error(message)
 
+    def bind_thread(self):
+        # Stages run on worker threads, which need the script context to draw
+        add_script_run_ctx(threading.current_thread(), self._script_ctx)
+
+    def finished(self):
+        self.status_container.success(f"✨ {datetime.now():%H:%M:%S} - Content generation complete!")
+        refresh_current_session(self.session_placeholder)
 
 
 def refresh_current_session(placeholder):
@@ -675,317 +326,27 @@ def refresh_current_session(placeholder):
         for agent, status in st.session_state.agent_status.items():
             st.markdown(f"**{agent}**: {status}")
 
-def run_content_pipeline(inputs, model, api_key, status_container, progress_bar, session_placeholder, plan_mode=False):
-    """Run the full 5-agent content creation pipeline
-
-    Parameters
-    ----------
-    status_container : st.container
-        Sidebar container used to display stage status messages.
-
-    session_placeholder : st.empty
-        Sidebar placeholder showing current session details.
-    """
-    
-    # Extract inputs
-    content_type = inputs["content_type"]
-    topic = inputs["topic"]
-    audience = inputs["audience"]
-    length = inputs["length"]
-    key_messages = inputs["key_messages"]
-    brand_voice = inputs["brand_voice"]
-    keywords = inputs["keywords"]
-    compliance = inputs["compliance"]
-    references = inputs["references"]
-    knowledge = load_knowledge()
-    context_info = (
-        f"Content Type: {content_type}\n"
-        f"Topic: {topic}\n"
-        f"Target Audience: {audience}\n"
-        f"Length: {length}\n"
-        f"Key Messages: {key_messages}\n"
-        f"Brand Voice: {brand_voice or 'Professional, data-driven, friendly'}\n"
-        f"SEO Keywords: {keywords}\n"
-        f"Compliance Requirements: {compliance}\n"
-        f"Knowledge Base:\n"
-        f"{knowledge[:1000] + '...' if len(knowledge) > 1000 else knowledge}\n"
-
-        f"Reference Materials:\n"
-        f"{references[:1000] + '...' if len(references) > 1000 else references}"
+# Derived views are memoized on a digest of the results, so reruns from a
+# checkbox or a chat message reuse them. Arguments starting with an
+# underscore are not hashed by Streamlit.
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_query_report(digest, _results):
+    return build_query_report(
+        _results['final_title'], _results['queries'], _results.get('queries_typed', [])
     )
-    results = {}
-    next_steps = {}
 
-    st.session_state.current_content = {}
-    for agent in st.session_state.agent_status:
-        st.session_state.agent_status[agent] = "Queued"
 
-    if plan_mode:
-        st.session_state.agent_status["Specialist Writer"] = "Skipped"
-        st.session_state.agent_status["Editor-in-Chief"] = "Skipped"
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_content_html(cache_key, _content, title):
+    return content_html(_content, title)
 
-    refresh_current_session(session_placeholder)
-    
-    # Stage 1: Strategist
-    start_time = datetime.now()
-    st.session_state.agent_status["Strategist"] = "In progress"
 
-    refresh_current_session(session_placeholder)
+def create_download_button(content, filename, button_text, file_format, cache_key=None):
+    """Create download button for different file formats
 
-    status_container.info(f"🎯 {start_time:%H:%M:%S} - **Strategist** is planning content strategy...")
-    
-    strategist_prompt = f"""
-    Content Type: {content_type}
-    Topic: {topic}
-    Target Audience: {audience}
-    Length: {length}
-    Key Messages: {key_messages}
-    Brand Voice: {brand_voice or 'Professional, data-driven, friendly'}
-    Reference Materials: {references[:500] + '...' if len(references) > 500 else references}
-    
-    Create a comprehensive content strategy with outline.
-    """
-    
-    strategy_raw = call_agent("Strategist", strategist_prompt, model, api_key, context_info)
-    if not strategy_raw:
-        return None
-    strategy, steps = parse_next_steps(strategy_raw)
-    results["strategy"] = strategy
-    st.session_state.current_content["strategy"] = strategy
-    next_steps["Strategist"] = steps
-    st.session_state.agent_status["Strategist"] = "Completed"
-    refresh_current_session(session_placeholder)
-
-    progress_bar.progress(0.33 if plan_mode else 0.2)
-    
-    # Stage 2: SEO Specialist
-    st.session_state.agent_status["SEO Specialist"] = "In progress"
-    refresh_current_session(session_placeholder)
-    status_container.info(f"🔍 {datetime.now():%H:%M:%S} - **SEO Specialist** is optimizing for search...")
-
-    if plan_mode:
-        seo_prompt = f"""
-        Analyze search opportunities for the topic "{topic}" based on this strategy:
-        {strategy}
-
-        Provide at least 15 high-potential search query fanouts across these types:
-        reformulation, implicit, comparative, entity_expansion, personalized, temporal, location, user_intent, technical.
-        Return them as bullet points under the heading "Search Queries:" using the format "<Type>: <Search query> - <brief note>".
-        """
-    else:
-        seo_prompt = f"""
-        Analyze search opportunities for the topic "{topic}" using these keywords: {keywords}
-        {strategy}
-
-        Provide at least 15 high-potential search query fanouts across these types:
-        reformulation, implicit, comparative, entity_expansion, personalized, temporal, location, user_intent, technical.
-        Return them as bullet points under the heading "Search Queries:" using the format "<Type>: <Search query> - <brief note>".
-        """
-
-    seo_raw = call_agent("SEO Specialist", seo_prompt, model, api_key, context_info)
-    if not seo_raw:
-        return None
-    seo_content, steps = parse_next_steps(seo_raw)
-    results["seo_content"] = seo_content
-    st.session_state.current_content["seo_content"] = seo_content
-
-    parsed_queries = parse_queries(seo_content)
-    results["queries_typed"] = parsed_queries
-    results["queries"] = [q["query"] for q in parsed_queries]
-    next_steps["SEO Specialist"] = steps
-    st.session_state.agent_status["SEO Specialist"] = "Completed"
-    refresh_current_session(session_placeholder)
-    progress_bar.progress(0.66 if plan_mode else 0.4)
-
-    draft = ""
-    if not plan_mode:
-        # Stage 3: Specialist Writer
-        st.session_state.agent_status["Specialist Writer"] = "In progress"
-        refresh_current_session(session_placeholder)
-        status_container.info(f"✍️ {datetime.now():%H:%M:%S} - **Specialist Writer** is drafting content...")
-
-        writer_prompt = f"""
-        Based on this strategy:
-        {strategy}
-
-        Incorporate relevant search intent from these queries:
-        {', '.join(results['queries'])}
-
-        Write the full content for a {content_type} about {topic}.
-        Target audience: {audience}
-        Length: {length}
-        Key messages to include: {key_messages}
-        Voice: {brand_voice or 'Professional, data-driven, friendly'}
-        """
-
-        draft_raw = call_agent("Specialist Writer", writer_prompt, model, api_key, context_info)
-        if not draft_raw:
-            return None
-        draft, steps = parse_next_steps(draft_raw)
-        results["draft"] = draft
-        st.session_state.current_content["draft"] = draft
-        next_steps["Specialist Writer"] = steps
-        st.session_state.agent_status["Specialist Writer"] = "Completed"
-        refresh_current_session(session_placeholder)
-        progress_bar.progress(0.6)
-
-    # Stage 4: Head of Content
-    st.session_state.agent_status["Head of Content"] = "In progress"
-    refresh_current_session(session_placeholder)
-    status_container.info(f"📝 {datetime.now():%H:%M:%S} - **Head of Content** is refining for brand alignment...")
-
-    if plan_mode:
-        head_prompt = f"""
-        Using the strategy and SEO analysis below, create a comprehensive content plan and brief for "{topic}". Highlight key messages, structure recommendations and how the fanout queries can be used.
-
-        Strategy:
-        {strategy}
-
-        SEO Analysis:
-        {seo_content}
-        """
-    else:
-        head_prompt = f"""
-        Refine this content for brand alignment and compliance.
-        Brand voice: {brand_voice or 'Professional, data-driven, friendly'}
-        Compliance requirements: {compliance}
-
-        Content to refine:
-        {draft if draft else seo_content}
-
-        Return the full refined content.
-        """
-
-    polished_raw = call_agent("Head of Content", head_prompt, model, api_key, context_info)
-    if not polished_raw:
-        return None
-    polished, steps = parse_next_steps(polished_raw)
-    results["polished"] = polished
-    st.session_state.current_content["polished"] = polished
-    next_steps["Head of Content"] = steps
-    st.session_state.agent_status["Head of Content"] = "Completed"
-    refresh_current_session(session_placeholder)
-    progress_bar.progress(1.0 if plan_mode else 0.8)
-    
-    if not plan_mode:
-        # Stage 5: Editor-in-Chief
-        st.session_state.agent_status["Editor-in-Chief"] = "In progress"
-        refresh_current_session(session_placeholder)
-        status_container.info(f"✅ {datetime.now():%H:%M:%S} - **Editor-in-Chief** is reviewing for final approval...")
-
-        editor_prompt = f"""
-        Review this final content for approval.
-        Original topic: {topic}
-        Content type: {content_type}
-
-        Content to review:
-        {polished}
-        """
-
-        editor_raw = call_agent("Editor-in-Chief", editor_prompt, model, api_key, context_info)
-        if not editor_raw:
-            return None
-        editor_review, steps = parse_next_steps(editor_raw)
-        results["editor_review"] = editor_review
-        st.session_state.current_content["editor_review"] = editor_review
-        next_steps["Editor-in-Chief"] = steps
-        st.session_state.agent_status["Editor-in-Chief"] = "Completed"
-        refresh_current_session(session_placeholder)
-        progress_bar.progress(1.0)
-
-        # Parse editor review
-        try:
-            lines = editor_review.split('\n')
-            approval = "Approved"
-            score = "8/10"
-            comments = ""
-            final_title = topic
-
-            for line in lines:
-                if "APPROVAL:" in line:
-                    approval = line.split("APPROVAL:")[1].strip()
-                elif "SCORE:" in line:
-                    score = line.split("SCORE:")[1].strip()
-                elif "COMMENTS:" in line:
-                    comments = line.split("COMMENTS:")[1].strip()
-                elif "FINAL_TITLE:" in line:
-                    final_title = line.split("FINAL_TITLE:")[1].strip()
-
-            results["approval"] = approval
-            results["score"] = score
-            results["comments"] = comments
-            results["final_title"] = final_title
-            results["final_content"] = polished
-            results["next_steps"] = next_steps
-
-        except:
-            results["approval"] = "Approved"
-            results["score"] = "8/10"
-            results["comments"] = "Content meets quality standards."
-            results["final_title"] = topic
-            results["final_content"] = polished
-            results["next_steps"] = next_steps
-
-    else:
-        results["final_title"] = topic
-        results["final_content"] = polished
-        results["approval"] = "Plan Complete"
-        results["score"] = "N/A"
-        results["next_steps"] = next_steps
-        progress_bar.progress(1.0)
-    
-    status_container.success(f"✨ {datetime.now():%H:%M:%S} - Content generation complete!")
-    refresh_current_session(session_placeholder)
-
-    results["context_info"] = context_info
-    return results
-
-def apply_revision(content, feedback, model, api_key, context=""):
-    """Apply user feedback to revise content"""
-    
-    revision_prompt = f"""
-    Apply the following user feedback to revise this content:
-    
-    Feedback: {feedback}
-    
-    Current content:
-    {content}
-    
-    Provide the full revised content and then add:
-    APPROVAL: [Approved/Needs Revision]
-    SCORE: [X/10]
+    ``cache_key`` identifies ``content`` for the memoized HTML conversion;
+    it defaults to a hash of the content itself.
     """
-    
-    revised = call_agent("Editor-in-Chief", revision_prompt, model, api_key, context)
-    
-    if revised:
-        # Parse the response
-        content_parts = revised.split("APPROVAL:")
-        revised_content = content_parts[0].strip()
-        
-        approval = "Approved"
-        score = "9/10"
-        
-        if len(content_parts) > 1:
-            meta_parts = content_parts[1]
-            if "Approved" in meta_parts:
-                approval = "Approved"
-            elif "Needs Revision" in meta_parts:
-                approval = "Needs Revision"
-            
-            if "SCORE:" in meta_parts:
-                score = meta_parts.split("SCORE:")[1].strip().split('\n')[0]
-        
-        return {
-            "content": revised_content,
-            "approval": approval,
-            "score": score
-        }
-    
-    return None
-
-def create_download_button(content, filename, button_text, file_format):
-    """Create download button for different file formats"""
 
     if file_format == "md":
         st.download_button(
@@ -996,22 +357,7 @@ def create_download_button(content, filename, button_text, file_format):
         )
 
     elif file_format == "html":
-        html_content = markdown.markdown(content)
-        full_html = f"""
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>{filename}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }}
-                h1, h2, h3 {{ color: #333; }}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
+        full_html = cached_content_html(cache_key or make_cache_key(content), content, filename)
         st.download_button(
             label=button_text,
             data=full_html,
@@ -1046,6 +392,7 @@ def display_generated_content(results, model, api_key, session_placeholder):
     """
     st.markdown("---")
     st.markdown("## Generated Content")
+    digest = results_digest(results)
 
     # Title
     st.markdown(f"### {results['final_title']}")
@@ -1073,6 +420,83 @@ def display_generated_content(results, model, api_key, session_placeholder):
         if results.get('comments'):
             st.info(f"💭 Editor's Note: {results['comments']}")
 
+    if results.get('timeline'):
+        with st.expander("Stage timeline"):
+            st.table([
+                {
+                    "Stage": entry["stage"],
+                    "Agent": entry["agent"] or "-",
+                    "Model": results.get('timings', {}).get(entry["agent"], {}).get("model", "-"),
+                    "Start (s)": entry["start"],
+                    "End (s)": entry["end"],
+                    "Duration (s)": round(entry["end"] - entry["start"], 3),
+                }
+                for entry in results['timeline']
+            ])
+            st.caption("Critical path: " + " → ".join(results.get('critical_path', [])))
+            if results.get('refinement'):
+                refinement = results['refinement']
+                st.caption(
+                    f"Head of Content: {refinement['regenerated']} of {refinement['sections']} sections refined, "
+                    f"{refinement['reused']} reused from earlier runs"
+                )
+            if results.get('resume', {}).get('restored'):
+                resume = results['resume']
+                st.caption(
+                    f"Restored from checkpoints: {', '.join(resume['restored'])}. Saved about "
+                    f"{resume['seconds_saved']:.1f}s of stage time and ~{resume['tokens_saved']:,} tokens."
+                )
+            if st.session_state.get('last_run'):
+                stage_names = [entry["stage"] for entry in sorted(results['timeline'], key=lambda e: e["start"])]
+                st.selectbox("Rerun from stage", stage_names, key="rerun_stage",
+                             help="Reuse the checkpointed output of every stage upstream of this one")
+                st.button(
+                    "Rerun", key="rerun_button",
+                    on_click=lambda: queue_run(rerun_from=st.session_state.rerun_stage)
+                )
+
+    if results.get('reference_report'):
+        with st.expander("Reference extraction"):
+            st.table([
+                {
+                    "File": report["file"],
+                    "Pages": report["pages"] if report["pages"] is not None else "-",
+                    "Parts read": report["parts"],
+                    "Tokens": report["tokens"],
+                    "Stopped at budget": "yes" if report["truncated"] else "",
+                    "Cached": "yes" if report.get("cached") else "",
+                    "Time (ms)": report["elapsed_ms"],
+                    "Error": report["error"],
+                }
+                for report in results['reference_report']
+            ])
+
+    if results.get('context_reports'):
+        with st.expander("Context budget"):
+            rows = []
+            for agent, report in results['context_reports'].items():
+                rows.append({
+                    "Agent": agent, "Section": "System + stage prompt",
+                    "Tokens": report["system_tokens"] + report["prompt_tokens"],
+                    "Included": report["system_tokens"] + report["prompt_tokens"], "Dropped": 0,
+                })
+                # Upstream output is part of the stage prompt above
+                for section in report.get("upstream", []):
+                    rows.append({
+                        "Agent": agent, "Section": f"Upstream {section['section']} (in prompt)",
+                        "Tokens": section["tokens"], "Included": section["included"], "Dropped": section["dropped"],
+                    })
+                for section in report["sections"]:
+                    rows.append({
+                        "Agent": agent, "Section": section["section"], "Tokens": section["tokens"],
+                        "Included": section["included"], "Dropped": section["dropped"],
+                    })
+            st.table(rows)
+            st.caption("Token counts are local estimates against the per-model budget.")
+            for agent, report in results['context_reports'].items():
+                if report.get("knowledge_chunks"):
+                    st.markdown(f"**{agent}** knowledge: " + "; ".join(report["knowledge_chunks"]))
+
     # Content preview and downloads
     with st.container():
         st.markdown('<div class="content-preview">', unsafe_allow_html=True)
@@ -1086,109 +510,33 @@ def display_generated_content(results, model, api_key, session_placeholder):
                 st.warning("SEO Specialist produced fewer than 20 queries.")
             for q in results['queries_typed']:
                 label = f"{q['type']}: " if q['type'] else ""
-                st.markdown(f"- {label}{q['query']}")
-
-            # Build interactive network graph with query fan-out
-            G, node_info = build_query_graph(
-                results['final_title'],
-                results['queries'],
-                min_queries=30,
-                levels=3
-            )
-
-            provided_map = {q['query']: q['type'] for q in results.get('queries_typed', [])}
-            note_map = {q['query']: q.get('note', '') for q in results.get('queries_typed', [])}
-            table_rows = []
-            for nid, data in node_info.items():
-                if nid == "n0":
-                    continue
-                q_text = data['text']
-                auto_type = classify_query(q_text)
-                provided = provided_map.get(q_text, "")
-                logic_check = "✓" if not provided or provided == auto_type else "⚠"
-                table_rows.append({
-                    "Provided": provided or "-",
-                    "Auto": auto_type,
-                    "Logic": logic_check,
-                    "Query": q_text,
-                    "Reason": note_map.get(q_text, ""),
-                    "Similarity": round(data['similarity'], 2)
-                })
-
-            st.table(table_rows)
-            csv_content = "Provided,Auto,Logic,Query,Reason,Similarity\n" + "\n".join(
-                f"{r['Provided']},{r['Auto']},{r['Logic']},{r['Query']},{r['Reason']},{r['Similarity']}" for r in table_rows
-            )
-            results['queries_csv'] = csv_content
-
-            net = Network(height="450px", width="100%", directed=True, bgcolor="#f7f6ed")
-            for nid, data in node_info.items():
-                size = 20 + data['similarity'] * 30
-                title_html = (
-                    "<div class='query-card'>"
-                    f"<div class='query-text'>{data['text']}</div>"
-                    f"<div class='query-meta'>Cosine similarity: {data['similarity']:.2f}</div>"
-                    "</div>"
-                )
-                provided = provided_map.get(data['text'])
-                note = note_map.get(data['text'])
-                auto = classify_query(data['text'])
-                color = None
-                if provided:
-                    color = '#99e599' if provided == auto else '#f9d6d5'
-                net.add_node(
-                    nid,
-                    label=data['text'],
-                    title=title_html if not note else title_html.replace('</div>', f"<div class='query-meta'>Note: {note}</div></div>", 1),
-                    shape='box',
-                    size=size,
-                    color=color,
+                similar = f" _(+{q['duplicates']} similar)_" if q.get('duplicates') else ""
+                st.markdown(f"- {label}{q['query']}{similar}")
+
+            report = cached_query_report(digest, results)
+            for group in report['groups']:
+                st.markdown(f"**{group['label']}** · {len(group['rows'])} queries")
+                st.table([{k: v for k, v in row.items() if k != "Cluster"} for row in group['rows']])
+            results['queries_csv'] = report['csv']
+            components.html(report['html'], height=500, scrolling=True)
+
+        if results.get('coverage', {}).get('queries'):
+            coverage = results['coverage']
+            with st.expander(f"Query coverage ({coverage['covered']}/{len(coverage['queries'])} covered)"):
+                st.table([
+                    {
+                        "Query": entry["query"],
+                        "Type": entry["type"] or "-",
+                        "Score": entry["score"],
+                        "Covered": "✓" if entry["covered"] else "✗",
+                        "Best passage": (f"{entry['heading']}: " if entry["heading"] else "") + entry["excerpt"][:160],
+                    }
+                    for entry in sorted(coverage['queries'], key=lambda entry: entry["score"])
+                ])
+                st.caption(
+                    f"Best of {coverage['passages']} passages per query, by local embedding similarity. "
+                    f"Queries below {coverage['threshold']} are gaps."
                 )
-            for src, dst in G.edges():
-                sim = node_info[dst]['similarity']
-                length = 200 * (1 - sim)
-                net.add_edge(src, dst, value=sim, length=length)
-
-            net.show_buttons(filter_=['interaction'])
-            html = net.generate_html()
-
-            custom_style = """
-            <style>
-            body {background-color: #f7f6ed; font-family: -apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;}
-            .query-card {background-color: #FFFFFF; border-radius: 0.75rem; padding: 0.5rem 0.75rem; font-size: 0.85rem;}
-            .query-text {font-weight: 600; margin-bottom: 0.25rem;}
-            .query-meta {font-size: 0.75rem; color: #555;}
-            </style>
-            """
-            html = html.replace('</head>', custom_style + '</head>')
-
-            buttons = '''
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
-            <div style="text-align:center;margin-bottom:10px;">
-              <button onclick="document.getElementById('mynetwork').requestFullscreen()">Full screen</button>
-              <button onclick="downloadPNG()">Download PNG</button>
-              <button onclick="downloadJSON()">Download JSON</button>
-            </div>
-            <script>
-            function downloadPNG(){
-              html2canvas(document.getElementById('mynetwork')).then(function(canvas){
-                var link=document.createElement('a');
-                link.href=canvas.toDataURL();
-                link.download='queries.png';
-                link.click();
-              });
-            }
-            function downloadJSON(){
-              var data={'nodes':network.body.data.nodes.get(),'edges':network.body.data.edges.get()};
-              var link=document.createElement('a');
-              link.href='data:text/json;charset=utf-8,'+encodeURIComponent(JSON.stringify(data));
-              link.download='queries.json';
-              link.click();
-            }
-            </script>
-            '''
-            html = html.replace('</body>', buttons + '</body>')
-            components.html(html, height=500, scrolling=True)
 
         st.markdown("### Download Content")
         col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -1206,7 +554,8 @@ def display_generated_content(results, model, api_key, session_placeholder):
                 results['final_content'],
                 f"{results['final_title'].replace(' ', '_')}.html",
                 "HTML",
-                "html"
+                "html",
+                cache_key=digest,
             )
 
         with col3:
@@ -1265,7 +614,8 @@ def display_generated_content(results, model, api_key, session_placeholder):
                         compiled,
                         model,
                         api_key,
-                        results.get('context_info', '')
+                        results.get('context_info', ''),
+                        on_error=st.error
                     )
 
                     if revision_result:
@@ -1274,12 +624,16 @@ def display_generated_content(results, model, api_key, session_placeholder):
                         st.session_state.current_content['final_content'] = revision_result['content']
                         st.session_state.current_content['approval'] = revision_result['approval']
                         st.session_state.current_content['score'] = revision_result['score']
+                        st.session_state.current_content['coverage'] = score_coverage(
+                            revision_result['content'], results.get('queries_typed', [])
+                        )
 
                         # Add to history
                         st.session_state.history.append({
                             "version": len(st.session_state.history) + 1,
                             "timestamp": datetime.now().isoformat(),
                             "revision_feedback": compiled,
+                            "revision": revision_result['revision'],
                             "results": st.session_state.current_content.copy()
                         })
 
@@ -1288,6 +642,57 @@ def display_generated_content(results, model, api_key, session_placeholder):
                         st.success("Revisions applied successfully!")
                         st.experimental_rerun()
 
+def queue_run(**options):
+    """Button callback: run the last brief again on the next script run,
+    with ``options`` for ``run_last_brief``."""
+    st.session_state.pending_run = options
+
+
+def run_last_brief(api_key, status_container, session_placeholder, live_chat, resume=None, rerun_from=None):
+    """Run the brief in ``st.session_state.last_run`` and store the results
+
+    Stages are replayed from their checkpoints as ``run_content_pipeline``
+    describes. If the run fails the previous content is kept and
+    ``failed_run`` is set, so the form can offer to resume.
+    """
+    settings = st.session_state.last_run
+    previous = st.session_state.current_content
+
+    # Create containers for status and progress
+    status_container.empty()
+    progress_bar = st.progress(0)
+    stream_container = st.container()
+
+    reporter = StreamlitReporter(
+        status_container, progress_bar, session_placeholder,
+        stream_container=stream_container, chat_placeholder=live_chat
+    )
+    results = run_content_pipeline(
+        settings["inputs"], settings["model"], api_key, settings["plan_mode"], reporter=reporter,
+        use_cache=settings["use_cache"], resume=resume, rerun_from=rerun_from, routing=settings["routing"]
+    )
+    live_chat.empty()
+    st.session_state.failed_run = results is None
+    if not results:
+        st.session_state.current_content = previous
+        return None
+
+    reset_chats()
+    results["reference_report"] = settings["reference_report"]
+    # Store in session state
+    st.session_state.current_content = results.copy()
+    version = {
+        "version": len(st.session_state.history) + 1,
+        "timestamp": datetime.now().isoformat(),
+        "inputs": settings["inputs"],
+        "results": st.session_state.current_content.copy()
+    }
+    if rerun_from:
+        version["rerun_from"] = rerun_from
+    st.session_state.history.append(version)
+    return results
+
+
 # Main app
 def main():
     st.title("Momentic AI Content Team")
@@ -1301,12 +706,32 @@ def main():
         session_placeholder = st.empty()
         refresh_current_session(session_placeholder)
 
+        cache_stats = get_response_cache().stats()
+        st.caption(
+            f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+            f"{cache_stats['saved_seconds']}s saved, {cache_stats['entries']} entries "
+            f"({cache_stats['bytes'] / 1024:.0f} KB)"
+        )
+        reference_stats = get_extraction_cache().stats()
+        st.caption(
+            f"Reference cache: {reference_stats['hits']} hits / {reference_stats['misses']} misses, "
+            f"{reference_stats['saved_seconds']}s saved, {reference_stats['entries']} files "
+            f"({reference_stats['bytes'] / 1024:.0f} KB)"
+        )
+        knowledge_stats = get_knowledge_store().refresh()
+        st.caption(
+            f"Knowledge base: {knowledge_stats['files']} files, checked in {knowledge_stats['elapsed_ms']:.1f} ms "
+            f"({knowledge_stats['reloaded']} reloaded)"
+        )
+
         # Container to display pipeline status messages
         status_container = st.container()
 
         chat_box = st.expander("💬 Chat with AI Agents", expanded=True)
 
         with chat_box:
+            # Pipeline stages stream their output here while they run
+            live_chat = st.empty()
             if not api_key:
                 st.warning("Please enter your OpenAI API key to use agent chat.")
             elif not st.session_state.current_content:
@@ -1333,6 +758,8 @@ def main():
 
                 if user_input:
                     st.session_state.chats[selected_agent].append({"role": "user", "content": user_input})
+                    with st.chat_message("assistant"):
+                        reply_placeholder = st.empty()
                     with st.spinner(f"{selected_agent} is thinking..."):
                         context = f"""
                         Current content being discussed:
@@ -1344,7 +771,10 @@ def main():
 
                         {st.session_state.current_content.get('context_info', '')}
                         """
-                        response = call_agent(selected_agent, user_input, st.session_state.last_model, api_key, context)
+                        response = call_agent(
+                            selected_agent, user_input, st.session_state.last_model, api_key, context,
+                            on_token=make_stream_writer([reply_placeholder]), use_cache=False, on_error=st.error
+                        )
 
                         if response:
                             st.session_state.chats[selected_agent].append({"role": "assistant", "content": response})
@@ -1413,6 +843,19 @@ def main():
                 "Planning Mode (strategy report only)",
                 help="Skip drafting and generate a content plan"
             )
+
+            routing = st.checkbox(
+                "Route agents to per-stage models",
+                value=True,
+                help="Use a faster model for the Strategist and SEO Specialist, o3 for the Editor-in-Chief and "
+                     "output budgets sized to the content type and length. The model above is the default."
+            )
+
+            use_cache = st.checkbox(
+                "Reuse cached agent replies",
+                value=True,
+                help="Skip the API call for any agent whose inputs have not changed since a previous run"
+            )
             
             key_messages = st.text_area(
                 "Key Messages/Points",
@@ -1429,13 +872,16 @@ def main():
             submitted = st.form_submit_button("Get started, team!", use_container_width=True)
         
         # Process form submission
+        pending_run = st.session_state.pop("pending_run", None)
         if submitted and topic:
             # Process uploaded files
-            references = ""
+            references, reference_report = "", []
             if uploaded_files:
-                for file in uploaded_files:
-                    references += f"\n\n--- {file.name} ---\n"
-                    references += extract_text_from_file(file)
+                with st.spinner("Reading reference materials..."):
+                    references, reference_report = extract_references(
+                        [(file.name, file.getvalue(), file.type) for file in uploaded_files],
+                        REFERENCE_TOKEN_BUDGET, pool=get_process_pool(), cache=get_extraction_cache()
+                    )
             
             # Prepare inputs
             inputs = {
@@ -1449,26 +895,27 @@ def main():
                 "compliance": compliance,
                 "references": references
             }
-            
-            # Create containers for status and progress
-            status_container.empty()
-            progress_bar = st.progress(0)
-            
-            # Run the pipeline
-            results = run_content_pipeline(inputs, model, api_key, status_container, progress_bar, session_placeholder, plan_mode)
-
-            if results:
-                reset_chats()
-                # Store in session state
-                st.session_state.current_content = results.copy()
-                st.session_state.history.append({
-                    "version": len(st.session_state.history) + 1,
-                    "timestamp": datetime.now().isoformat(),
-                    "inputs": inputs,
-                    "results": st.session_state.current_content.copy()
-                })
-                
-                display_generated_content(results, model, api_key, session_placeholder)
+            st.session_state.last_run = {
+                "inputs": inputs,
+                "model": model,
+                "plan_mode": plan_mode,
+                "use_cache": use_cache,
+                "routing": routing,
+                "reference_report": reference_report,
+            }
+            pending_run = {}
+
+        # Run a new brief, or resume or rerun the last one
+        results = None
+        if pending_run is not None and st.session_state.get("last_run"):
+            results = run_last_brief(api_key, status_container, session_placeholder, live_chat, **pending_run)
+
+        if st.session_state.get("failed_run"):
+            st.warning("The run stopped before it finished. The stages that completed were checkpointed.")
+            st.button("Resume from the first incomplete stage", on_click=queue_run, kwargs={"resume": True})
+
+        if results:
+            display_generated_content(results, st.session_state.last_run["model"], api_key, session_placeholder)
         elif st.session_state.current_content:
             display_generated_content(st.session_state.current_content, model, api_key, session_placeholder)
     
@@ -1512,6 +959,9 @@ def main():
                 "content": user_input
             })
             
+            with st.chat_message("assistant"):
+                reply_placeholder = st.empty()
+
             # Get agent response
             with st.spinner(f"{selected_agent} is thinking..."):
                 # Build context
@@ -1527,7 +977,10 @@ def main():
                 """
                 
                 # Call agent
-                response = call_agent(selected_agent, user_input, model, api_key, context)
+                response = call_agent(
+                    selected_agent, user_input, model, api_key, context,
+                    on_token=make_stream_writer([reply_placeholder]), use_cache=False, on_error=st.error
+                )
                 
                 if response:
                     st.session_state.chats[selected_agent].append({
@@ -1551,6 +1004,12 @@ def main():
             with st.expander(f"Version {version_num} - {timestamp:%Y-%m-%d %H:%M:%S}"):
                 if 'revision_feedback' in version:
                     st.markdown(f"**Revision Applied:** {version['revision_feedback']}")
+                if version.get('rerun_from'):
+                    st.markdown(f"**Rerun From:** {version['rerun_from']}")
+                if version.get('revision', {}).get('sections', 1) > 1:
+                    revision = version['revision']
+                    revised = ", ".join(heading or "Opening" for heading in revision['revised'])
+                    st.markdown(f"**Sections Revised:** {revised} ({len(revision['revised'])} of {revision['sections']})")
                 
                 st.markdown(f"**Title:** {version['results'].get('final_title', 'N/A')}")
                 st.markdown(f"**Score:** {version['results'].get('score', 'N/A')}")
@@ -1615,5 +1074,18 @@ def main():
         
         """)
 
+        st.markdown("### Knowledge Base")
+        st.table([
+            {
+                "File": record["name"],
+                "Size (KB)": round(record["bytes"] / 1024, 1),
+                "Modified": datetime.fromtimestamp(record["mtime_ns"] / 1e9).strftime("%Y-%m-%d %H:%M"),
+                "SHA-256": record["sha256"][:12],
+                "Load (ms)": record["load_ms"],
+                "Error": record["error"] or "-",
+            }
+            for record in get_knowledge_store().inventory()
+        ])
+
 if __name__ == "__main__":
     main()
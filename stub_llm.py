@@ -0,0 +1,114 @@
+"""Deterministic stand-in for the OpenAI backend.
+
+Used by the tests and by ``batch_runner.py --stub`` to exercise the whole
+pipeline offline. Replies are shaped like real agent output (search query
+lists, editor verdicts, next steps) so every parser downstream has work to do.
+"""
+
+import re
+import time
+
+from content_pipeline import AGENT_PROMPTS
+
+QUERY_TYPES = [
+    "reformulation",
+    "implicit",
+    "comparative",
+    "entity_expansion",
+    "personalized",
+    "temporal",
+    "location",
+    "user_intent",
+    "technical",
+]
+
+
+def _agent_for(params) -> str:
+    system = params["messages"][0]["content"]
+    for agent, prompt in AGENT_PROMPTS.items():
+        if system.startswith(prompt):
+            return agent
+    return ""
+
+
+def _topic_for(params) -> str:
+    user = params["messages"][-1]["content"]
+    match = re.search(r"Topic: (.+)", user)
+    return match.group(1).strip() if match else "the topic"
+
+
+def stub_reply(agent: str, topic: str, prompt: str = "") -> str:
+    """Return a canned reply for ``agent`` writing about ``topic``.
+
+    Section drafts, section refinements and revisions, feedback routing and
+    transition rewrites (see ``content_pipeline``) are recognised from the
+    ``prompt`` and answered with one section, one paragraph or one line.
+    Feedback is routed to the sections whose headings it names, or to all."""
+    steps = "\n\nRecommended Next Steps:\n- Review the output\n- Share it with the team\n"
+    section = re.search(r'Write only section \d+: "(.+?)"', prompt)
+    if section:
+        return f"{section.group(1)}\nThis part of the {topic} guide covers {section.group(1).lower()}." + steps
+    refine = re.search(r"Section to refine:\n(.*?)\n\s*Return only the refined section", prompt, re.DOTALL)
+    if refine:
+        return "\n".join(line.strip() for line in refine.group(1).strip().splitlines()) + steps
+    revise = re.search(r"Section to revise:\n(.*?)\n\s*Return only the revised section", prompt, re.DOTALL)
+    if revise:
+        text = "\n".join(line.strip() for line in revise.group(1).strip().splitlines())
+        return f"{text}\nThis section now reflects the feedback.\nAPPROVAL: Approved\nSCORE: 9/10"
+    if '"SECTIONS: all"' in prompt:
+        feedback = re.search(r"Feedback: (.*)", prompt).group(1).lower()
+        outline = re.findall(r"^\s*(\d+)\. (.+?):", prompt, re.MULTILINE)
+        named = [number for number, heading in outline if heading.lower() in feedback]
+        return "SECTIONS: " + (", ".join(named) or "all")
+    if "Rewrite the opening paragraph" in prompt:
+        return "Building on that, this part picks up where the last one left off." + steps
+    if agent == "Strategist":
+        return (
+            f"Refined Title: A practical guide to {topic}\n\n"
+            "Content Architecture:\n"
+            f"1. Why {topic} matters\n"
+            f"2. How {topic} works\n"
+            f"3. Getting started with {topic}\n"
+            f"4. Common mistakes with {topic}" + steps
+        )
+    if agent == "SEO Specialist":
+        lines = [
+            f"- {QUERY_TYPES[i % len(QUERY_TYPES)].replace('_', ' ').title()}: {topic} question {i + 1} - stub note {i + 1}"
+            for i in range(20)
+        ]
+        return f"Audit of {topic}.\n\nSearch Queries:\n" + "\n".join(lines) + steps
+    if agent == "Editor-in-Chief":
+        return (
+            f"The piece on {topic} is ready.\n"
+            "APPROVAL: Approved\n"
+            "OVERALL_SCORE: 34/40\n"
+            f"FINAL_TITLE: A practical guide to {topic}" + steps
+        )
+    return (
+        f"Why {topic} matters\n{topic} saves teams time.\n\n"
+        f"How {topic} works\nIt follows a few simple rules.\n\n"
+        f"Getting started with {topic}\nStart small and measure." + steps
+    )
+
+
+class StubBackend:
+    """Backend callable that answers every agent with ``stub_reply``.
+
+    ``latency`` seconds are spent before the first chunk to mimic a network
+    round-trip, and streamed replies are cut into ``chunk_size`` pieces."""
+
+    def __init__(self, latency: float = 0.0, chunk_size: int = 40):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls: list[dict] = []
+
+    def __call__(self, params, api_key, stream=False):
+        self.calls.append(params)
+        reply = stub_reply(_agent_for(params), _topic_for(params), params["messages"][-1]["content"])
+        if self.latency:
+            time.sleep(self.latency)
+        if not stream:
+            yield reply
+            return
+        for start in range(0, len(reply), self.chunk_size):
+            yield reply[start:start + self.chunk_size]
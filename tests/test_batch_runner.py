@@ -0,0 +1,84 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+import batch_runner
+import content_pipeline
+from batch_runner import load_briefs, run_batch
+from response_cache import ResponseCache
+from stub_llm import StubBackend
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(setattr, content_pipeline, "_checkpoint_store", content_pipeline._checkpoint_store)
+        content_pipeline._checkpoint_store = ResponseCache(os.path.join(self.tmp.name, "checkpoints.sqlite3"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_briefs(self, briefs):
+        path = os.path.join(self.tmp.name, "briefs.jsonl")
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(b) for b in briefs) + "\n\n")
+        return path
+
+    def test_load_briefs_skips_blank_lines_and_numbers_ids(self):
+        path = self.write_briefs([{"topic": "Tracing"}, {"topic": "Logging", "id": "b"}])
+        briefs = load_briefs(path)
+        self.assertEqual([b["id"] for b in briefs], [1, "b"])
+
+    def test_load_briefs_requires_topic(self):
+        path = self.write_briefs([{"audience": "SREs"}])
+        with self.assertRaises(ValueError):
+            load_briefs(path)
+
+    def test_full_and_plan_runs_with_stub(self):
+        briefs = [{"id": 1, "topic": "Tracing"}, {"id": 2, "topic": "Logging", "plan_mode": True}]
+        records = run_batch(briefs, "4o", "", workers=2, use_cache=False, backend=StubBackend())
+        by_id = {r["id"]: r for r in records}
+        self.assertEqual(by_id[1]["status"], "ok")
+        self.assertEqual(by_id[1]["results"]["approval"], "Approved")
+        self.assertEqual(len(by_id[1]["results"]["queries"]), 20)
+        self.assertEqual(by_id[2]["results"]["approval"], "Plan Complete")
+        self.assertNotIn("Specialist Writer", by_id[2]["results"]["timings"])
+
+    def test_briefs_run_concurrently(self):
+        backend = StubBackend(latency=0.05)
+        briefs = [{"id": i, "topic": f"Topic {i}"} for i in range(4)]
+        start = time.perf_counter()
+        records = run_batch(briefs, "4o", "", workers=4, use_cache=False, backend=backend)
+        elapsed = time.perf_counter() - start
+        # Five agents per brief, the Head of Content once per draft section
+        self.assertEqual(len(backend.calls), 28)
+        self.assertTrue(all(r["status"] == "ok" for r in records))
+        self.assertLess(elapsed, 28 * 0.05 * 0.75)
+
+    def test_failed_brief_is_reported(self):
+        def broken(params, api_key, stream=False):
+            raise RuntimeError("boom")
+            yield ""
+
+        records = run_batch([{"id": 1, "topic": "Tracing"}], "4o", "", use_cache=False, backend=broken)
+        self.assertEqual(records[0]["status"], "failed")
+        self.assertIn("boom", records[0]["errors"][0])
+
+    def test_cli_writes_one_line_per_brief(self):
+        path = self.write_briefs([{"topic": "Tracing"}, {"topic": "Logging"}])
+        output = os.path.join(self.tmp.name, "out.jsonl")
+        code = batch_runner.main([path, "-o", output, "--stub", "--no-cache", "-w", "2"])
+        self.assertEqual(code, 0)
+        with open(output) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["topic"] for r in lines), ["Logging", "Tracing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,11 @@
 import unittest
 import os
 import sys
-import re
 
 ROOT = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-path = os.path.join(ROOT, "streamlit_app.py")
-with open(path, "r") as f:
-    source = f.read()
-
-pattern = re.compile(r"def classify_query.*?return \"implicit\"", re.S)
-match = pattern.search(source)
-assert match, "classify_query function not found"
-namespace = {}
-exec(match.group(0), {"re": re}, namespace)
-classify_query = namespace["classify_query"]
+from query_fanout import classify_queries, classify_query
 
 
 class ClassifyQueryTest(unittest.TestCase):
@@ -25,6 +15,16 @@ class ClassifyQueryTest(unittest.TestCase):
     def test_location_city(self):
         self.assertEqual(classify_query("meetups in Denver"), "location")
 
+    def test_priority_order(self):
+        self.assertEqual(classify_query("jaeger vs zipkin in 2024"), "comparative")
+        self.assertEqual(classify_query("how to fix my tracing setup"), "personalized")
+        self.assertEqual(classify_query("how does sampling work"), "user_intent")
+        self.assertEqual(classify_query("tracing"), "implicit")
+
+    def test_batch_matches_single(self):
+        queries = ["90-day SEO roadmap", "meetups in Denver", "what is tracing", "", "zipkin alternatives"]
+        self.assertEqual(classify_queries(queries), [classify_query(q) for q in queries])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,284 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import openai
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+import content_pipeline
+from batch_runner import brief_inputs
+from content_pipeline import (
+    AGENT_PROMPTS,
+    CONTEXT_BUDGETS,
+    FULL_STAGES,
+    MODEL_MAP,
+    PLAN_STAGES,
+    PipelineReporter,
+    apply_revision,
+    call_agent,
+    route_feedback,
+    run_content_pipeline,
+)
+from content_sections import split_sections
+from query_fanout import QueryStreamParser, parse_queries
+from response_cache import ResponseCache
+from stage_graph import topological_order
+from stub_llm import StubBackend, stub_reply
+
+
+class ContentPipelineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for name, filename in (("_response_cache", "responses.sqlite3"), ("_checkpoint_store", "checkpoints.sqlite3")):
+            self.addCleanup(setattr, content_pipeline, name, getattr(content_pipeline, name))
+            setattr(content_pipeline, name, ResponseCache(os.path.join(tmp.name, filename)))
+
+    def run_pipeline(self, plan_mode=False, backend=None):
+        return run_content_pipeline(
+            brief_inputs({"topic": "Tracing"}), "4o", "", plan_mode,
+            use_cache=False, backend=backend or StubBackend()
+        )
+
+    def test_stage_graphs_are_valid(self):
+        for stages in (PLAN_STAGES, FULL_STAGES):
+            self.assertEqual(len(topological_order(stages)), len(stages))
+
+    def test_full_run_timeline(self):
+        results = self.run_pipeline()
+        stages = [entry["stage"] for entry in results["timeline"]]
+        self.assertEqual(sorted(stages), sorted(stage.name for stage in FULL_STAGES))
+        self.assertEqual(results["critical_path"][0], "strategist")
+        self.assertEqual(results["critical_path"][-2:], ["verdict", "coverage"])
+        self.assertEqual(results["final_title"], "A practical guide to Tracing")
+        self.assertEqual(len(results["coverage"]["queries"]), len(results["queries_typed"]))
+
+    def test_plan_run_skips_writer_and_editor(self):
+        backend = StubBackend()
+        results = self.run_pipeline(plan_mode=True, backend=backend)
+        self.assertEqual(len(backend.calls), 3)
+        self.assertEqual(results["approval"], "Plan Complete")
+        self.assertEqual(set(results["next_steps"]), {"Strategist", "SEO Specialist", "Head of Content"})
+
+    def test_each_call_fits_the_model_budget(self):
+        inputs = brief_inputs({"topic": "Tracing", "references": "reference material " * 20000})
+        results = run_content_pipeline(inputs, "4o", "", use_cache=False, backend=StubBackend())
+        self.assertEqual(set(results["context_reports"]), set(results["timings"]))
+        for report in results["context_reports"].values():
+            used = report["system_tokens"] + report["prompt_tokens"]
+            used += sum(section["included"] for section in report["sections"])
+            self.assertLessEqual(used, CONTEXT_BUDGETS["4o"])
+            self.assertEqual(report["budget"], CONTEXT_BUDGETS["4o"])
+            references = report["sections"][2]
+            self.assertGreater(references["dropped"], 0)
+            self.assertGreater(references["included"], 1000)
+
+    def test_oversized_upstream_output_is_cut_and_the_brief_kept(self):
+        def long_draft(params, api_key, stream=False):
+            if "Write the full content" in params["messages"][-1]["content"]:
+                yield "Tracing draft. " + "word " * 40000
+                return
+            yield from StubBackend()(params, api_key, stream)
+
+        results = run_content_pipeline(brief_inputs({"topic": "Tracing"}), "4o", "", use_cache=False,
+                                       backend=long_draft)
+        report = results["context_reports"]["Head of Content"]
+        self.assertEqual(report["upstream"][0]["section"], "draft")
+        self.assertGreater(report["upstream"][0]["dropped"], 0)
+        self.assertEqual(report["sections"][0]["dropped"], 0)
+        used = report["system_tokens"] + report["prompt_tokens"]
+        used += sum(section["included"] for section in report["sections"])
+        self.assertLessEqual(used, CONTEXT_BUDGETS["4o"])
+
+    def test_long_form_drafts_sections_in_parallel(self):
+        backend = StubBackend(latency=0.2)
+        inputs = brief_inputs({"topic": "Tracing", "length": "Long (1200+ words)"})
+        results = run_content_pipeline(inputs, "4o", "", use_cache=False, backend=backend)
+        headings = ["Why Tracing matters", "How Tracing works", "Getting started with Tracing",
+                    "Common mistakes with Tracing"]
+        self.assertEqual([line for line in results["draft"].splitlines() if line in headings], headings)
+        self.assertIn("picks up where the last one left off", results["draft"])
+        self.assertNotIn("Recommended Next Steps", results["draft"])
+        # Strategist, SEO, four sections, three seams, four refinements, Editor
+        self.assertEqual(len(backend.calls), 14)
+        writer = next(entry for entry in results["timeline"] if entry["stage"] == "writer")
+        # One round of sections and one of seams, not seven calls in a row
+        self.assertLess(writer["end"] - writer["start"], 0.2 * 4)
+        self.assertEqual(results["timings"]["Specialist Writer"]["calls"], 4)
+        self.assertEqual(results["refinement"], {"sections": 4, "regenerated": 4, "reused": 0})
+
+    def test_unchanged_sections_are_not_refined_again(self):
+        first = run_content_pipeline(brief_inputs({"topic": "Tracing", "length": "Long (1200+ words)"}), "4o", "",
+                                     use_cache=True, backend=StubBackend())
+        self.assertEqual(first["refinement"]["reused"], 0)
+        # New references change every upstream prompt but not the section drafts
+        backend = StubBackend()
+        inputs = brief_inputs({"topic": "Tracing", "length": "Long (1200+ words)", "references": "New notes"})
+        second = run_content_pipeline(inputs, "4o", "", use_cache=True, backend=backend)
+        self.assertEqual(second["refinement"], {"sections": 4, "regenerated": 0, "reused": 4})
+        self.assertEqual(second["polished"], first["polished"])
+        self.assertFalse(any("Section to refine" in call["messages"][-1]["content"] for call in backend.calls))
+
+    def test_refined_sections_are_kept_per_brief(self):
+        brief = {"topic": "Tracing", "length": "Long (1200+ words)"}
+        first = run_content_pipeline(brief_inputs(brief), "4o", "", use_cache=True, backend=StubBackend())
+        second = run_content_pipeline(brief_inputs({**brief, "content_type": "Case Study"}), "4o", "",
+                                      use_cache=True, backend=StubBackend())
+        self.assertEqual(second["draft"], first["draft"])
+        self.assertEqual(second["refinement"], {"sections": 4, "regenerated": 4, "reused": 0})
+
+    def test_failed_run_resumes_at_the_first_incomplete_stage(self):
+        def editor_down(params, api_key, stream=False):
+            if "Review this final content" in params["messages"][-1]["content"]:
+                raise RuntimeError("timeout")
+            yield from StubBackend()(params, api_key, stream)
+
+        inputs = brief_inputs({"topic": "Tracing"})
+        self.assertIsNone(run_content_pipeline(inputs, "4o", "", use_cache=False, backend=editor_down))
+        backend = StubBackend()
+        results = run_content_pipeline(inputs, "4o", "", use_cache=False, backend=backend, resume=True)
+        # Only the Editor-in-Chief is called again
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(
+            sorted(results["resume"]["restored"]),
+            ["head_of_content", "parse_queries", "seo", "strategist", "writer"],
+        )
+        self.assertGreater(results["resume"]["tokens_saved"], 0)
+        self.assertEqual(set(results["next_steps"]), set(results["timings"]))
+        self.assertTrue(results["timings"]["Strategist"]["restored"])
+
+    def test_rerun_from_a_stage_replays_upstream(self):
+        inputs = brief_inputs({"topic": "Tracing"})
+        first = run_content_pipeline(inputs, "4o", "", backend=StubBackend())
+        self.assertEqual(first["resume"]["restored"], [])
+        backend = StubBackend()
+        results = run_content_pipeline(inputs, "4o", "", backend=backend, rerun_from="editor")
+        # The editor skips the response cache; verdict and coverage run again locally
+        self.assertEqual(len(backend.calls), 1)
+        self.assertNotIn("editor", results["resume"]["restored"])
+        self.assertNotIn("verdict", results["resume"]["restored"])
+        self.assertEqual(results["polished"], first["polished"])
+        with self.assertRaises(ValueError):
+            run_content_pipeline(inputs, "4o", "", backend=backend, rerun_from="missing")
+
+    def test_revision_patches_only_the_named_section(self):
+        content = stub_reply("Specialist Writer", "Tracing").split("\n\nRecommended Next Steps:")[0]
+        backend = StubBackend()
+        result = apply_revision(content, "Shorten How Tracing works", "4o", "", use_cache=False, backend=backend)
+        # One routing call and one section rewrite
+        self.assertEqual(len(backend.calls), 2)
+        self.assertNotIn("Tracing saves teams time", backend.calls[1]["messages"][-1]["content"])
+        self.assertEqual(result["revision"], {"sections": 3, "revised": ["How Tracing works"]})
+        before, after = content.split("\n\n"), result["content"].split("\n\n")
+        self.assertEqual([after[0], after[2]], [before[0], before[2]])
+        self.assertIn("reflects the feedback", after[1])
+        self.assertEqual((result["approval"], result["score"]), ("Approved", "9/10"))
+
+    def test_routing_reply_with_prose_names_only_its_sections(self):
+        sections = split_sections(stub_reply("Specialist Writer", "Tracing").split("\n\nRecommended Next Steps:")[0])
+        for reply, expected in (("SECTIONS: 2 (small fixes)", [1]), ("SECTIONS: 1, 3 - install steps", [0, 2]),
+                                ("SECTIONS: all", [0, 1, 2])):
+            def backend(params, api_key, stream=False):
+                yield reply
+
+            self.assertEqual(route_feedback(sections, "Tweak it", "4o", "", use_cache=False, backend=backend), expected)
+
+    def test_revision_of_short_content_is_one_call(self):
+        backend = StubBackend()
+        result = apply_revision("A single paragraph.", "Friendlier tone", "4o", "", use_cache=False, backend=backend)
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(result["revision"], {"sections": 1, "revised": [""]})
+
+    def test_agents_are_routed_to_their_models(self):
+        backend = StubBackend()
+        inputs = brief_inputs({"topic": "Tracing", "content_type": "Social Media Caption"})
+        results = run_content_pipeline(inputs, "4o", "", use_cache=False, backend=backend)
+
+        def params_for(agent):
+            return next(p for p in backend.calls if p["messages"][0]["content"].startswith(AGENT_PROMPTS[agent]))
+
+        self.assertEqual(params_for("Strategist")["model"], MODEL_MAP["4o-mini"])
+        self.assertEqual(params_for("Specialist Writer")["max_tokens"], 600)
+        editor = params_for("Editor-in-Chief")
+        self.assertEqual((editor["model"], editor["max_completion_tokens"]), (MODEL_MAP["o3"], 6000))
+        self.assertEqual(results["timings"]["Editor-in-Chief"]["model"], "o3")
+        self.assertEqual(results["profiles"]["Specialist Writer"]["model"], "4o")
+
+        backend = StubBackend()
+        run_content_pipeline(inputs, "4.1", "", use_cache=False, backend=backend, routing=False)
+        self.assertEqual({p["model"] for p in backend.calls}, {MODEL_MAP["4.1"]})
+        self.assertEqual({p["max_tokens"] for p in backend.calls}, {20000})
+
+    def test_cached_replies_are_kept_per_output_budget(self):
+        backend = StubBackend()
+        for max_output in (600, 20000, 600):
+            call_agent("Strategist", "Plan it", "4o", "", backend=backend, max_output=max_output)
+        self.assertEqual([p["max_tokens"] for p in backend.calls], [600, 20000])
+
+    def test_timed_out_agent_falls_back(self):
+        stub = StubBackend()
+
+        def slow_o3(params, api_key, stream=False):
+            if params["model"] == MODEL_MAP["o3"]:
+                self.assertEqual(params["request_timeout"], 180)
+                raise openai.error.Timeout("timed out")
+            yield from stub(params, api_key, stream)
+
+        results = run_content_pipeline(brief_inputs({"topic": "Tracing"}), "4o", "", use_cache=False, backend=slow_o3)
+        timing = results["timings"]["Editor-in-Chief"]
+        self.assertEqual((timing["model"], timing["fallback_from"]), ("4o", "o3"))
+        self.assertEqual(results["approval"], "Approved")
+
+    def test_fallback_reply_restarts_the_stream(self):
+        stub = StubBackend()
+
+        def seo_stalls(params, api_key, stream=False):
+            if "Analyze search opportunities" in params["messages"][-1]["content"] and \
+                    params["model"] == MODEL_MAP["4o-mini"]:
+                yield "Search Queries:\n- Technical: stale query from the slow model - cut off\n"
+                raise openai.error.Timeout("timed out")
+            yield from stub(params, api_key, stream)
+
+        class QueryReporter(PipelineReporter):
+            streaming = True
+
+            def __init__(self):
+                self.parser = QueryStreamParser()
+
+            def stage_token(self, agent, text, final=False):
+                if agent == "SEO Specialist":
+                    self.parser.feed_text(text)
+                    if final:
+                        self.parser.close()
+
+        reporter = QueryReporter()
+        results = run_content_pipeline(brief_inputs({"topic": "Tracing"}), "4o", "", use_cache=False,
+                                       backend=seo_stalls, reporter=reporter)
+        self.assertEqual(results["timings"]["SEO Specialist"]["fallback_from"], "4o-mini")
+        self.assertEqual(reporter.parser.restarts, 1)
+        self.assertEqual(reporter.parser.queries, parse_queries(results["seo_content"]))
+
+    def test_runs_without_a_knowledge_base(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        retrieve = content_pipeline.retrieve_knowledge
+        self.addCleanup(setattr, content_pipeline, "retrieve_knowledge", retrieve)
+        content_pipeline.retrieve_knowledge = lambda query: retrieve(query, tmp.name)
+        results = self.run_pipeline()
+        self.assertIsNotNone(results)
+        for report in results["context_reports"].values():
+            self.assertEqual(report["knowledge_chunks"], [])
+
+    def test_failed_agent_returns_none(self):
+        def broken(params, api_key, stream=False):
+            raise RuntimeError("boom")
+            yield ""
+
+        self.assertIsNone(self.run_pipeline(backend=broken))
+
+
+if __name__ == "__main__":
+    unittest.main()
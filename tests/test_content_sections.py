@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from content_sections import ContentSection, extract_outline, join_sections, split_sections, strip_heading
+
+STRATEGY = """1) **Refined Title**: Tracing without tears
+3) **Detailed Content Architecture**:
+   - Hook strategy: open with an outage story
+   - Section flow:
+     1. The 3am outage: why logs were not enough
+     2. **What distributed tracing actually records**
+     3. Choosing between Jaeger and Zipkin
+   - Information density: go deep in 3
+4) **Voice & Tone Blueprint**:
+   - Level 4
+"""
+
+
+class ExtractOutlineTest(unittest.TestCase):
+    def test_numbered_section_flow(self):
+        self.assertEqual(extract_outline(STRATEGY), [
+            "The 3am outage: why logs were not enough",
+            "What distributed tracing actually records",
+            "Choosing between Jaeger and Zipkin",
+        ])
+
+    def test_bullet_architecture(self):
+        strategy = "Content Architecture\n- Intro\n  with a story\n- How it works\n- Setup\nVoice\n- friendly"
+        self.assertEqual(extract_outline(strategy), ["Intro", "How it works", "Setup"])
+
+    def test_too_short_or_missing(self):
+        self.assertEqual(extract_outline("Outline:\n1. Intro\n2. Body"), [])
+        self.assertEqual(extract_outline("No plan here."), [])
+
+
+class SplitSectionsTest(unittest.TestCase):
+    TEXT = (
+        "Tracing is hard to get right.\n\n"
+        "Why it matters\nOutages cost money.\n\n"
+        "## Setup\nSteps:\n1. Install\n2. Configure\n\nThen measure."
+    )
+
+    def test_split_and_join(self):
+        sections = split_sections(self.TEXT)
+        self.assertEqual([s.heading for s in sections], ["", "Why it matters", "Setup"])
+        self.assertEqual(sections[2].body, "Steps:\n1. Install\n2. Configure\n\nThen measure.")
+        self.assertEqual(split_sections(join_sections(sections)), sections)
+
+    def test_strip_heading(self):
+        self.assertEqual(strip_heading("**Setup:**\nInstall it.", "Setup"), "Install it.")
+        self.assertEqual(strip_heading("Install it.", "Setup"), "Install it.")
+        self.assertEqual(ContentSection("Setup", "Install it.").text, "Setup\nInstall it.")
+
+
+if __name__ == "__main__":
+    unittest.main()
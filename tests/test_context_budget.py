@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from context_budget import ContextSection, assemble_context, count_tokens, fit_texts, truncate_to_tokens
+
+
+class CountTokensTest(unittest.TestCase):
+    def test_short_words_and_punctuation(self):
+        self.assertEqual(count_tokens("Hello, world!"), 4)
+
+    def test_long_words_and_numbers_split(self):
+        self.assertEqual(count_tokens("observability"), 3)
+        self.assertEqual(count_tokens("2025"), 2)
+
+    def test_truncate_respects_budget_and_lines(self):
+        text = "\n".join(f"line number {i}" for i in range(100))
+        cut = truncate_to_tokens(text, 20)
+        self.assertLessEqual(count_tokens(cut), 20)
+        self.assertTrue(text.startswith(cut))
+        self.assertTrue(cut.endswith(tuple("0123456789")))
+        self.assertEqual(truncate_to_tokens("short", 10), "short")
+
+
+class AssembleContextTest(unittest.TestCase):
+    def setUp(self):
+        self.sections = [
+            ContextSection("", "Topic: tracing", required=True),
+            ContextSection("Knowledge Base", "knowledge " * 500),
+            ContextSection("Reference Materials", "reference " * 500, weight=2.0),
+        ]
+
+    def test_everything_fits(self):
+        text, report = assemble_context(self.sections, 10_000)
+        self.assertEqual(sum(r["dropped"] for r in report), 0)
+        self.assertIn("Knowledge Base:\n", text)
+
+    def test_budget_is_split_by_weight(self):
+        text, report = assemble_context(self.sections, 300)
+        self.assertLessEqual(count_tokens(text), 300)
+        brief, knowledge, references = report
+        self.assertEqual(brief["dropped"], 0)
+        self.assertGreater(references["included"], knowledge["included"])
+        for row in report:
+            self.assertEqual(row["included"] + row["dropped"], row["tokens"])
+
+    def test_small_sections_release_unused_share(self):
+        sections = [
+            ContextSection("Knowledge Base", "short note"),
+            ContextSection("Reference Materials", "reference " * 500),
+        ]
+        text, report = assemble_context(sections, 200)
+        self.assertEqual(report[0]["dropped"], 0)
+        self.assertGreater(report[1]["included"], 150)
+
+    def test_no_budget_keeps_only_required(self):
+        text, report = assemble_context(self.sections, 5)
+        self.assertEqual(text, "Topic: tracing")
+        self.assertEqual(report[1]["included"], 0)
+
+
+class FitTextsTest(unittest.TestCase):
+    def test_short_text_kept_and_long_one_cut(self):
+        texts, report = fit_texts({"queries": "tracing tools", "strategy": "strategy " * 500}, 200)
+        self.assertEqual(texts["queries"], "tracing tools")
+        self.assertTrue(texts["strategy"].endswith(" ..."))
+        self.assertLessEqual(sum(count_tokens(text) for text in texts.values()), 200)
+        self.assertEqual([row["section"] for row in report], ["queries", "strategy"])
+        self.assertEqual(report[0]["dropped"], 0)
+        self.assertGreater(report[1]["dropped"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from embeddings import cosine_matrix, embed_text, embed_texts, similarity_matrix, top_k_neighbors
+from query_fanout import build_query_graph, cosine_sim
+
+
+class EmbeddingTest(unittest.TestCase):
+    def test_batch_matches_single_and_is_deterministic(self):
+        texts = ["best tracing tools", "chocolate cake recipe"]
+        vectors = embed_texts(texts)
+        self.assertEqual(vectors.shape, (2, 512))
+        np.testing.assert_allclose(vectors[0], embed_text(texts[0]))
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+        self.assertEqual(embed_texts(["x y"], dim=64).shape, (1, 64))
+
+    def test_similar_queries_score_higher(self):
+        vectors = embed_texts(["best tracing tools", "tracing tools for kubernetes", "chocolate cake recipe"])
+        sims = cosine_matrix(vectors)
+        self.assertGreater(sims[0, 1], 0.4)
+        self.assertLess(sims[0, 2], 0.2)
+        self.assertAlmostEqual(cosine_sim(vectors[0], vectors[1]), float(sims[0, 1]), places=5)
+
+    def test_empty_text_is_zero_vector(self):
+        self.assertFalse(embed_text("  ").any())
+        self.assertEqual(cosine_sim(embed_text(""), embed_text("tracing")), 0.0)
+
+    def test_graph_similarity_to_title(self):
+        graph, node_data = build_query_graph("Tracing", ["distributed tracing", "cake"], min_queries=2)
+        self.assertEqual(node_data["n0"]["similarity"], 1.0)
+        self.assertGreater(node_data["n1"]["similarity"], node_data["n2"]["similarity"])
+
+
+
+class NeighborTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(200, 16)).astype(np.float32)
+
+    def test_blocked_matrix_matches_direct_product(self):
+        np.testing.assert_allclose(
+            similarity_matrix(self.vectors, block_rows=7), cosine_matrix(self.vectors), atol=1e-5
+        )
+
+    def test_top_k_matches_full_sort(self):
+        indices, scores = top_k_neighbors(self.vectors, k=4, block_rows=13)
+        full = cosine_matrix(self.vectors)
+        np.fill_diagonal(full, -np.inf)
+        expected = np.argsort(-full, axis=1)[:, :4]
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_allclose(scores, np.take_along_axis(full, expected, axis=1), atol=1e-5)
+
+    def test_k_is_capped(self):
+        indices, scores = top_k_neighbors(self.vectors[:3], k=10)
+        self.assertEqual(indices.shape, (3, 2))
+        self.assertEqual(top_k_neighbors(self.vectors[:1], k=3)[0].shape, (1, 0))
+
+    def test_graph_lists_nearest_siblings(self):
+        queries = ["tracing tools", "best tracing tools", "cake recipe"]
+        graph, node_data = build_query_graph("Tracing", queries, min_queries=3, neighbors=1)
+        self.assertEqual(node_data["n1"]["neighbors"][0][0], "n2")
+        self.assertEqual(node_data["n0"]["neighbors"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
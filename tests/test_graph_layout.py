@@ -0,0 +1,58 @@
+import unittest
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from graph_layout import collapse_levels, detail_level, layout_graph, render_graph_html, subtree_sizes
+
+# 0 -> 1, 2; 1 -> 3, 4; 3 -> 5
+PARENTS = [-1, 0, 0, 1, 1, 3]
+LEVELS = [0, 1, 1, 2, 2, 3]
+
+
+class LevelOfDetailTest(unittest.TestCase):
+    def test_subtree_sizes(self):
+        self.assertEqual(subtree_sizes(PARENTS).tolist(), [5, 3, 0, 1, 0, 0])
+
+    def test_detail_level(self):
+        self.assertEqual(detail_level(PARENTS, LEVELS, max_nodes=6), 3)
+        # Levels 0-2 plus one summary node under node 3
+        self.assertEqual(detail_level(PARENTS, LEVELS, max_nodes=5), 1)
+        self.assertEqual(detail_level(PARENTS, LEVELS, max_nodes=1), 1)
+
+    def test_collapse_levels(self):
+        kept, folded = collapse_levels(PARENTS, LEVELS, 1)
+        self.assertEqual(kept, [0, 1, 2])
+        self.assertEqual(folded, {1: [3, 4, 5]})
+
+
+class LayoutTest(unittest.TestCase):
+    def test_deterministic_and_spread_out(self):
+        edges = [(PARENTS[i], i) for i in range(1, len(PARENTS))]
+        first = layout_graph(len(PARENTS), edges)
+        self.assertTrue(np.array_equal(first, layout_graph(len(PARENTS), edges)))
+        self.assertTrue(np.isfinite(first).all())
+        distances = np.linalg.norm(first[:, None] - first[None], axis=2) + np.eye(len(first)) * 1e9
+        self.assertGreater(distances.min(), 10)
+
+    def test_single_node(self):
+        self.assertEqual(layout_graph(1, []).shape, (1, 2))
+
+
+class RenderTest(unittest.TestCase):
+    def test_physics_off_and_payload_escaped(self):
+        html = render_graph_html([["n0", "</script> tools", 0, 0, 20, "topic", [], None]], [])
+        graph = json.loads(re.search(r"var graph = (.*);\n", html).group(1))
+        self.assertFalse(graph["options"]["physics"]["enabled"])
+        self.assertEqual(graph["nodes"][0][1], "</script> tools")
+        self.assertNotIn("</script> tools", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
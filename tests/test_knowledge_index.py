@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from content_pipeline import AGENT_KNOWLEDGE_QUERIES, retrieve_knowledge
+from context_budget import ContextSection, assemble_context, count_tokens
+from knowledge_index import KnowledgeIndex, chunk_markdown, tokenize
+
+GUIDE = """# Style Guide
+
+Intro line.
+
+## Voice
+
+We sound like a helpful colleague.
+
+## Grammar
+
+### Commas
+
+Use the Oxford comma.
+"""
+
+
+class ChunkMarkdownTest(unittest.TestCase):
+    def test_one_chunk_per_heading_with_path(self):
+        chunks = chunk_markdown("guide.md", GUIDE)
+        self.assertEqual(
+            [chunk["heading"] for chunk in chunks],
+            ["Style Guide", "Style Guide > Voice", "Style Guide > Grammar > Commas"],
+        )
+        self.assertEqual(chunks[2]["text"], "Use the Oxford comma.")
+
+    def test_sibling_after_subsection_when_levels_are_skipped(self):
+        chunks = chunk_markdown("notes.md", "## A\nAlpha\n### B\nBeta\n## C\nGamma")
+        self.assertEqual([chunk["heading"] for chunk in chunks], ["A", "A > B", "C"])
+
+    def test_long_sections_split_at_paragraphs(self):
+        text = "## Notes\n\n" + "\n\n".join("word " * 50 for _ in range(6))
+        chunks = chunk_markdown("notes.md", text, max_tokens=120)
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(chunk["heading"] == "Notes" for chunk in chunks))
+
+
+class KnowledgeIndexTest(unittest.TestCase):
+    def test_search_ranks_matching_chunk_first(self):
+        index = KnowledgeIndex(chunk_markdown("guide.md", GUIDE))
+        score, chunk = index.search("comma rules", k=1)[0]
+        self.assertGreater(score, 0)
+        self.assertEqual(chunk["heading"], "Style Guide > Grammar > Commas")
+        self.assertEqual(index.search("kubernetes"), [])
+
+    def test_tokenize_folds_plurals_and_stopwords(self):
+        self.assertEqual(tokenize("The Citations and Policies"), ["citation", "policy"])
+
+    def test_editor_retrieves_review_instructions(self):
+        query = f"{AGENT_KNOWLEDGE_QUERIES['Editor-in-Chief']} observability for platform teams"
+        sources = [chunk["source"] for chunk in retrieve_knowledge(query)[:3]]
+        self.assertIn("editorial-review-instructions.md", sources)
+
+    def test_chunked_section_drops_whole_chunks(self):
+        chunks = ["alpha " * 40, "beta " * 200, "gamma " * 40]
+        text, report = assemble_context([ContextSection("Knowledge Base", chunks=chunks)], 100)
+        self.assertEqual(report[0]["chunks"], [0, 2])
+        self.assertNotIn("beta", text)
+        self.assertLessEqual(count_tokens(text), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
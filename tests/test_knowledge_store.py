@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from knowledge_store import KnowledgeStore, get_knowledge_store
+
+
+class KnowledgeStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = KnowledgeStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_text_matches_directory_order(self):
+        self.write("b.md", "beta\n")
+        self.write("a.md", "alpha")
+        self.write("notes.txt", "ignored")
+        self.assertEqual(self.store.text(), "\n\n--- a.md ---\nalpha\n\n--- b.md ---\nbeta")
+
+    def test_only_changed_files_are_reloaded(self):
+        self.write("a.md", "alpha", mtime=1000)
+        self.write("b.md", "beta", mtime=1000)
+        self.assertEqual(self.store.refresh()["reloaded"], 2)
+        version = self.store.version
+        self.assertEqual(self.store.refresh()["reloaded"], 0)
+
+        self.write("b.md", "beta two", mtime=2000)
+        self.assertEqual(self.store.refresh()["reloaded"], 1)
+        self.assertIn("beta two", self.store.text())
+        self.assertGreater(self.store.version, version)
+
+    def test_touched_but_identical_file_keeps_version(self):
+        self.write("a.md", "alpha", mtime=1000)
+        self.store.refresh()
+        version = self.store.version
+        self.write("a.md", "alpha", mtime=2000)
+        self.assertEqual(self.store.refresh()["reloaded"], 1)
+        self.assertEqual(self.store.version, version)
+
+    def test_removed_files_drop_out(self):
+        self.write("a.md", "alpha")
+        self.store.refresh()
+        os.remove(os.path.join(self.tmp.name, "a.md"))
+        self.assertEqual(self.store.refresh()["removed"], 1)
+        self.assertEqual(self.store.text(), "")
+
+    def test_unreadable_file_is_reported(self):
+        with open(os.path.join(self.tmp.name, "bad.md"), "wb") as f:
+            f.write(b"\xff\xfe\xfa")
+        self.write("a.md", "alpha")
+        self.assertEqual(self.store.refresh()["errors"], 1)
+        inventory = {row["name"]: row for row in self.store.inventory()}
+        self.assertTrue(inventory["bad.md"]["error"])
+        self.assertEqual(self.store.text(), "\n\n--- a.md ---\nalpha")
+
+    def test_missing_directory_is_empty(self):
+        store = KnowledgeStore(os.path.join(self.tmp.name, "missing"))
+        self.assertEqual(store.text(), "")
+
+    def test_stores_are_shared_per_directory(self):
+        self.assertIs(get_knowledge_store(self.tmp.name), get_knowledge_store(self.tmp.name + os.sep))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import unittest
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+import openai
+from llm_client import RateLimiter, ResilientBackend, TokenBucket, openai_backend, retry_after
+
+
+def completion(text):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+    }
+
+
+def error_body(message, code=None):
+    return {"error": {"message": message, "type": "test", "code": code}}
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    """Replays ``server.script`` one response per request."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        status, headers, body = self.server.script.pop(0)
+        stream = isinstance(body, list)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/event-stream" if stream else "application/json")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if stream:
+            for text in body:
+                chunk = {"choices": [{"index": 0, "delta": {"content": text}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class ResilientBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+        self.server.script = []
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.params = {
+            "model": "gpt-4o",
+            "messages": [{"role": "user", "content": "hi"}],
+            "max_tokens": 10,
+            "api_base": f"http://127.0.0.1:{self.server.server_port}/v1",
+            "request_timeout": 5,
+        }
+        self.sleeps = []
+        self.limiter = RateLimiter(6000, 10**9, sleep=self.sleeps.append)
+        self.backend = ResilientBackend(
+            openai_backend, max_attempts=4, base_delay=0.01,
+            limiter_for=lambda model: self.limiter, sleep=self.sleeps.append
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def call(self, stream=False):
+        return "".join(self.backend(self.params, "sk-test", stream))
+
+    def test_retries_429_honouring_retry_after(self):
+        self.server.script = [
+            (429, {"Retry-After": "2"}, error_body("slow down", "rate_limit_exceeded")),
+            (200, {}, completion("hello")),
+        ]
+        self.assertEqual(self.call(), "hello")
+        self.assertEqual(self.server.requests, 2)
+        self.assertGreaterEqual(self.sleeps[0], 2.0)
+        self.assertGreater(self.limiter.paused_until, 0)
+
+    def test_retries_server_errors(self):
+        self.server.script = [
+            (500, {}, error_body("oops")),
+            (503, {}, error_body("unavailable")),
+            (200, {}, completion("hello")),
+        ]
+        self.assertEqual(self.call(), "hello")
+        self.assertEqual(self.backend.retries, 2)
+
+    def test_streaming_retry_before_first_chunk(self):
+        self.server.script = [
+            (429, {"Retry-After": "0"}, error_body("slow down")),
+            (200, {}, ["hel", "lo"]),
+        ]
+        self.assertEqual(self.call(stream=True), "hello")
+
+    def test_gives_up_after_max_attempts(self):
+        self.server.script = [(500, {}, error_body("oops"))] * 4
+        with self.assertRaises(openai.error.APIError):
+            self.call()
+        self.assertEqual(self.server.requests, 4)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.script = [(400, {}, error_body("bad request"))]
+        with self.assertRaises(openai.error.InvalidRequestError):
+            self.call()
+        self.assertEqual(self.server.requests, 1)
+
+    def test_exhausted_quota_is_not_retried(self):
+        self.server.script = [(429, {}, error_body("no credit", "insufficient_quota"))]
+        with self.assertRaises(openai.error.RateLimitError):
+            self.call()
+        self.assertEqual(self.server.requests, 1)
+
+    def test_timeouts_are_only_retried_without_a_request_timeout(self):
+        attempts = []
+
+        def slow(params, api_key, stream=False):
+            attempts.append(params)
+            raise openai.error.Timeout("timed out")
+            yield ""
+
+        self.backend.backend = slow
+        with self.assertRaises(openai.error.Timeout):
+            self.call()
+        self.assertEqual(len(attempts), 1)
+        del self.params["request_timeout"]
+        with self.assertRaises(openai.error.Timeout):
+            self.call()
+        self.assertEqual(len(attempts), 1 + 4)
+
+
+class RateLimitTest(unittest.TestCase):
+    def test_bucket_refills_over_time(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0)
+        now[0] = 2.0
+        self.assertEqual(bucket.reserve(1), 0.0)
+
+    def test_limiter_waits_for_the_tighter_bucket(self):
+        now = [0.0]
+        waits = []
+        limiter = RateLimiter(600, 1200, clock=lambda: now[0], sleep=waits.append)
+        limiter.acquire(1200)
+        limiter.acquire(600)
+        self.assertEqual(waits, [30.0])
+
+    def test_pause_holds_back_callers(self):
+        now = [0.0]
+        waits = []
+        limiter = RateLimiter(600, 10**6, clock=lambda: now[0], sleep=waits.append)
+        limiter.pause(5)
+        limiter.acquire(1)
+        self.assertEqual(waits, [5.0])
+
+    def test_retry_after_headers(self):
+        error = openai.error.RateLimitError("x", headers={"retry-after-ms": "1500"})
+        self.assertEqual(retry_after(error), 1.5)
+        self.assertIsNone(retry_after(openai.error.RateLimitError("x")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from content_pipeline import CONTEXT_BUDGETS, MODEL_MAP
+from model_routes import DEFAULT_MAX_OUTPUT, MODEL_ROUTES, GenerationProfile, ModelRoute, resolve_profile
+
+
+class ModelRoutesTest(unittest.TestCase):
+    def test_routes_name_known_models(self):
+        for route in MODEL_ROUTES:
+            for model in (route.model, route.fallback):
+                if model:
+                    self.assertIn(model, MODEL_MAP)
+                    self.assertIn(model, CONTEXT_BUDGETS)
+            self.assertEqual(route.fallback is None, route.timeout is None)
+
+    def test_agents_get_their_own_models_and_budgets(self):
+        strategist = resolve_profile("Strategist", "Blog Post", "Medium (600-800 words)", "4.1")
+        self.assertEqual((strategist.model, strategist.fallback), ("4o-mini", "4o"))
+        writer = resolve_profile("Specialist Writer", "Blog Post", "Medium (600-800 words)", "4.1")
+        self.assertEqual(writer, GenerationProfile("4.1", 6000))
+        editor = resolve_profile("Editor-in-Chief", "Blog Post", "Medium (600-800 words)", "4o")
+        self.assertEqual(editor.model, "o3")
+
+    def test_later_rules_override_earlier_ones(self):
+        caption = resolve_profile("Specialist Writer", "Social Media Caption", "Short (~300 words)", "4o")
+        self.assertEqual(caption.max_output, 600)
+        seo = resolve_profile("SEO Specialist", "Social Media Caption", "Short (~300 words)", "4o")
+        self.assertEqual((seo.model, seo.max_output), ("4o-mini", 1500))
+
+    def test_fallback_to_the_same_model_is_dropped(self):
+        routes = [ModelRoute(agent="Strategist", timeout=30, fallback="4o")]
+        profile = resolve_profile("Strategist", "Blog Post", "Short (~300 words)", "4o", routes)
+        self.assertEqual(profile, GenerationProfile("4o", DEFAULT_MAX_OUTPUT))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from near_duplicates import NearDuplicateIndex, collapse_near_duplicates, lsh_bands
+from query_fanout import QueryFanout
+
+
+class NearDuplicateTest(unittest.TestCase):
+    def test_collapses_reworded_queries(self):
+        queries = ["best tracing tools", "Best tracing tool", "tracing tools best", "cake recipe"]
+        self.assertEqual(collapse_near_duplicates(queries), [("best tracing tools", 2), ("cake recipe", 0)])
+
+    def test_threshold_is_tunable(self):
+        queries = ["tracing tools", "tracing tools for kubernetes"]
+        self.assertEqual(len(collapse_near_duplicates(queries, threshold=0.75)), 2)
+        self.assertEqual(len(collapse_near_duplicates(queries, threshold=0.5)), 1)
+
+    def test_key_selects_text(self):
+        items = [{"query": "tracing tools"}, {"query": "Tracing tools?"}]
+        kept = collapse_near_duplicates(items, key=lambda q: q["query"])
+        self.assertEqual(kept, [({"query": "tracing tools"}, 1)])
+
+    def test_bands_follow_threshold(self):
+        bands, rows = lsh_bands(0.75, 64)
+        self.assertEqual(bands * rows, 64)
+        self.assertLess(abs((1 / bands) ** (1 / rows) - 0.75), 0.05)
+
+    def test_index_returns_representative(self):
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.add("tracing tools"))
+        self.assertIsNone(index.add("cake recipe"))
+        self.assertEqual(index.add("tools tracing"), 0)
+        self.assertEqual(index.counts, [1, 0])
+
+    def test_fanout_collapses_nested_templates(self):
+        plain = QueryFanout("Tracing", ["tracing tools"], max_queries=None, levels=4)
+        collapsed = QueryFanout("Tracing", ["tracing tools"], max_queries=None, levels=4, near_duplicate_threshold=0.75)
+        self.assertLess(len(collapsed), len(plain))
+        self.assertGreater(sum(collapsed.duplicates), 0)
+        self.assertEqual(len(collapsed.duplicates), len(collapsed))
+
+
+if __name__ == "__main__":
+    unittest.main()
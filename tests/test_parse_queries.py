@@ -1,22 +1,12 @@
 import unittest
 import os
 import sys
-import types
-import re
 
 ROOT = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(ROOT)
 
-path = os.path.join(ROOT, "streamlit_app.py")
-with open(path, "r") as f:
-    source = f.read()
-
-pattern = re.compile(r"def parse_queries.*?return unique", re.S)
-match = pattern.search(source)
-assert match, "parse_queries function not found"
-namespace = {}
-exec(match.group(0), {"re": re}, namespace)
-parse_queries = namespace["parse_queries"]
+from query_fanout import QueryStreamParser, parse_queries
+from stub_llm import stub_reply
 
 class ParseQueriesTest(unittest.TestCase):
     def test_blank_line_after_heading(self):
@@ -58,5 +48,42 @@ class ParseQueriesTest(unittest.TestCase):
             {"type": "implicit", "query": "tracing library", "note": ""},
         ]
         self.assertEqual(parse_queries(text), expected)
+
+
+class QueryStreamParserTest(unittest.TestCase):
+    def test_any_chunking_matches_parse_queries(self):
+        text = stub_reply("SEO Specialist", "Tracing").replace("\n", "\r\n")
+        for size in (1, 3, 17, len(text)):
+            parser = QueryStreamParser()
+            found = []
+            for start in range(0, len(text), size):
+                found += parser.feed(text[start:start + size])
+            found += parser.close()
+            self.assertEqual(found, parse_queries(text))
+
+    def test_query_emitted_when_line_completes(self):
+        parser = QueryStreamParser()
+        self.assertEqual(parser.feed("Search Queries:\n- Technical: fix tra"), [])
+        self.assertEqual(parser.feed("cing\n- Impl"), [{"type": "technical", "query": "fix tracing", "note": ""}])
+        self.assertEqual(parser.close(), [{"type": "", "query": "Impl", "note": ""}])
+
+    def test_feed_text_restarts_on_a_shorter_reply(self):
+        parser = QueryStreamParser()
+        parser.feed_text("Search Queries:\n- Technical: stale query\n")
+        self.assertEqual([q["query"] for q in parser.queries], ["stale query"])
+        self.assertEqual(parser.feed_text(""), [])
+        parser.feed_text("Search Queries:\n- Technical: fresh")
+        parser.feed_text("Search Queries:\n- Technical: fresh query\n")
+        self.assertEqual(parser.restarts, 1)
+        self.assertEqual([q["query"] for q in parser.queries], ["fresh query"])
+
+    def test_stops_after_list_ends(self):
+        parser = QueryStreamParser()
+        parser.feed("Search Queries:\n- one\nRecommended Next Steps:\n")
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.feed("- two\n"), [])
+        self.assertEqual([q["query"] for q in parser.queries], ["one"])
+
+
 if __name__ == '__main__':
     unittest.main()
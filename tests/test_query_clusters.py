@@ -0,0 +1,52 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from embeddings import embed_texts
+from query_clusters import cluster_queries, default_cluster_count, kmeans
+
+QUERIES = [
+    "jaeger setup guide", "install jaeger", "jaeger setup on kubernetes",
+    "tracing sampling rate", "head based sampling", "tail based sampling rate",
+    "opentelemetry collector config", "opentelemetry collector pipeline",
+]
+
+
+class ClusterQueriesTest(unittest.TestCase):
+    def test_groups_related_queries(self):
+        labels, representatives = cluster_queries(embed_texts(QUERIES), k=3)
+        self.assertEqual(len(representatives), 3)
+        self.assertEqual(len(set(labels[:3])), 1)
+        self.assertEqual(len(set(labels[6:])), 1)
+        self.assertNotEqual(labels[0], labels[6])
+        for cluster, row in enumerate(representatives):
+            self.assertEqual(labels[row], cluster)
+
+    def test_largest_group_first(self):
+        labels, _ = cluster_queries(embed_texts(QUERIES), k=3)
+        sizes = np.bincount(labels)
+        self.assertEqual(sizes.tolist(), sorted(sizes.tolist(), reverse=True))
+
+    def test_deterministic(self):
+        vectors = np.random.default_rng(3).normal(size=(500, 32)).astype(np.float32)
+        first, _ = kmeans(vectors, 6, sample_size=200)
+        second, _ = kmeans(vectors, 6, sample_size=200)
+        self.assertTrue(np.array_equal(first, second))
+        self.assertEqual(len(set(first.tolist())), 6)
+
+    def test_small_inputs(self):
+        labels, representatives = cluster_queries(embed_texts(["tracing"]))
+        self.assertEqual(labels.tolist(), [0])
+        self.assertEqual(representatives, [0])
+        self.assertEqual(cluster_queries(np.zeros((0, 8)))[1], [])
+        self.assertEqual(default_cluster_count(30), 4)
+        self.assertEqual(default_cluster_count(10000), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
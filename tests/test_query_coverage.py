@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from query_coverage import score_coverage, split_passages
+
+CONTENT = """# Distributed tracing guide
+
+Distributed tracing follows a request as it moves through microservices. Each hop records a span with timing data.
+
+## Choosing tracing tools
+
+Jaeger and Zipkin are popular open source tracing tools. Jaeger supports adaptive sampling, while Zipkin is simpler to run.
+
+## Sampling
+
+Head-based sampling decides at the start of a request whether to keep the trace. Tail-based sampling waits until the trace finishes.
+"""
+
+
+class SplitPassagesTest(unittest.TestCase):
+    def test_passages_follow_headings(self):
+        passages = split_passages(CONTENT)
+        self.assertEqual([p["heading"] for p in passages],
+                         ["Distributed tracing guide", "Choosing tracing tools", "Sampling"])
+        self.assertTrue(passages[1]["text"].startswith("Jaeger and Zipkin"))
+
+    def test_plain_text_headings(self):
+        passages = split_passages(CONTENT.replace("## ", "").replace("# ", ""))
+        self.assertEqual([p["heading"] for p in passages],
+                         ["Distributed tracing guide", "Choosing tracing tools", "Sampling"])
+
+    def test_long_paragraphs_split_between_sentences(self):
+        text = " ".join(f"Sentence number {i} talks about tracing." for i in range(40))
+        passages = split_passages(text, max_chars=120)
+        self.assertGreater(len(passages), 5)
+        self.assertTrue(all(len(p["text"]) <= 120 for p in passages))
+        self.assertTrue(all(p["text"].endswith(".") for p in passages))
+        self.assertEqual(" ".join(p["text"] for p in passages), text)
+
+    def test_overlong_sentence_cut_at_words(self):
+        passages = split_passages("word " * 100, max_chars=50)
+        self.assertTrue(all(len(p["text"]) <= 50 for p in passages))
+        self.assertEqual(sum(p["text"].count("word") for p in passages), 100)
+
+
+class ScoreCoverageTest(unittest.TestCase):
+    def test_best_passage_and_gaps(self):
+        queries = [
+            {"type": "Comparative", "query": "jaeger vs zipkin"},
+            {"type": "Technical", "query": "tail based sampling"},
+            {"type": "Implicit", "query": "kafka consumer lag alerting"},
+        ]
+        coverage = score_coverage(CONTENT, queries)
+        self.assertEqual(coverage["passages"], 3)
+        jaeger, sampling, kafka = coverage["queries"]
+        self.assertEqual(jaeger["heading"], "Choosing tracing tools")
+        self.assertEqual(sampling["heading"], "Sampling")
+        self.assertTrue(jaeger["covered"] and sampling["covered"])
+        self.assertFalse(kafka["covered"])
+        self.assertEqual(coverage["covered"], 2)
+
+    def test_deterministic(self):
+        queries = [{"type": "", "query": "what is distributed tracing"}]
+        self.assertEqual(score_coverage(CONTENT, queries), score_coverage(CONTENT, queries))
+
+    def test_empty_content(self):
+        coverage = score_coverage("", [{"type": "", "query": "tracing"}])
+        self.assertEqual(coverage["covered"], 0)
+        self.assertIsNone(coverage["queries"][0]["passage"])
+
+
+if __name__ == "__main__":
+    unittest.main()
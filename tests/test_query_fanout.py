@@ -0,0 +1,62 @@
+import unittest
+import csv
+import io
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from query_fanout import QueryFanout, build_query_graph, iter_fanout, normalize_query
+
+
+class IterFanoutTest(unittest.TestCase):
+    def test_breadth_first_with_unique_text(self):
+        nodes = list(iter_fanout("Tracing", ["tracing tools", "Tracing Tools!", "tracing"], max_queries=4))
+        self.assertEqual(nodes[0], (-1, 0, "Tracing"))
+        self.assertEqual(nodes[1], (0, 1, "tracing tools"))
+        self.assertEqual([level for _, level, _ in nodes[2:]], [2, 2, 2])
+        self.assertEqual(len({normalize_query(text) for _, _, text in nodes}), len(nodes))
+
+    def test_levels_bound_the_depth(self):
+        nodes = list(iter_fanout("Tracing", ["tracing tools"], levels=2))
+        self.assertEqual(max(level for _, level, _ in nodes), 2)
+        self.assertEqual(len(nodes), 2 + 6)
+
+    def test_large_fanout(self):
+        fanout = QueryFanout("Tracing", ["tracing tools", "sampling"], max_queries=5000, levels=8, batch_size=512)
+        self.assertEqual(len(fanout), 5001)
+        self.assertEqual(fanout.vectors.shape, (5001, 512))
+        for parent, child in fanout.edges():
+            self.assertEqual(fanout.levels[child], fanout.levels[parent] + 1)
+
+
+class FanoutExportTest(unittest.TestCase):
+    def setUp(self):
+        self.fanout = QueryFanout("Tracing", ["tracing tools", "what is tracing"], max_queries=8)
+
+    def test_json_export(self):
+        out = io.StringIO()
+        self.fanout.write_json(out, neighbors=2)
+        data = json.loads(out.getvalue())
+        self.assertEqual(len(data["nodes"]), 9)
+        self.assertEqual(len(data["edges"]), 8)
+        self.assertEqual(data["nodes"][0]["parent"], -1)
+        self.assertEqual(len(data["nodes"][1]["nearest"]), 2)
+
+    def test_csv_export(self):
+        out = io.StringIO()
+        self.fanout.write_csv(out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row["query"] for row in rows], self.fanout.texts)
+
+    def test_query_graph_keeps_every_base_query(self):
+        queries = [f"tracing question {i}" for i in range(40)]
+        graph, node_data = build_query_graph("Tracing", queries, min_queries=30)
+        self.assertEqual(graph.number_of_nodes(), 41)
+        self.assertEqual(graph.number_of_edges(), 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import csv
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from query_report import QUERY_CSV_HEADER, build_query_report, content_html, results_digest
+
+
+class ResultsDigestTest(unittest.TestCase):
+    def setUp(self):
+        self.results = {
+            "final_title": "Tracing",
+            "queries": ["tracing tools"],
+            "queries_typed": [{"type": "Related", "query": "tracing tools", "note": ""}],
+            "final_content": "# Tracing",
+            "score": "8/10",
+        }
+
+    def test_ignores_unrelated_fields(self):
+        digest = results_digest(self.results)
+        self.results["score"] = "9/10"
+        self.results["queries_csv"] = "x"
+        self.assertEqual(results_digest(self.results), digest)
+
+    def test_changes_with_content(self):
+        digest = results_digest(self.results)
+        self.results["final_content"] += "\nMore."
+        self.assertNotEqual(results_digest(self.results), digest)
+
+
+class BuildQueryReportTest(unittest.TestCase):
+    def test_rows_csv_and_graph(self):
+        typed = [{"type": "Related", "query": "tracing tools", "note": "core intent"}]
+        report = build_query_report("Tracing", ["tracing tools", "what is tracing"], typed)
+        self.assertGreater(len(report["rows"]), 20)
+        row = next(r for r in report["rows"] if r["Query"] == "tracing tools")
+        self.assertEqual(row["Provided"], "Related")
+        self.assertEqual(row["Reason"], "core intent")
+        lines = report["csv"].splitlines()
+        self.assertEqual(lines[0], QUERY_CSV_HEADER)
+        self.assertEqual(len(lines), len(report["rows"]) + 1)
+        self.assertEqual(sum(len(group["rows"]) for group in report["groups"]), len(report["rows"]))
+        for group in report["groups"]:
+            self.assertIn(group["label"], [r["Query"] for r in group["rows"]])
+            self.assertTrue(all(r["Cluster"] == group["label"] for r in group["rows"]))
+        self.assertTrue(lines[1].endswith("," + report["rows"][0]["Cluster"]))
+        self.assertIn("mynetwork", report["html"])
+        self.assertIn("downloadJSON", report["html"])
+
+    def test_csv_quotes_commas_and_quotes(self):
+        query = 'tracing, "the hard way"'
+        typed = [{"type": "Related", "query": query, "note": "costs, overhead"}]
+        report = build_query_report("Tracing", [query, "what is tracing"], typed)
+        parsed = list(csv.DictReader(io.StringIO(report["csv"])))
+        self.assertEqual(len(parsed), len(report["rows"]))
+        self.assertTrue(all(list(row) == QUERY_CSV_HEADER.split(",") for row in parsed))
+        row = next(row for row in parsed if row["Query"] == query)
+        self.assertEqual(row["Reason"], "costs, overhead")
+        for parsed_row, row in zip(parsed, report["rows"]):
+            self.assertEqual(parsed_row["Nearest"], row["Nearest"])
+            self.assertEqual(parsed_row["Cluster"], row["Cluster"])
+
+    def test_deep_levels_fold_into_clusters(self):
+        report = build_query_report("Tracing", ["tracing tools", "what is tracing"], [], max_graph_nodes=10)
+        self.assertGreater(len(report["rows"]), 20)
+        self.assertRegex(report["html"], r'"\+\d+ more"')
+        self.assertIn('"folded"', report["html"])
+
+
+class ContentHtmlTest(unittest.TestCase):
+    def test_renders_markdown(self):
+        html = content_html("# Tracing\n\nSome *text*.", "Tracing.html")
+        self.assertIn("<h1>Tracing</h1>", html)
+        self.assertIn("<em>text</em>", html)
+        self.assertIn("<title>Tracing.html</title>", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+import docx
+from reference_extraction import TASKS_AHEAD, cached_extract_text, extract_references, extract_text, iter_pdf_pages
+from response_cache import ResponseCache
+
+
+def make_pdf(pages):
+    """Build a minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def make_docx(paragraphs):
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class ExtractTextTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pdf = make_pdf([f"Page {i} covers tracing" for i in range(20)])
+
+    def test_pdf_pages_in_order(self):
+        text, report = extract_text("report.pdf", self.pdf, "application/pdf")
+        self.assertEqual(report["pages"], 20)
+        self.assertEqual(report["parts"], 20)
+        self.assertTrue(text.startswith("Page 0 covers tracing\n\nPage 1 covers tracing"))
+        self.assertTrue(text.endswith("Page 19 covers tracing"))
+
+    def test_pool_matches_inline_extraction(self):
+        with ProcessPoolExecutor(2) as pool:
+            pooled, report = extract_text("report.pdf", self.pdf, pool=pool)
+        self.assertEqual(pooled, extract_text("report.pdf", self.pdf)[0])
+        self.assertEqual(report["error"], "")
+
+    def test_pool_prefetch_is_capped(self):
+        class InlinePool:
+            def __init__(self):
+                self.submitted = []
+
+            def submit(self, fn, *args):
+                self.submitted.append(args)
+                future = Future()
+                future.set_result(fn(*args))
+                return future
+
+        pool = InlinePool()
+        pages = iter_pdf_pages(self.pdf, 20, pool=pool)
+        self.assertEqual(next(pages), "Page 0 covers tracing")
+        self.assertEqual(len(pool.submitted), min(TASKS_AHEAD, 5))
+        path = pool.submitted[0][0]
+        self.assertIsInstance(path, str)
+        self.assertEqual({args[0] for args in pool.submitted}, {path})
+        pages.close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_stops_at_token_budget(self):
+        text, report = extract_text("report.pdf", self.pdf, max_tokens=12)
+        self.assertTrue(report["truncated"])
+        self.assertEqual(report["parts"], 3)
+        self.assertEqual(report["tokens"], 12)
+        self.assertNotIn("Page 3", text)
+
+    def test_docx_paragraphs(self):
+        data = make_docx(["Tracing basics", "", "Sampling strategies"])
+        text, report = extract_text("brief.docx", data)
+        self.assertEqual(text, "Tracing basics\n\nSampling strategies")
+        self.assertEqual(report["parts"], 2)
+
+    def test_errors_are_reported(self):
+        _, report = extract_text("broken.pdf", b"not a pdf")
+        self.assertTrue(report["error"])
+        _, report = extract_text("image.png", b"\x89PNG")
+        self.assertEqual(report["error"], "Unsupported file type")
+
+    def test_files_share_the_budget(self):
+        files = [("notes.md", b"one two three four five", "text/markdown"), ("report.pdf", self.pdf, "")]
+        text, reports = extract_references(files, max_tokens=5)
+        self.assertIn("--- notes.md ---\none two three four five", text)
+        self.assertEqual(reports[1]["parts"], 0)
+        self.assertTrue(reports[1]["truncated"])
+
+
+
+class ExtractionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmp.name, "references.sqlite3"))
+        self.pdf = make_pdf([f"Page {i} covers tracing" for i in range(5)])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_bytes_are_served_from_cache(self):
+        text, report = cached_extract_text("report.pdf", self.pdf, cache=self.cache)
+        self.assertFalse(report["cached"])
+        again, report = cached_extract_text("renamed.pdf", self.pdf, cache=self.cache)
+        self.assertTrue(report["cached"])
+        self.assertEqual(report["file"], "renamed.pdf")
+        self.assertEqual(report["pages"], 5)
+        self.assertEqual(again, text)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_changed_bytes_or_budget_miss(self):
+        cached_extract_text("report.pdf", self.pdf, max_tokens=100, cache=self.cache)
+        _, report = cached_extract_text("report.pdf", self.pdf, max_tokens=10, cache=self.cache)
+        self.assertFalse(report["cached"])
+        _, report = cached_extract_text("report.pdf", make_pdf(["Other"]), max_tokens=100, cache=self.cache)
+        self.assertFalse(report["cached"])
+
+    def test_failures_are_not_cached(self):
+        cached_extract_text("broken.pdf", b"not a pdf", cache=self.cache)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_cached_file_is_cut_to_the_remaining_budget(self):
+        files = [("notes.md", b"one two three", "text/markdown"), ("report.pdf", self.pdf, "")]
+        extract_references(files[1:], max_tokens=10, cache=self.cache)
+        text, reports = extract_references(files, max_tokens=10, cache=self.cache)
+        self.assertTrue(reports[1]["cached"])
+        self.assertEqual(reports[1]["tokens"], 7)
+        self.assertTrue(reports[1]["truncated"])
+        self.assertIn("Page 0 covers", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
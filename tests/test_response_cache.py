@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from response_cache import ResponseCache, make_cache_key
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache", "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_every_part(self):
+        base = make_cache_key("Strategist", "gpt-4o", "system", "context", "prompt")
+        self.assertEqual(base, make_cache_key("Strategist", "gpt-4o", "system", "context", "prompt"))
+        self.assertNotEqual(base, make_cache_key("Strategist", "o3", "system", "context", "prompt"))
+        self.assertNotEqual(base, make_cache_key("Strategist", "gpt-4o", "system", "context", "prompt!"))
+
+    def test_hit_and_miss_counters(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", "reply", duration=2.5)
+        self.assertEqual(cache.get("a"), "reply")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["saved_seconds"], 2.5)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_persists_across_instances(self):
+        ResponseCache(self.path).set("a", "reply")
+        self.assertEqual(ResponseCache(self.path).get("a"), "reply")
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(self.path, max_bytes=10)
+        cache.set("a", "aaaa")
+        time.sleep(0.01)
+        cache.set("b", "bbbb")
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", "cccc")
+        self.assertEqual(cache.get("a"), "aaaa")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "cccc")
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(self.path, ttl=0.01)
+        cache.set("a", "reply")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.append(ROOT)
+
+from stage_graph import Stage, StageFailed, critical_path, downstream_stages, run_stage_graph, topological_order
+
+
+def sleeper(key, seconds, value="x"):
+    def run(context, inputs):
+        time.sleep(seconds)
+        return {key: value}
+    return run
+
+
+class StageGraphTest(unittest.TestCase):
+    def test_independent_stages_run_concurrently(self):
+        def join(context, inputs):
+            return {"out": inputs["a"] + inputs["b"] + inputs["c"]}
+
+        stages = [
+            Stage("a", sleeper("a", 0.1), (), ("a",)),
+            Stage("b", sleeper("b", 0.1), (), ("b",)),
+            Stage("c", sleeper("c", 0.1), (), ("c",)),
+            Stage("join", join, ("a", "b", "c"), ("out",)),
+        ]
+        state = {}
+        start = time.perf_counter()
+        timeline = run_stage_graph(stages, state)
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual(state["out"], "xxx")
+        self.assertEqual(timeline[-1]["stage"], "join")
+
+    def test_stage_only_sees_declared_inputs(self):
+        seen = {}
+
+        def run(context, inputs):
+            seen.update(inputs)
+            return {"b": context}
+
+        state = {"a": 1, "secret": 2}
+        run_stage_graph([Stage("s", run, ("a",), ("b",))], state, context="ctx")
+        self.assertEqual(seen, {"a": 1})
+        self.assertEqual(state["b"], "ctx")
+
+    def test_failure_stops_downstream_stages(self):
+        def fail(context, inputs):
+            raise StageFailed("no output")
+
+        ran = []
+        stages = [
+            Stage("a", fail, (), ("a",)),
+            Stage("b", lambda ctx, inputs: ran.append("b") or {"b": 1}, ("a",), ("b",)),
+        ]
+        timeline = run_stage_graph(stages, {})
+        self.assertEqual([(e["stage"], e["status"]) for e in timeline], [("a", "failed")])
+        self.assertEqual(ran, [])
+
+    def test_missing_output_is_a_failure(self):
+        timeline = run_stage_graph([Stage("a", lambda ctx, inputs: {}, (), ("a",))], {})
+        self.assertEqual(timeline[0]["status"], "failed")
+
+    def test_invalid_graphs_are_rejected(self):
+        with self.assertRaises(ValueError):
+            topological_order([Stage("a", None, ("missing",), ("a",))])
+        with self.assertRaises(ValueError):
+            topological_order([Stage("a", None, ("b",), ("a",)), Stage("b", None, ("a",), ("b",))])
+        with self.assertRaises(ValueError):
+            topological_order([Stage("a", None, (), ("x",)), Stage("b", None, (), ("x",))])
+
+    def test_critical_path_follows_slowest_dependency(self):
+        stages = [
+            Stage("fast", sleeper("fast", 0.01), (), ("fast",)),
+            Stage("slow", sleeper("slow", 0.1), (), ("slow",)),
+            Stage("join", sleeper("out", 0.01), ("fast", "slow"), ("out",)),
+        ]
+        timeline = run_stage_graph(stages, {})
+        self.assertEqual(critical_path(stages, timeline), ["slow", "join"])
+
+    def test_downstream_stages_follow_outputs(self):
+        stages = [
+            Stage("a", None, (), ("a",)),
+            Stage("b", None, ("a",), ("b",)),
+            Stage("c", None, (), ("c",)),
+            Stage("d", None, ("b", "c"), ("d",)),
+        ]
+        self.assertEqual(downstream_stages(stages, "b"), {"b", "d"})
+        self.assertEqual(downstream_stages(stages, "a"), {"a", "b", "d"})
+        with self.assertRaises(ValueError):
+            downstream_stages(stages, "missing")
+
+
+if __name__ == "__main__":
+    unittest.main()